@@ -0,0 +1,60 @@
+"""
+Benchmark throughput của pipeline chat: process_message (đồng bộ, chặn event loop)
+so với aprocess_message (async) ở các mức concurrency khác nhau.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_async_chat --latency 0.2 --requests 200
+"""
+import argparse
+import asyncio
+import time
+
+from tests.conftest import FakeGenerativeModel, make_chatbot
+from src.models import UserSession
+
+
+async def run_sync_path(chatbot, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            # Giống main.chat trước đây: gọi hàm đồng bộ trong coroutine
+            chatbot.process_message("Thời gian giao hàng?", UserSession(user_id=f"u{i}"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_async_path(chatbot, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await chatbot.aprocess_message("Thời gian giao hàng?", UserSession(user_id=f"u{i}"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2, help="Độ trễ mỗi lần gọi LLM giả (giây)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    args = parser.parse_args()
+
+    chatbot = make_chatbot(FakeGenerativeModel(latency=args.latency))
+
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'async req/s':>12}")
+    for concurrency in args.concurrency:
+        # Đường đồng bộ rất chậm, chỉ đo một mẫu nhỏ
+        sync_total = min(args.requests, 20)
+        sync_elapsed = asyncio.run(run_sync_path(chatbot, sync_total, concurrency))
+        async_elapsed = asyncio.run(run_async_path(chatbot, args.requests, concurrency))
+        print(f"{concurrency:>12} {sync_total / sync_elapsed:>12.1f} {args.requests / async_elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Nhập hàng loạt sản phẩm: NDJSON qua parse_ndjson + apply_bulk_changes (một commit
+change log, embed theo lô) so với gọi add_product cho từng sản phẩm như trước đây.
+
+Vector database là NumpyCollection trong thư mục tạm; model embedding được giả lập
+với chi phí cố định mỗi lần gọi cộng chi phí mỗi document (--embed-call-ms, --embed-doc-ms).
+Cách cũ rất chậm nên chỉ chạy trên --loop-records sản phẩm đầu tiên rồi ngoại suy.
+
+    python -m benchmarks.bench_bulk_import --records 10000 --loop-records 500
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_product_filters import make_products
+
+DIMENSIONS = 384
+
+
+class FakeEmbedding:
+    def __init__(self, call_ms: float, doc_ms: float):
+        self.call_seconds = call_ms / 1000
+        self.doc_seconds = doc_ms / 1000
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        time.sleep(self.call_seconds + self.doc_seconds * len(texts))
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(DIMENSIONS).astype(np.float32))
+        return np.array(vectors)
+
+
+def use_products(database, path, collection_name, embed):
+    """Catalog và collection sản phẩm mới (rỗng) cho một lần đo"""
+    from src.vector_index import NumpyCollection
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([], f)
+    database.catalog.path = path
+    database.product_collection = NumpyCollection(collection_name, "vector_index", embed)
+    if os.path.exists(database.VECTOR_MANIFEST_FILE):
+        os.remove(database.VECTOR_MANIFEST_FILE)
+    # Như khi server đang chạy: vector database đã đồng bộ với catalog hiện tại
+    database.vector_sync["products"].version = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.vector_sync["products"].sync()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--loop-records", type=int, default=500)
+    parser.add_argument("--embed-call-ms", type=float, default=10.0)
+    parser.add_argument("--embed-doc-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # database.py dùng ./data: chạy trong thư mục tạm để không đụng dữ liệu thật
+        os.chdir(tmp)
+        os.makedirs("data")
+        from src import database
+        from src.bulk_import import parse_ndjson
+
+        embed = FakeEmbedding(args.embed_call_ms, args.embed_doc_ms)
+        database.VECTOR_DB_ENABLED = True
+        database.embedding_function = embed
+        products = make_products(args.records)
+        lines = [json.dumps({"op": "upsert", "record": product}, ensure_ascii=False).encode("utf-8") for product in products]
+
+        use_products(database, os.path.join("data", "bulk.json"), "bulk", embed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            ops = parse_ndjson("products", lines)
+            parsed = time.perf_counter()
+            counts = database.apply_bulk_changes("products", ops)
+            bulk = time.perf_counter() - start
+        assert counts["created"] == args.records and database.product_collection.count() == args.records
+        print(f"bulk import {args.records:>6} products: {bulk:7.2f}s ({args.records / bulk:7.0f} records/s) "
+              f"parse+validate={parsed - start:5.2f}s embed calls={embed.calls}")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            counts = database.apply_bulk_changes("products", parse_ndjson("products", lines))
+            again = time.perf_counter() - start
+        print(f"re-import unchanged:          {again:7.2f}s (unchanged={counts['unchanged']})")
+
+        use_products(database, os.path.join("data", "loop.json"), "loop", embed)
+        loop_products = products[:args.loop_records]
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for product in loop_products:
+                database.add_product(product)
+            loop = time.perf_counter() - start
+        rate = len(loop_products) / loop
+        print(f"add_product loop {len(loop_products):>6} products: {loop:7.2f}s ({rate:7.0f} records/s), "
+              f"{args.records} products >= {args.records / rate:7.1f}s (linear extrapolation)")
+
+
+if __name__ == "__main__":
+    main()
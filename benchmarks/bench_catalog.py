@@ -0,0 +1,72 @@
+"""
+Benchmark làm giàu lịch sử đơn hàng trên catalog tổng hợp: cách cũ (đọc lại
+products.json và quét tuyến tính cho mỗi dòng đơn hàng) so với Catalog có chỉ mục.
+
+    python -m benchmarks.bench_catalog --products 10000 --order-lines 50
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from src.database import Catalog, load_json_file
+from tests.conftest import make_products
+
+
+def enrich(order_lines, lookup):
+    for line in order_lines:
+        product = lookup(line["product_id"])
+        if product:
+            line["title"] = product["title"]
+            default_variation = next((v for v in product["variations"] if v.get("isDefault")), None)
+            if default_variation:
+                line["variation"] = default_variation["sku"]
+                line["finalPrice"] = default_variation["finalPrice"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--order-lines", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "products.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(make_products(args.products), f, ensure_ascii=False, indent=4)
+
+        step = max(1, args.products // args.order_lines)
+        order_lines = [{"product_id": str(i * step), "quantity": 1} for i in range(args.order_lines)]
+
+        def legacy_lookup(product_id):
+            if isinstance(product_id, str) and product_id.isdigit():
+                product_id = int(product_id)
+            for product in load_json_file(path):
+                if product["id"] == product_id:
+                    return product
+            return None
+
+        start = time.perf_counter()
+        enrich([dict(line) for line in order_lines], legacy_lookup)
+        legacy = time.perf_counter() - start
+
+        catalog = Catalog(path)
+        start = time.perf_counter()
+        catalog.all()
+        cold_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            enrich([dict(line) for line in order_lines], catalog.get)
+        indexed = (time.perf_counter() - start) / args.repeat
+
+        print(f"{args.products} products, {args.order_lines} order lines")
+        print(f"legacy (parse per line): {legacy * 1000:10.1f}ms")
+        print(f"catalog cold load:       {cold_load * 1000:10.1f}ms (once per file change)")
+        print(f"catalog indexed lookups: {indexed * 1000:10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
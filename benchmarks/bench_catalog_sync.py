@@ -0,0 +1,53 @@
+"""
+Kiểm tra đồng bộ tăng dần với một API sản phẩm giả chạy cục bộ:
+lần 1 embed toàn bộ, lần 2 (không đổi) không embed gì, lần 3 chỉ embed phần thay đổi.
+
+    python -m benchmarks.bench_catalog_sync --products 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import chromadb
+
+from tests.conftest import make_products
+from benchmarks.mock_product_api import serve_products
+from src import database
+
+
+def run_sync(label, api_url, collection, manifest_path):
+    start = time.perf_counter()
+    products = database.fetch_products_from_api(api_url)
+    print(f"[{label}]")
+    database.sync_products_to_vector_db(products, manifest_path=manifest_path, collection=collection)
+    print(f"  took {time.perf_counter() - start:.2f}s, collection size {collection.count()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    args = parser.parse_args()
+
+    database.init_vector_db()
+    products = {"items": make_products(args.products)}
+    server, api_url = serve_products(products)
+
+    collection = chromadb.EphemeralClient().create_collection("products_sync_bench")
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest_path = os.path.join(tmp, "vector_manifest.json")
+
+        run_sync("initial sync", api_url, collection, manifest_path)
+        run_sync("restart, unchanged catalog", api_url, collection, manifest_path)
+
+        items = products["items"]
+        items[0]["title"] += " (updated)"
+        items[1]["images"] = []
+        del items[2]
+        run_sync("1 text change, 1 metadata change, 1 removal", api_url, collection, manifest_path)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
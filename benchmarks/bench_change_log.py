@@ -0,0 +1,104 @@
+"""
+Chi phí sửa một sản phẩm khi catalog lớn dần: ghi lại cả file JSON (như trước
+đây, qua JsonFileStore) so với ghi thêm một dòng vào change log; và chi phí để
+Catalog + BM25 + snippet prompt thấy thay đổi đó (dựng lại toàn bộ so với áp
+dụng tăng dần), đo trong một tiến trình đọc riêng như một worker khác.
+
+    python -m benchmarks.bench_change_log --sizes 1000,10000,50000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from multiprocessing import Pipe, Process
+
+import numpy as np
+
+from benchmarks.bench_product_filters import make_products
+from src.change_log import ChangeLog
+from src.json_store import JsonFileStore
+
+UPDATES = 50
+
+
+def reader(path, conn):
+    """
+    Worker đọc: giữ Catalog + BM25 + snippet, báo thời gian cập nhật sau mỗi thay đổi.
+    File bị ghi lại cả file thì snapshot đổi nên mọi chỉ mục dựng lại toàn bộ; với change
+    log chỉ phần journal mới được đọc và áp dụng.
+    """
+    from src.database import Catalog, _product_search_text
+    from src.lexical_index import LexicalIndex
+    from src.prompt_builder import ProductSnippetCache
+
+    catalog = Catalog(path)
+    lexical = LexicalIndex(catalog.current_version, catalog.all, _product_search_text, delta=catalog.delta)
+    snippets = ProductSnippetCache(catalog)
+    lexical.search("sofa")
+    snippets.warm()
+    conn.send("ready")
+    while conn.recv() == "refresh":
+        start = time.perf_counter()
+        # hydrate([]) chỉ đưa chỉ mục về phiên bản mới, không tính thời gian tìm kiếm
+        lexical.hydrate([])
+        snippets.warm()
+        conn.send(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        products = make_products(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            rewrite_path = os.path.join(tmp, "rewrite.json")
+            log_path = os.path.join(tmp, "products.json")
+            for path in (rewrite_path, log_path):
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(products, f, ensure_ascii=False)
+
+            store = JsonFileStore(rewrite_path)
+            log = ChangeLog(log_path, compact_every=10 ** 9)
+            log.refresh()
+
+            def rewrite(product):
+                def apply(records):
+                    for i, existing in enumerate(records):
+                        if existing["id"] == product["id"]:
+                            records[i] = product
+                            return True
+                    return False
+                store.update(apply)
+
+            results = {}
+            for name, write in (("rewrite", rewrite), ("change log", lambda product: log.replace(product["id"], product))):
+                parent, child = Pipe()
+                path = rewrite_path if name == "rewrite" else log_path
+                worker = Process(target=reader, args=(path, child))
+                worker.start()
+                parent.recv()
+
+                writes, refreshes = [], []
+                for n in range(UPDATES):
+                    product = dict(products[(n * 7919) % size], title=f"Updated {name} {n}")
+                    start = time.perf_counter()
+                    write(product)
+                    writes.append(time.perf_counter() - start)
+                    parent.send("refresh")
+                    refreshes.append(parent.recv())
+                parent.send("stop")
+                worker.join()
+                results[name] = (np.median(writes) * 1000, np.median(refreshes) * 1000)
+
+            row = " | ".join(
+                f"{name}: write p50={write_ms:7.2f}ms reader update p50={refresh_ms:8.2f}ms"
+                for name, (write_ms, refresh_ms) in results.items()
+            )
+            print(f"products={size:>6} {row}")
+
+
+if __name__ == "__main__":
+    main()
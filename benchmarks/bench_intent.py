@@ -0,0 +1,93 @@
+"""
+Đánh giá độ chính xác và độ trễ của các bộ phân loại ý định trên data/intent_eval.json.
+
+    python -m benchmarks.bench_intent              # chỉ classifier cục bộ
+    python -m benchmarks.bench_intent --llm        # thêm Gemini (cần GOOGLE_API_KEY)
+
+Với classifier cục bộ, "coverage" là tỷ lệ tin nhắn vượt ngưỡng confidence
+(không cần gọi LLM), "accuracy@threshold" là độ chính xác trên phần đó.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.intent import (
+    CascadeIntentClassifier,
+    EmbeddingIntentClassifier,
+    KeywordIntentClassifier,
+    INTENT_CONFIDENCE_THRESHOLD,
+)
+
+
+def load_eval_set(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def report(name, latencies, predictions, examples, confident=None):
+    latencies_ms = np.array(latencies) * 1000
+    correct = [p == e["intent"] for p, e in zip(predictions, examples)]
+    line = (
+        f"{name:<12} accuracy={np.mean(correct):6.1%} "
+        f"p50={np.percentile(latencies_ms, 50):8.2f}ms p99={np.percentile(latencies_ms, 99):8.2f}ms"
+    )
+    if confident is not None:
+        hits = [ok for c, ok in zip(confident, correct) if c]
+        line += f" coverage={np.mean(confident):6.1%}"
+        line += f" accuracy@threshold={np.mean(hits) if hits else 0:6.1%}"
+    print(line)
+
+
+def bench_local(name, classifier, examples, threshold):
+    classifier.predict("warmup")
+    latencies, predictions, confident = [], [], []
+    for example in examples:
+        start = time.perf_counter()
+        prediction = classifier.predict(example["text"])
+        latencies.append(time.perf_counter() - start)
+        predictions.append(prediction.intent)
+        confident.append(prediction.confidence >= threshold)
+    report(name, latencies, predictions, examples, confident)
+
+
+def bench_llm(examples):
+    from src.chatbot import Chatbot
+
+    chatbot = Chatbot()
+    chatbot.intent_classifier = None
+    latencies, predictions = [], []
+    for example in examples:
+        start = time.perf_counter()
+        predictions.append(chatbot.classify_intent(example["text"]))
+        latencies.append(time.perf_counter() - start)
+    report("llm", latencies, predictions, examples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/intent_eval.json")
+    parser.add_argument("--threshold", type=float, default=INTENT_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--llm", action="store_true", help="So sánh với Gemini (gọi API thật)")
+    args = parser.parse_args()
+
+    examples = load_eval_set(args.data)
+    print(f"{len(examples)} examples, threshold={args.threshold}")
+
+    from sentence_transformers import SentenceTransformer
+
+    # Ngoài server không có vector database: tự tải model embedding cho benchmark
+    encoder = SentenceTransformer("all-MiniLM-L6-v2")
+    keyword = KeywordIntentClassifier()
+    embedding = EmbeddingIntentClassifier(embed=lambda texts: encoder.encode(texts).tolist())
+    bench_local("keyword", keyword, examples, args.threshold)
+    bench_local("embedding", embedding, examples, args.threshold)
+    bench_local("hybrid", CascadeIntentClassifier([keyword, embedding], args.threshold), examples, args.threshold)
+
+    if args.llm:
+        bench_llm(examples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Chi phí xem lịch sử đơn hàng: endpoint /orders/{user_id} (lần đầu, cache hit,
+304 khi client gửi If-None-Match) so với hỏi chatbot "đơn hàng của tôi" như
+trước đây (phân loại ý định + sinh câu trả lời, Gemini giả lập với độ trễ cố định).
+
+    python -m benchmarks.bench_order_history --orders 100000 --llm-latency 0.8
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from tests.conftest import make_orders
+from tests.conftest import FakeGenerativeModel, make_chatbot
+
+
+def percentile_ms(samples, q=50):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+        os.environ.setdefault("ORDERS_AUTH_SECRET", "benchmark")
+        from fastapi.testclient import TestClient
+
+        import main as app_module
+        from src import database
+        from src.models import UserSession
+        from src.order_history import order_access_token
+        from src.order_store import OrderStore
+
+        # Kho đơn hàng tạm, không đụng tới data/orders.db
+        database.order_store = OrderStore(os.path.join(tmp, "orders.db"), database.catalog)
+        rng = random.Random(0)
+        products = database.get_products() or [{"id": 1, "price": 100}]
+        database.order_store.save_orders(make_orders(0, args.orders, args.users, products, rng))
+        client = TestClient(app_module.app)
+        user_ids = [f"u{rng.randrange(args.users)}" for _ in range(args.requests)]
+
+        timings = {"first request": [], "cached": [], "304 not modified": []}
+        for user_id in user_ids:
+            auth = {"Authorization": f"Bearer {order_access_token(user_id)}"}
+            start = time.perf_counter()
+            response = client.get(f"/orders/{user_id}", headers=auth)
+            timings["first request"].append(time.perf_counter() - start)
+            etag = response.headers["etag"]
+
+            start = time.perf_counter()
+            client.get(f"/orders/{user_id}", headers=auth)
+            timings["cached"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            response = client.get(f"/orders/{user_id}", headers={**auth, "If-None-Match": etag})
+            timings["304 not modified"].append(time.perf_counter() - start)
+            assert response.status_code == 304
+
+        for name, samples in timings.items():
+            print(f"/orders {name:<18} p50={percentile_ms(samples):7.2f}ms p99={percentile_ms(samples, 99):7.2f}ms llm_calls=0")
+
+        model = FakeGenerativeModel(latency=args.llm_latency, intent="order_management")
+        chatbot = make_chatbot(model, 0.0)
+        samples = []
+        for user_id in user_ids[:5]:
+            session = UserSession(user_id=user_id)
+            session.context["user_id"] = user_id
+            start = time.perf_counter()
+            asyncio.run(chatbot.aprocess_message("Kiểm tra đơn hàng của tôi", session))
+            samples.append(time.perf_counter() - start)
+        print(f"chat 'đơn hàng của tôi'     p50={percentile_ms(samples):7.2f}ms "
+              f"llm_calls={model.calls / len(samples):.0f}/turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Thời gian lấy đơn hàng của một người dùng khi tổng số đơn tăng dần: OrderStore
+(SQLite, index theo user_id) so với cách cũ lọc cả danh sách đơn bằng list
+comprehension rồi làm giàu từng sản phẩm.
+
+    python -m benchmarks.bench_order_store --sizes 10000,100000,1000000
+
+Cách cũ được đo trên danh sách đã nằm sẵn trong bộ nhớ (không tính thời gian
+json.load cả file ở mỗi request), nên con số thực tế của nó còn cao hơn.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_product_filters import make_products
+from src.database import Catalog
+from src.order_store import OrderStore
+from tests.conftest import make_orders
+
+
+def legacy_user_orders(orders, user_id, catalog):
+    """get_user_orders trước đây, trên bản sao để không sửa danh sách gốc"""
+    user_orders = [json.loads(json.dumps(order)) for order in orders if order["user_id"] == user_id]
+    for order in user_orders:
+        for product in order["products"]:
+            details = catalog.get(product["product_id"])
+            if details:
+                product["title"] = details["title"]
+                default_variation = next((var for var in details["variations"] if var.get("isDefault")), None)
+                if default_variation:
+                    product["variation"] = default_variation["sku"]
+                    product["finalPrice"] = default_variation["finalPrice"]
+    return user_orders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--orders-per-user", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--legacy-lookups", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    rng = random.Random(0)
+    products = make_products(500)
+    with tempfile.TemporaryDirectory() as tmp:
+        products_path = os.path.join(tmp, "products.json")
+        with open(products_path, "w", encoding="utf-8") as f:
+            json.dump(products, f)
+        catalog = Catalog(products_path)
+        store = OrderStore(os.path.join(tmp, "orders.db"), catalog)
+
+        all_orders = []
+        for size in sizes:
+            # Cùng số đơn trung bình mỗi người dùng ở mọi kích thước
+            users = max(size // args.orders_per_user, 1)
+            start = time.perf_counter()
+            while len(all_orders) < size:
+                batch = make_orders(len(all_orders), min(50000, size - len(all_orders)), users, products, rng)
+                store.save_orders(batch)
+                all_orders += batch
+            load_s = time.perf_counter() - start
+
+            user_ids = [f"u{rng.randrange(users)}" for _ in range(args.lookups)]
+            latencies = []
+            for user_id in user_ids:
+                start = time.perf_counter()
+                store.user_orders(user_id, limit=20)
+                latencies.append(time.perf_counter() - start)
+            store_ms = np.array(latencies) * 1000
+
+            legacy = []
+            for user_id in user_ids[:args.legacy_lookups]:
+                start = time.perf_counter()
+                legacy_user_orders(all_orders, user_id, catalog)
+                legacy.append(time.perf_counter() - start)
+            legacy_ms = np.array(legacy) * 1000
+
+            print(
+                f"orders={size:>9,} insert={load_s:6.1f}s "
+                f"store p50={np.percentile(store_ms, 50):6.3f}ms p99={np.percentile(store_ms, 99):6.3f}ms | "
+                f"list scan p50={np.percentile(legacy_ms, 50):9.3f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
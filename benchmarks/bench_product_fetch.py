@@ -0,0 +1,61 @@
+"""
+Benchmark tải catalog từ API giả 50k sản phẩm:
+- legacy: một request limit=1000 (catalog bị cắt cụt)
+- sequential: phân trang tuần tự bằng requests
+- concurrent: afetch_products_from_api (httpx dùng chung kết nối, nhiều trang song song)
+- conditional: chạy lại lần nữa, các trang không đổi trả về 304
+
+    python -m benchmarks.bench_product_fetch --products 50000 --latency 0.05
+"""
+import argparse
+import asyncio
+import shutil
+import time
+
+import requests
+
+from tests.conftest import make_products
+from benchmarks.mock_product_api import serve_products
+from src import database
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="Độ trễ giả lập của server mỗi request (giây)")
+    args = parser.parse_args()
+
+    server, api_url = serve_products({"items": make_products(args.products)}, latency=args.latency)
+    shutil.rmtree(database.API_CACHE_DIR, ignore_errors=True)
+
+    start = time.perf_counter()
+    data = requests.get(api_url, params={"page": 1, "limit": 1000}).json()
+    legacy_count = len(data["data"]["data"])
+    print(f"legacy single request: {time.perf_counter() - start:7.2f}s, {legacy_count} products (truncated)")
+
+    start = time.perf_counter()
+    products, page = [], 1
+    with requests.Session() as session:
+        while True:
+            items = session.get(api_url, params={"page": page, "limit": args.page_size}, timeout=10).json()["data"]["data"]
+            products.extend(items)
+            if len(items) < args.page_size:
+                break
+            page += 1
+    print(f"sequential pages:      {time.perf_counter() - start:7.2f}s, {len(products)} products")
+
+    for label in ("concurrent pages:    ", "conditional re-fetch:"):
+        start = time.perf_counter()
+        products = asyncio.run(database.afetch_products_from_api(
+            api_url, page_size=args.page_size, concurrency=args.concurrency
+        ))
+        print(f"{label}  {time.perf_counter() - start:7.2f}s, {len(products)} products")
+
+    shutil.rmtree(database.API_CACHE_DIR, ignore_errors=True)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
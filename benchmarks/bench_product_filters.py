@@ -0,0 +1,119 @@
+"""
+Recall@5 trên các câu hỏi có ràng buộc (giá, danh mục, giảm giá, tồn kho) với catalog
+tổng hợp: xếp hạng không lọc (như trước đây, để LLM tự lọc 5 kết quả) so với lọc
+trước bằng chỉ mục facets trong Catalog.
+
+    python -m benchmarks.bench_product_filters --products 2000
+
+Recall@5 = số kết quả thỏa ràng buộc trong top-5 / min(5, số sản phẩm thỏa ràng buộc).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from src import database
+from src.product_filters import ProductFilters, product_facets
+
+CATEGORIES = [
+    ("Desks", "desks", "Desk"),
+    ("Sofas", "sofas", "Sofa"),
+    ("Beds", "beds", "Bed"),
+    ("Dining Tables", "dining-tables", "Dining Table"),
+    ("TV Units", "tv-units", "TV Unit"),
+]
+ADJECTIVES = ["Executive", "Nordic", "Milano", "Venice", "Minimalist", "Artisan", "Harmony", "Oak", "Walnut", "Modern"]
+
+# (câu hỏi, ràng buộc đúng)
+QUERIES = [
+    ("bàn làm việc dưới 1000 USD", ProductFilters(max_price=1000, categories=("desks",))),
+    ("desks under $1000 on sale", ProductFilters(max_price=1000, categories=("desks",), on_sale=True)),
+    ("sofa đang giảm giá", ProductFilters(categories=("sofas",), on_sale=True)),
+    ("sofa còn hàng trên $3k", ProductFilters(min_price=3000, categories=("sofas",), in_stock=True)),
+    ("giường từ 1500 đến 2000 usd", ProductFilters(min_price=1500, max_price=2000, categories=("beds",))),
+    ("bàn ăn khuyến mãi còn hàng", ProductFilters(categories=("dining-tables",), on_sale=True, in_stock=True)),
+    ("kệ tivi giá dưới 800", ProductFilters(max_price=800, categories=("tv-units",))),
+    ("sản phẩm dưới 500 USD", ProductFilters(max_price=500)),
+    ("sofa dưới 60 triệu", ProductFilters(max_price=2400, categories=("sofas",))),
+]
+
+
+def make_products(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        name, slug, noun = rng.choice(CATEGORIES)
+        base = rng.randrange(200, 5000, 50)
+        discount = rng.choice([0, 0, 0, 5, 10, 15])
+        variations = []
+        for v in range(rng.randint(1, 4)):
+            price = base + 50 * v
+            variations.append({
+                "sku": f"p{i}-{v}",
+                "price": price,
+                "percentOff": discount,
+                "finalPrice": price * (1 - discount / 100),
+                "inventory": rng.choice([0, 0, 5, 20]),
+                "isDefault": v == 0,
+            })
+        products.append({
+            "id": i,
+            "title": f"{rng.choice(ADJECTIVES)} {noun} {i}",
+            "slug": f"{slug}-{i}",
+            "description": f"A {noun.lower()} for your home.",
+            "price": base,
+            "percentOff": discount,
+            "sold": rng.randint(0, 500),
+            "category": {"id": CATEGORIES.index((name, slug, noun)), "name": name, "slug": slug},
+            "variations": variations,
+        })
+    return products
+
+
+def recall_at_k(results, relevant_ids, k=5):
+    if not relevant_ids:
+        return None
+    hits = sum(1 for product in results[:k] if product["id"] in relevant_ids)
+    return hits / min(k, len(relevant_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    facets = {product["id"]: product_facets(product) for product in products}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "products.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(products, f, ensure_ascii=False)
+        database.catalog.path = path
+        database.catalog.invalidate()
+        database.search_products("warmup")
+
+        rows = {"unfiltered": [], "filtered": []}
+        latencies = {"unfiltered": [], "filtered": []}
+        for query, truth in QUERIES:
+            relevant = {pid for pid, facet in facets.items() if truth.matches(facet)}
+            for name, filters in (("unfiltered", ProductFilters()), ("filtered", None)):
+                start = time.perf_counter()
+                results = database.search_products(query, limit=5, filters=filters)
+                latencies[name].append(time.perf_counter() - start)
+                rows[name].append(recall_at_k(results, relevant))
+            print(f"{query:<32} relevant={len(relevant):4d} "
+                  f"recall@5 unfiltered={rows['unfiltered'][-1]:.2f} filtered={rows['filtered'][-1]:.2f}")
+
+    for name in rows:
+        scores = [score for score in rows[name] if score is not None]
+        latencies_ms = np.array(latencies[name]) * 1000
+        print(f"{name:<10} mean recall@5={np.mean(scores):.3f} p50={np.percentile(latencies_ms, 50):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
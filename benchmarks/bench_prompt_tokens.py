@@ -0,0 +1,81 @@
+"""
+Số token prompt mỗi lượt trong một cuộc hội thoại mẫu (Gemini giả lập, dữ liệu
+đi kèm trong data/): system prompt gửi kèm mỗi prompt và không giới hạn ngân sách
+(như trước đây) so với system_instruction + PROMPT_TOKEN_BUDGET.
+
+    python -m benchmarks.bench_prompt_tokens --budget 1500
+"""
+import argparse
+import asyncio
+import time
+
+from tests.conftest import FakeGenerativeModel, make_chatbot
+from src import database
+from src.intent import KeywordIntentClassifier
+from src.models import UserSession
+from src.prompt_builder import PromptBuilder, product_snippets
+
+CONVERSATION = [
+    "Xin chào",
+    "Gợi ý cho tôi một bộ sofa cho phòng khách",
+    "Sofa nào đang giảm giá?",
+    "Chính sách bảo hành như thế nào?",
+    "Phí ship bao nhiêu?",
+    "Có giường nào dưới 2000 USD không?",
+    "Thời gian giao hàng là bao lâu?",
+    "Bàn ăn nào phù hợp cho gia đình 6 người?",
+]
+
+
+def run(chatbot):
+    session = UserSession(user_id="bench")
+    rows = []
+    for message in CONVERSATION:
+        session.add_message("user", message)
+        response = asyncio.run(chatbot.aprocess_message(message, session))
+        session.add_message("bot", response["message"])
+        rows.append((message, response["prompt_tokens"]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=1500)
+    args = parser.parse_args()
+
+    answer = "Interlux có nhiều lựa chọn phù hợp với nhu cầu của bạn. " * 8
+    configs = {
+        "inline, no budget": dict(include_system_prompt=True, token_budget=10 ** 9),
+        f"system_instruction, budget={args.budget}": dict(include_system_prompt=False, token_budget=args.budget),
+    }
+    results = {}
+    for name, options in configs.items():
+        chatbot = make_chatbot(FakeGenerativeModel(latency=0.0, answer=answer), 0.0, KeywordIntentClassifier())
+        chatbot.search_source = lambda source, message: database.__dict__[f"search_{source}"](message)
+        chatbot.prompt_builder = PromptBuilder(chatbot.system_prompt, **options)
+        results[name] = run(chatbot)
+
+    names = list(results)
+    print(f"{'message':<45}" + "".join(f"{name:>36}" for name in names))
+    for turn, message in enumerate(CONVERSATION):
+        print(f"{message:<45}" + "".join(f"{results[name][turn][1]:>36d}" for name in names))
+    for name in names:
+        tokens = [count for _, count in results[name]]
+        print(f"{name:<40} avg={sum(tokens) / len(tokens):7.0f} max={max(tokens):6d} tokens/turn")
+
+    # Thời gian dựng snippet sản phẩm: lần đầu (dựng cả catalog) so với khi đã có cache
+    start = time.perf_counter()
+    product_snippets._state = (None, {})
+    product_snippets.warm()
+    cold_ms = (time.perf_counter() - start) * 1000
+    products = database.get_products()
+    start = time.perf_counter()
+    for _ in range(1000):
+        for product in products:
+            product_snippets.get(product)
+    warm_us = (time.perf_counter() - start) * 1e6 / (1000 * len(products))
+    print(f"snippets: warm-up {cold_ms:.2f}ms for {len(products)} products, cached lookup {warm_us:.2f}us/product")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Đếm số lần embed truy vấn khi mỗi lượt chat tìm trong cả ba collection
+(truy xuất song song như khi intent chưa chắc chắn), so với cách cũ
+truyền query_texts để Chroma tự embed ở từng collection.
+
+    python -m benchmarks.bench_query_embedding
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import database
+
+QUESTIONS = [
+    "Thời gian giao hàng là bao lâu?",
+    "Chính sách bảo hành như thế nào?",
+    "Gợi ý cho tôi một bộ sofa cho phòng khách nhỏ",
+    "Bàn làm việc này giá bao nhiêu?",
+    "Có dịch vụ lắp đặt không?",
+]
+
+
+class CountingEmbedder:
+    """Giả lập all-MiniLM-L6-v2 với độ trễ cố định cho mỗi batch"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.texts = 0
+
+    def __call__(self, texts):
+        time.sleep(self.latency)
+        self.texts += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeCollection:
+    """Collection giả: embed query_texts giống Chroma, trả về kết quả rỗng"""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=5, where=None, **kwargs):
+        if query_embeddings is None:
+            query_embeddings = self.embedder(query_texts)
+        return {"metadatas": [[{"id": "1", "title": "", "content": "", "question": "", "answer": ""}]]}
+
+
+def run_turns(search_functions, turns: int, seed: int = 0):
+    rng = random.Random(seed)
+    executor = ThreadPoolExecutor(max_workers=len(search_functions))
+    start = time.perf_counter()
+    for _ in range(turns):
+        message = rng.choice(QUESTIONS)
+        futures = [executor.submit(search, message) for search in search_functions]
+        for future in futures:
+            future.result()
+    executor.shutdown()
+    return (time.perf_counter() - start) * 1000 / turns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    embedder = CountingEmbedder(args.latency)
+    collections = [FakeCollection(embedder) for _ in range(3)]
+    database.VECTOR_DB_ENABLED = True
+    database.embedding_function = embedder
+    database.product_collection, database.policy_collection, database.faq_collection = collections
+
+    baseline = [lambda message, c=c: c.query(query_texts=[message], n_results=5) for c in collections]
+    per_turn = run_turns(baseline, args.turns)
+    print(f"query_texts      embedded={embedder.texts:5d} per_turn={per_turn:6.2f}ms")
+
+    embedder.texts = 0
+    database.query_embedding_cache.clear()
+    cached = [database.search_products, database.search_policies, database.search_faqs]
+    per_turn = run_turns(cached, args.turns)
+    stats = database.query_embedding_cache.stats()
+    print(
+        f"query_embeddings embedded={embedder.texts:5d} per_turn={per_turn:6.2f}ms "
+        f"avoided={stats['embeddings_avoided']} hit_rate={stats['hit_rate']:.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Đo tỷ lệ hit và độ trễ của cache câu trả lời khi nhiều khách hàng hỏi cùng
+một câu (giao hàng, bảo hành, lắp đặt...) với Gemini giả lập.
+
+    python -m benchmarks.bench_response_cache
+    python -m benchmarks.bench_response_cache --embed   # so khớp ngữ nghĩa bằng all-MiniLM-L6-v2
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from tests.conftest import FakeGenerativeModel, make_chatbot
+from src.intent import KeywordIntentClassifier
+from src.models import UserSession
+from src.response_cache import SemanticResponseCache
+
+QUESTIONS = [
+    "Thời gian giao hàng là bao lâu?",
+    "thoi gian giao hang la bao lau",
+    "Thời gian giao hàng là bao lâu vậy?",
+    "Có dịch vụ lắp đặt không?",
+    "co dich vu lap dat khong?",
+    "Cửa hàng mở cửa lúc mấy giờ?",
+    "Showroom của Interlux ở đâu?",
+    "Chính sách bảo hành như thế nào?",
+    "chính sách bảo hành như thế nào",
+    "What is your return policy?",
+]
+
+
+async def run(chatbot, turns: int, seed: int = 0):
+    rng = random.Random(seed)
+    latencies = []
+    for turn in range(turns):
+        session = UserSession(user_id=f"user-{turn}")
+        message = rng.choice(QUESTIONS)
+        session.add_message("user", message)
+        start = time.perf_counter()
+        await chatbot.aprocess_message(message, session)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--embed", action="store_true")
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        model = FakeGenerativeModel(latency=args.latency, answer="Giao hàng trong 3-5 ngày làm việc.")
+        chatbot = make_chatbot(model, retrieval_latency=0.002, intent_classifier=KeywordIntentClassifier())
+        if enabled:
+            embed = None
+            if args.embed:
+                from sentence_transformers import SentenceTransformer
+
+                encoder = SentenceTransformer("all-MiniLM-L6-v2")
+                embed = lambda text: encoder.encode([text])[0]
+            chatbot.response_cache = SemanticResponseCache(embed=embed)
+
+        latencies = asyncio.run(run(chatbot, args.turns))
+        line = (
+            f"cache={'on ' if enabled else 'off'} llm_calls={model.calls:4d} "
+            f"p50={np.percentile(latencies, 50):7.2f}ms p99={np.percentile(latencies, 99):7.2f}ms"
+        )
+        if chatbot.response_cache is not None:
+            stats = chatbot.response_cache.stats()
+            line += f" hit_rate={stats['hit_rate']:.1%} entries={stats['entries']}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
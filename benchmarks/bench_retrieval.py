@@ -0,0 +1,83 @@
+"""
+Đánh giá độ liên quan và độ trễ của tìm kiếm từ khóa trên dữ liệu đi kèm
+(data/retrieval_eval.json): so khớp chuỗi con kiểu cũ so với BM25.
+
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --vector   # thêm vector và hybrid (cần model embedding)
+
+hit@k: tỷ lệ truy vấn có ít nhất một kết quả liên quan trong top-k;
+MRR: nghịch đảo thứ hạng của kết quả liên quan đầu tiên.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src import database
+
+SEARCH_FUNCTIONS = {
+    "products": database.search_products,
+    "policies": database.search_policies,
+    "faqs": database.search_faqs,
+}
+LIMITS = {"products": 5, "policies": 3, "faqs": 3}
+
+
+def substring_search(source, query, limit):
+    """Tìm kiếm dự phòng trước đây: query phải là chuỗi con của một trường"""
+    query = query.lower()
+    if source == "products":
+        records, fields = database.get_products(), ("title", "description", "slug")
+    elif source == "policies":
+        records, fields = database.get_policies(), ("title", "content")
+    else:
+        records, fields = database.get_faqs(), ("question", "answer")
+    return [r for r in records if any(query in str(r.get(field, "")).lower() for field in fields)][:limit]
+
+
+def evaluate(name, search, examples):
+    hits, reciprocal_ranks, latencies = [], [], []
+    for example in examples:
+        start = time.perf_counter()
+        results = search(example["source"], example["query"], LIMITS[example["source"]])
+        latencies.append(time.perf_counter() - start)
+        ids = [record["id"] for record in results]
+        ranks = [ids.index(doc_id) + 1 for doc_id in example["relevant"] if doc_id in ids]
+        hits.append(bool(ranks))
+        reciprocal_ranks.append(1.0 / min(ranks) if ranks else 0.0)
+
+    latencies_ms = np.array(latencies) * 1000
+    print(
+        f"{name:<10} hit@k={np.mean(hits):6.1%} MRR={np.mean(reciprocal_ranks):.3f} "
+        f"p50={np.percentile(latencies_ms, 50):7.3f}ms p99={np.percentile(latencies_ms, 99):7.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval", default="data/retrieval_eval.json")
+    parser.add_argument("--vector", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.eval, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+
+    print(f"{len(examples)} queries")
+    evaluate("substring", substring_search, examples)
+
+    bm25 = lambda source, query, limit: SEARCH_FUNCTIONS[source](query, limit)
+    # Lần gọi đầu dựng chỉ mục BM25; không tính vào độ trễ truy vấn
+    for source, search in SEARCH_FUNCTIONS.items():
+        search("warmup")
+    evaluate("bm25", bm25, examples)
+
+    if args.vector and database.init_vector_db():
+        database.HYBRID_SEARCH = False
+        evaluate("vector", bm25, examples)
+        database.HYBRID_SEARCH = True
+        evaluate("hybrid", bm25, examples)
+
+
+if __name__ == "__main__":
+    main()
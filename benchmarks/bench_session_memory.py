@@ -0,0 +1,64 @@
+"""
+Đo bộ nhớ mỗi phiên: UserSession gọn (slots + MessageLog theo cột) so với
+mô hình pydantic cũ (mỗi tin nhắn là một ChatMessage có datetime riêng).
+
+    python -m benchmarks.bench_session_memory --sessions 10000 100000 --messages 10
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel
+
+from src.models import UserSession
+
+
+class LegacyChatMessage(BaseModel):
+    role: Literal["user", "bot"]
+    content: str
+    timestamp: datetime = datetime.now()
+
+
+class LegacyUserSession(BaseModel):
+    user_id: str
+    messages: List[LegacyChatMessage] = []
+    context: Dict = {}
+    last_activity: datetime = datetime.now()
+
+    def add_message(self, role, content):
+        self.messages.append(LegacyChatMessage(role=role, content=content, timestamp=datetime.now()))
+
+
+def measure(factory, sessions: int, messages: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    store = {}
+    for i in range(sessions):
+        session = factory(user_id=f"user-{i}")
+        for m in range(messages):
+            # Nội dung dùng chung để chỉ đo phần overhead của cấu trúc dữ liệu
+            session.add_message("user" if m % 2 == 0 else "bot", "Thời gian giao hàng là bao lâu?")
+        store[session.user_id] = session
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return current / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--messages", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'sessions':>10} {'legacy B/session':>18} {'compact B/session':>18} {'ratio':>7}")
+    for sessions in args.sessions:
+        legacy = measure(LegacyUserSession, sessions, args.messages)
+        compact = measure(UserSession, sessions, args.messages)
+        print(f"{sessions:>10} {legacy:>18.0f} {compact:>18.0f} {legacy / compact:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+So sánh time-to-first-byte giữa aprocess_message (trả về một lần) và
+astream_message (SSE) với một model giả sinh văn bản theo từng chunk.
+
+    python -m benchmarks.bench_streaming --latency 2.0 --chunks 20
+"""
+import argparse
+import asyncio
+import time
+
+from tests.conftest import FakeGenerativeModel, make_chatbot
+from src.models import UserSession
+
+
+async def measure_blocking(chatbot, message: str) -> float:
+    start = time.perf_counter()
+    await chatbot.aprocess_message(message, UserSession(user_id="bench"))
+    return time.perf_counter() - start
+
+
+async def measure_streaming(chatbot, message: str):
+    start = time.perf_counter()
+    first_data = first_delta = None
+    async for event, _ in chatbot.astream_message(message, UserSession(user_id="bench")):
+        elapsed = time.perf_counter() - start
+        if event == "data" and first_data is None:
+            first_data = elapsed
+        elif event == "delta" and first_delta is None:
+            first_delta = elapsed
+    return first_data, first_delta, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0, help="Tổng thời gian sinh câu trả lời (giây)")
+    parser.add_argument("--chunks", type=int, default=20)
+    args = parser.parse_args()
+
+    answer = "Thời gian giao hàng thông thường là 3-5 ngày đối với sản phẩm có sẵn. " * 4
+    model = FakeGenerativeModel(latency=args.latency, answer=answer, chunks=args.chunks)
+    chatbot = make_chatbot(model)
+    message = "Thời gian giao hàng là bao lâu?"
+
+    blocking = asyncio.run(measure_blocking(chatbot, message))
+    first_data, first_delta, total = asyncio.run(measure_streaming(chatbot, message))
+
+    print(f"/chat         time-to-first-byte={blocking * 1000:8.1f}ms")
+    print(f"/chat/stream  first data event   ={first_data * 1000:8.1f}ms")
+    print(f"/chat/stream  first delta event  ={first_delta * 1000:8.1f}ms total={total * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+So sánh độ trễ truy vấn top-k giữa vector index NumPy trong tiến trình và ChromaDB
+(PersistentClient local, HttpClient tới container chroma).
+
+    python -m benchmarks.bench_vector_backends --docs 2000
+    python -m benchmarks.bench_vector_backends --chroma-host localhost --chroma-port 8001
+
+Embedding là vector ngẫu nhiên 384 chiều (cùng kích thước all-MiniLM-L6-v2) để chỉ
+đo phần truy vấn, không đo model embedding.
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from src.vector_index import NumpyCollection
+
+DIMENSIONS = 384
+
+
+def make_corpus(docs: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((docs, DIMENSIONS)).astype(np.float32)
+    query_embeddings = rng.standard_normal((queries, DIMENSIONS)).astype(np.float32)
+    ids = [str(i) for i in range(docs)]
+    metadatas = [{"id": str(i), "title": f"Product {i}", "price": float(i % 2000)} for i in range(docs)]
+    return ids, embeddings, metadatas, query_embeddings
+
+
+def load(collection, ids, embeddings, metadatas, batch_size=1000):
+    start = time.perf_counter()
+    for offset in range(0, len(ids), batch_size):
+        collection.upsert(
+            ids=ids[offset:offset + batch_size],
+            embeddings=embeddings[offset:offset + batch_size].tolist(),
+            documents=[f"doc {i}" for i in ids[offset:offset + batch_size]],
+            metadatas=metadatas[offset:offset + batch_size],
+        )
+    return time.perf_counter() - start
+
+
+def bench(name, collection, query_embeddings, k, load_seconds):
+    collection.query(query_embeddings=query_embeddings[:1].tolist(), n_results=k)
+
+    latencies = []
+    for query in query_embeddings:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+
+    start = time.perf_counter()
+    collection.query(query_embeddings=query_embeddings.tolist(), n_results=k)
+    batched_ms = (time.perf_counter() - start) * 1000 / len(query_embeddings)
+
+    print(
+        f"{name:<18} load={load_seconds:6.2f}s p50={np.percentile(latencies_ms, 50):7.3f}ms "
+        f"p99={np.percentile(latencies_ms, 99):7.3f}ms batched={batched_ms:7.3f}ms/query"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--chroma-host", default=None)
+    parser.add_argument("--chroma-port", default="8001")
+    args = parser.parse_args()
+
+    ids, embeddings, metadatas, query_embeddings = make_corpus(args.docs, args.queries)
+    print(f"docs={args.docs} queries={args.queries} k={args.k}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        collection = NumpyCollection("bench", directory)
+        load_seconds = load(collection, ids, embeddings, metadatas)
+        # Mở lại để truy vấn đi qua ma trận memory-mapped trên đĩa
+        bench("numpy (mmap)", NumpyCollection("bench", directory), query_embeddings, args.k, load_seconds)
+
+    try:
+        import chromadb
+    except ImportError:
+        print("chromadb not installed, skipping Chroma backends")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(path=directory)
+        collection = client.create_collection("bench")
+        load_seconds = load(collection, ids, embeddings, metadatas)
+        bench("chroma persistent", collection, query_embeddings, args.k, load_seconds)
+
+    if args.chroma_host:
+        client = chromadb.HttpClient(host=args.chroma_host, port=args.chroma_port)
+        try:
+            client.delete_collection("bench")
+        except Exception:
+            pass
+        collection = client.create_collection("bench")
+        load_seconds = load(collection, ids, embeddings, metadatas)
+        bench("chroma http", collection, query_embeddings, args.k, load_seconds)
+        client.delete_collection("bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark nạp sản phẩm vào ChromaDB: add từng sản phẩm (cách cũ) so với
+upsert theo lô với embedding theo lô.
+
+    python -m benchmarks.bench_vector_ingest --products 10000 --batch-size 256
+"""
+import argparse
+import time
+
+import chromadb
+from chromadb.utils import embedding_functions
+
+from tests.conftest import make_products
+from src.database import create_product_text_for_embedding
+
+
+def flat_metadata(product):
+    # ChromaDB chỉ nhận giá trị vô hướng trong metadata
+    return {"title": product["title"], "price": product["price"]}
+
+
+def ingest_one_by_one(collection, products):
+    for product in products:
+        collection.add(
+            documents=[create_product_text_for_embedding(product)],
+            metadatas=[flat_metadata(product)],
+            ids=[str(product["id"])]
+        )
+
+
+def ingest_batched(collection, products, embed, batch_size):
+    for offset in range(0, len(products), batch_size):
+        batch = products[offset:offset + batch_size]
+        documents = [create_product_text_for_embedding(product) for product in batch]
+        collection.upsert(
+            ids=[str(product["id"]) for product in batch],
+            documents=documents,
+            embeddings=embed(documents),
+            metadatas=[flat_metadata(product) for product in batch]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--skip-legacy", action="store_true", help="Bỏ qua cách cũ (rất chậm với 10k sản phẩm)")
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    embed = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+    client = chromadb.EphemeralClient()
+
+    if not args.skip_legacy:
+        collection = client.create_collection("legacy", embedding_function=embed)
+        start = time.perf_counter()
+        ingest_one_by_one(collection, products)
+        legacy = time.perf_counter() - start
+        print(f"one-by-one add:        {legacy:8.1f}s ({args.products / legacy:7.0f} products/s)")
+
+    collection = client.create_collection("batched", embedding_function=embed)
+    start = time.perf_counter()
+    ingest_batched(collection, products, embed, args.batch_size)
+    batched = time.perf_counter() - start
+    print(f"batched upsert ({args.batch_size:>4}): {batched:8.1f}s ({args.products / batched:7.0f} products/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+So sánh lưu cả sản phẩm làm metadata trong vector store (cách cũ) với chỉ lưu ID
+và vài trường lọc rồi lấy lại bản ghi từ catalog trong bộ nhớ.
+
+    python -m benchmarks.bench_vector_metadata --products 5000
+
+Đo kích thước store trên đĩa, thời gian truy vấn top-5 (kèm hydrate), số byte
+metadata trả về mỗi truy vấn (tương đương payload HTTP của Chroma) và số byte
+phần ngữ cảnh sản phẩm trong prompt.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_product_filters import make_products
+from src.database import product_vector_metadata
+from src.prompt_builder import format_product_snippet
+from src.vector_index import NumpyCollection
+
+DIMENSIONS = 384
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    for product in products:
+        product["images"] = [
+            {"type": "image", "fileName": f"product/{product['id']}-{n}.jpg",
+             "filePath": f"https://cdn.example.com/product/{product['id']}-{n}.jpg"}
+            for n in range(3)
+        ]
+    by_id = {product["id"]: product for product in products}
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((len(products), DIMENSIONS)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, DIMENSIONS)).astype(np.float32)
+    ids = [str(product["id"]) for product in products]
+
+    layouts = {
+        "full product": (lambda product: product, lambda metadatas: metadatas),
+        "ids + filters": (product_vector_metadata, lambda metadatas: [by_id[m["id"]] for m in metadatas]),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (to_metadata, hydrate) in layouts.items():
+            path = os.path.join(tmp, name.replace(" ", "_"))
+            collection = NumpyCollection("products", path)
+            collection.upsert(ids=ids, embeddings=embeddings, metadatas=[to_metadata(p) for p in products])
+            # Mở lại từ đĩa như khi khởi động ứng dụng
+            start = time.perf_counter()
+            collection = NumpyCollection("products", path)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            latencies, payload_bytes, prompt_bytes = [], [], []
+            for query in queries:
+                start = time.perf_counter()
+                result = collection.query(query_embeddings=[query], n_results=5)
+                records = hydrate(result["metadatas"][0])
+                latencies.append(time.perf_counter() - start)
+                payload_bytes.append(len(json.dumps(result["metadatas"][0], ensure_ascii=False).encode("utf-8")))
+                context = "\n".join(format_product_snippet(product) for product in records)
+                prompt_bytes.append(len(context.encode("utf-8")))
+
+            latencies_ms = np.array(latencies) * 1000
+            print(
+                f"{name:<14} store={directory_size(path) / 1e6:7.2f}MB load={load_ms:7.1f}ms "
+                f"query+hydrate p50={np.percentile(latencies_ms, 50):6.3f}ms "
+                f"payload={np.mean(payload_bytes):7.0f}B/query prompt_context={np.mean(prompt_bytes):6.0f}B"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+API sản phẩm giả chạy cục bộ, cùng định dạng phản hồi với backend Interlux:
+phân trang theo page/limit, trả ETag và 304 khi If-None-Match khớp.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def serve_products(products, latency: float = 0.0, include_total: bool = True, max_limit: int = None):
+    """
+    Chạy server ở cổng ngẫu nhiên; `products` là dict {"items": [...]} để có thể
+    thay đổi dữ liệu khi server đang chạy; `max_limit` giới hạn `limit` như API thật
+    có thể làm. Trả về (server, api_url).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            query = parse_qs(urlparse(self.path).query)
+            page = int(query.get("page", ["1"])[0])
+            limit = int(query.get("limit", ["1000"])[0])
+            if max_limit:
+                limit = min(limit, max_limit)
+            items = products["items"]
+            payload = {"data": items[(page - 1) * limit:page * limit]}
+            if include_total:
+                payload["total"] = len(items)
+
+            body = json.dumps({
+                "statusCode": 200,
+                "message": "Get products successfully",
+                "data": payload
+            }, ensure_ascii=False).encode("utf-8")
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/client/product"
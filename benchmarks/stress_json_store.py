@@ -0,0 +1,176 @@
+"""
+Kiểm tra ghi đồng thời vào một file JSON: nhiều tiến trình x nhiều luồng cùng tăng
+bộ đếm của các bản ghi, đồng thời một luồng đọc liên tục parse file (hoặc đọc lại
+change log).
+
+    python -m benchmarks.stress_json_store --processes 4 --threads 8 --updates 50
+
+- legacy: đọc - sửa - ghi đè bằng open("w") + indent=4 như các hàm add_/update_ trước đây
+- store:  JsonFileStore.update (lock trong tiến trình + flock, ghi tạm rồi os.replace, gộp ghi)
+- changelog: ChangeLog.commit như products/policies/faqs (journal + compact định kỳ)
+
+Kết quả: tổng bộ đếm mong đợi so với thực tế (lost updates), số bản ghi có bộ
+đếm sai, số lần đọc thấy file hỏng/ghi dở (torn reads) và số lần ghi file thực sự.
+Thoát với mã khác 0 nếu store hoặc changelog có bất kỳ sai lệch nào.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from src.change_log import UPSERT, ChangeLog
+from src.json_store import JsonFileStore
+
+RECORDS = 20
+# Compact thường xuyên để các tiến trình khác phải đọc lại snapshot giữa chừng
+COMPACT_EVERY = 50
+
+
+def legacy_increment(path, record_id):
+    with open(path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    for record in records:
+        if record["id"] == record_id:
+            record["count"] += 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=4)
+
+
+def store_increment(store, record_id):
+    def apply(records):
+        for record in records:
+            if record["id"] == record_id:
+                record["count"] += 1
+    store.update(apply)
+
+
+def changelog_increment(log, record_id):
+    def decide(records):
+        record = dict(records[record_id])
+        record["count"] += 1
+        return [(UPSERT, record_id, record)]
+    log.commit(decide)
+
+
+def record_ids(seed, thread_index, updates):
+    return [(seed * 7919 + thread_index * 31 + n) % RECORDS for n in range(updates)]
+
+
+def worker(mode, path, threads, updates, seed, results):
+    store = JsonFileStore(path)
+    log = ChangeLog(path, compact_every=COMPACT_EVERY) if mode == "changelog" else None
+    errors = []
+
+    def run(thread_index):
+        for record_id in record_ids(seed, thread_index, updates):
+            try:
+                if mode == "legacy":
+                    legacy_increment(path, record_id)
+                elif mode == "store":
+                    store_increment(store, record_id)
+                else:
+                    changelog_increment(log, record_id)
+            except Exception:
+                # Cách cũ có thể đọc phải file ghi dở và mất luôn cập nhật này
+                errors.append(1)
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    writes = log.counters["appended"] if log is not None else store.counters["writes"]
+    results.put((len(errors), writes))
+
+
+def reader(mode, path, stop, torn):
+    log = ChangeLog(path, compact_every=COMPACT_EVERY) if mode == "changelog" else None
+    while not stop.is_set():
+        try:
+            if log is not None:
+                # Snapshot + journal đọc được luôn phải đủ RECORDS bản ghi
+                if len(log.records()) != RECORDS:
+                    torn.append(1)
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError, KeyError):
+            torn.append(1)
+        except FileNotFoundError:
+            pass
+
+
+def final_counts(mode, path):
+    try:
+        if mode == "changelog":
+            records = ChangeLog(path).records()
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+    except json.JSONDecodeError:
+        return {}
+    return {record["id"]: record["count"] for record in records}
+
+
+def run_mode(mode, processes, threads, updates):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "records.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"id": i, "count": 0} for i in range(RECORDS)], f)
+
+        stop, torn = threading.Event(), []
+        watcher = threading.Thread(target=reader, args=(mode, path, stop, torn))
+        watcher.start()
+
+        results = multiprocessing.Queue()
+        start = time.perf_counter()
+        pool = [
+            multiprocessing.Process(target=worker, args=(mode, path, threads, updates, seed, results))
+            for seed in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        outcomes = [results.get() for _ in pool]
+        for process in pool:
+            process.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        watcher.join()
+
+        counts = final_counts(mode, path)
+        expected_counts = dict.fromkeys(range(RECORDS), 0)
+        for seed in range(processes):
+            for thread_index in range(threads):
+                for record_id in record_ids(seed, thread_index, updates):
+                    expected_counts[record_id] += 1
+        expected = processes * threads * updates
+        final = sum(counts.values())
+        wrong = sum(counts.get(record_id) != count for record_id, count in expected_counts.items())
+        failed = sum(errors for errors, _ in outcomes)
+        writes = sum(writes for _, writes in outcomes)
+        print(
+            f"{mode:<9} expected={expected:5d} final={final:5d} lost={expected - final:5d} "
+            f"wrong_records={wrong:3d} failed_calls={failed:4d} torn_reads={len(torn):4d} "
+            f"file_writes={writes if mode != 'legacy' else expected - failed:5d} time={elapsed:5.2f}s"
+        )
+        return wrong + failed + len(torn)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    run_mode("legacy", args.processes, args.threads, args.updates)
+    failures = {mode: run_mode(mode, args.processes, args.threads, args.updates) for mode in ("store", "changelog")}
+    if any(failures.values()):
+        raise SystemExit(f"Concurrent writes lost or corrupted updates: {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,32 @@
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, BackgroundTasks, Query, Header
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 from typing import Optional
+import os
+import asyncio
+import secrets
 import uuid
+import json
 import time
-from datetime import datetime, timedelta
 
 from src.chatbot import Chatbot
 from src.models import UserSession
-from src.database import initialize_data_files
+from src.session_store import create_session_store
+from src import ingestion
+from src.database import query_embedding_cache, apply_bulk_changes
+from src.bulk_import import BULK_MODELS, BulkImportError, BulkImportTooLarge, aread_lines, parse_ndjson
+from src.order_history import (
+    order_history, etag_matches, order_access_allowed, order_access_token, ORDERS_PAGE_SIZE, ORDERS_MAX_PAGE_SIZE
+)
 
 load_dotenv()
 
-# Initialize data files
-initialize_data_files()
+# Khóa cho các endpoint /admin (header X-Admin-Key); không đặt thì các endpoint này bị tắt
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
 # Initialize FastAPI app
 app = FastAPI(title="Interlux Chatbot")
@@ -34,40 +44,39 @@ templates = Jinja2Templates(directory="templates")
 
 chatbot = Chatbot()
 
-# Store user sessions with cleanup mechanism
-user_sessions = {}
-SESSION_TIMEOUT = timedelta(hours=24)  # Sessions expire after 24 hours
-
-def cleanup_expired_sessions():
-    """Remove expired sessions to prevent memory overflow"""
-    current_time = datetime.now()
-    expired_sessions = []
+# Session store: in-memory (LRU/TTL) hoặc Redis, chọn qua SESSION_STORE
+session_store = create_session_store()
 
-    for user_id, session in user_sessions.items():
-        if hasattr(session, 'last_activity'):
-            if current_time - session.last_activity > SESSION_TIMEOUT:
-                expired_sessions.append(user_id)
+@app.on_event("startup")
+async def start_session_store():
+    session_store.start()
 
-    for user_id in expired_sessions:
-        del user_sessions[user_id]
+@app.on_event("startup")
+async def start_ingestion():
+    # Kết nối ChromaDB và nạp catalog chạy nền, không chặn việc nhận request
+    app.state.ingestion_task = ingestion.start_background_ingestion()
 
-    if expired_sessions:
-        print(f"Cleaned up {len(expired_sessions)} expired sessions")
+@app.on_event("shutdown")
+async def stop_session_store():
+    await session_store.close()
 
-def get_or_create_session(user_id: str) -> UserSession:
+async def get_or_create_session(user_id: str) -> UserSession:
     """Get existing session or create new one"""
-    if user_id not in user_sessions:
-        user_sessions[user_id] = UserSession(user_id=user_id)
+    session = await session_store.get_or_create(user_id)
 
     # Update last activity
-    session = user_sessions[user_id]
-    session.last_activity = datetime.now()
+    session.last_activity = int(time.time())
+    return session
 
-    # Cleanup expired sessions periodically
-    if len(user_sessions) > 100:  # Cleanup when we have too many sessions
-        cleanup_expired_sessions()
+def new_user_id():
+    """user_id do server tạo cho phiên mới, kèm token xem đơn hàng để client lưu lại"""
+    user_id = str(uuid.uuid4())
+    return user_id, order_access_token(user_id)
 
-    return session
+async def summarize_and_save(session: UserSession):
+    """Tóm tắt lịch sử cũ rồi ghi bản tóm tắt vào phiên đã lưu (chỉ khi có tóm tắt mới)"""
+    if await chatbot.asummarize_history(session):
+        await session_store.save_summary(session)
 
 # Routes
 @app.get("/", response_class=HTMLResponse)
@@ -76,25 +85,149 @@ async def index(request: Request):
 
 @app.post("/chat")
 async def chat(
+    background_tasks: BackgroundTasks,
     message: str = Form(...),
     user_id: Optional[str] = Form(None)
 ):
+    # Chỉ cấp token cho user_id do server tạo; client gửi user_id sẵn có thì đã giữ token của nó
+    orders_token = None
     if not user_id:
-        user_id = str(uuid.uuid4())
+        user_id, orders_token = new_user_id()
 
-    session = get_or_create_session(user_id)
+    session = await get_or_create_session(user_id)
+    turn_start = session.message_count
     session.add_message("user", message)
 
-    structured_response = chatbot.process_message(message, session)
+    structured_response = await chatbot.aprocess_message(message, session)
     session.add_message("bot", structured_response["message"])
+    await session_store.save(session)
+
+    # Tóm tắt lịch sử cũ sau khi đã trả lời, không nằm trên đường phản hồi
+    background_tasks.add_task(summarize_and_save, session)
 
     return {
         "response": structured_response["message"],
         "data": structured_response["data"],
         "user_id": user_id,
-        "history": session.get_messages()
+        "orders_token": orders_token,
+        # Chỉ trả về tin nhắn của lượt này; history_length để client biết vị trí
+        "history": session.get_messages(since=turn_start),
+        "history_length": session.message_count
+    }
+
+@app.get("/orders/{user_id}")
+async def user_orders(
+    request: Request,
+    user_id: str,
+    limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    status: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Lịch sử đơn hàng (mới nhất trước) lấy trực tiếp từ kho đơn hàng, không qua LLM.
+    Cần header "Authorization: Bearer <token>" với token của đúng user_id (xem order_history).
+    """
+    if not order_access_allowed(user_id, authorization):
+        return JSONResponse({"error": "Invalid order access token"}, status_code=401)
+
+    page = await asyncio.to_thread(order_history.get, user_id, limit, offset, status)
+    headers = {"ETag": page.etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(page.body, media_type="application/json", headers=headers)
+
+def bulk_import_ndjson(collection: str, lines):
+    return apply_bulk_changes(collection, parse_ndjson(collection, lines))
+
+@app.post("/admin/{collection}/bulk")
+async def bulk_import(request: Request, collection: str, x_admin_key: Optional[str] = Header(None)):
+    """
+    Thêm/sửa/xóa hàng loạt products, policies hoặc faqs từ body NDJSON, mỗi dòng
+    {"op": "upsert", "record": {...}} hoặc {"op": "delete", "id": ...}. Cả lô được
+    kiểm tra trước và áp dụng trong một lần ghi; có dòng lỗi thì không áp dụng gì.
+    """
+    if not ADMIN_API_KEY:
+        return JSONResponse({"error": "Admin API is disabled"}, status_code=403)
+    if not secrets.compare_digest(x_admin_key or "", ADMIN_API_KEY):
+        return JSONResponse({"error": "Invalid admin key"}, status_code=401)
+    if collection not in BULK_MODELS:
+        return JSONResponse({"error": f"Unknown collection {collection!r}"}, status_code=404)
+
+    start = time.perf_counter()
+    try:
+        lines = await aread_lines(request.stream())
+        counts = await asyncio.to_thread(bulk_import_ndjson, collection, lines)
+    except BulkImportTooLarge as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+    except BulkImportError as e:
+        return JSONResponse({"error": str(e), "errors": e.errors}, status_code=422)
+    return {"collection": collection, **counts, "seconds": round(time.perf_counter() - start, 3)}
+
+@app.get("/health/live")
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    body = {"ready": ingestion.is_ready(), **ingestion.status}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics():
+    stats = chatbot.prompt_stats
+    return {
+        "sessions": await session_store.count(),
+        "prompt": {
+            **stats,
+            "avg_bytes_per_turn": stats["total_bytes"] / stats["turns"] if stats["turns"] else 0,
+            "avg_tokens_per_turn": stats["total_tokens"] / stats["turns"] if stats["turns"] else 0
+        },
+        "response_cache": chatbot.response_cache.stats() if chatbot.response_cache else None,
+        "query_embeddings": query_embedding_cache.stats(),
+        "order_history": order_history.stats()
     }
 
+def sse_event(event: str, data) -> str:
+    """Đóng gói một sự kiện Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(
+    message: str = Form(...),
+    user_id: Optional[str] = Form(None)
+):
+    """
+    Trả lời dạng SSE: "meta" (user_id, orders_token), "data" (thẻ sản phẩm/đơn hàng),
+    nhiều "delta" (đoạn văn bản từ Gemini), cuối cùng là "done".
+    """
+    orders_token = None
+    if not user_id:
+        user_id, orders_token = new_user_id()
+
+    session = await get_or_create_session(user_id)
+    session.add_message("user", message)
+
+    async def event_stream():
+        yield sse_event("meta", {"user_id": user_id, "orders_token": orders_token})
+        try:
+            async for event, payload in chatbot.astream_message(message, session):
+                if event == "done":
+                    session.add_message("bot", payload["message"])
+                    await session_store.save(session)
+                    payload = {"user_id": user_id}
+                yield sse_event(event, payload)
+        except Exception as e:
+            print(f"Error streaming chat response: {e}")
+            yield sse_event("error", {"message": "Sorry, an error occurred. Please try again later."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(summarize_and_save, session)
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,104 @@
+"""
+Nhập / cập nhật hàng loạt products, policies và faqs từ NDJSON (một JSON mỗi dòng).
+
+    {"op": "upsert", "record": {...}}
+    {"op": "delete", "id": ...}
+
+Một dòng không có "op" được hiểu là upsert của chính dòng đó. Bản ghi được kiểm
+tra bằng model pydantic trong models.py và được lưu đúng như gửi lên; chỉ cần
+một dòng lỗi là cả lô bị từ chối. Lô hợp lệ được ghi vào change log trong một commit (xem
+database.apply_bulk_changes) rồi vector database embed theo lô các bản ghi thay đổi.
+"""
+import os
+import json
+from typing import AsyncIterable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from .models import FAQ, Policy, Product
+
+BULK_IMPORT_MAX_RECORDS = int(os.getenv("BULK_IMPORT_MAX_RECORDS", "100000"))
+# Số dòng lỗi tối đa trả về cho client
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "50"))
+
+BULK_MODELS = {"products": Product, "policies": Policy, "faqs": FAQ}
+
+
+class BulkOp(NamedTuple):
+    op: str  # "upsert" | "delete"
+    id: Hashable
+    record: Optional[Dict]
+
+
+class BulkImportError(ValueError):
+    """Lô có dòng không hợp lệ; errors là [{"line", "error"}]"""
+
+    def __init__(self, errors: List[Dict], total_errors: int):
+        super().__init__(f"{total_errors} invalid line(s)")
+        self.errors = errors
+        self.total_errors = total_errors
+
+
+class BulkImportTooLarge(ValueError):
+    pass
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc']) or 'record'}: {detail['msg']}"
+            for detail in error.errors()
+        )
+    return str(error)
+
+
+def parse_ndjson(collection: str, lines: Iterable[Union[str, bytes]], max_records: int = BULK_IMPORT_MAX_RECORDS) -> List[BulkOp]:
+    """Parse và kiểm tra các dòng NDJSON; raise BulkImportError nếu có dòng lỗi"""
+    model = BULK_MODELS[collection]
+    id_adapter = TypeAdapter(model.model_fields["id"].annotation)
+    ops, errors, total_errors = [], [], 0
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        if len(ops) + total_errors >= max_records:
+            raise BulkImportTooLarge(f"More than {max_records} records")
+        try:
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError("Each line must be a JSON object")
+            op = entry.get("op")
+            if op is None:
+                op, entry = "upsert", {"record": entry}
+            if op == "upsert":
+                record = entry.get("record")
+                # Kiểm tra kiểu theo JSON (strict: không nhận "1200" cho số) rồi lưu nguyên bản
+                # ghi gửi lên, không định dạng lại (vd. createdAt) để bản ghi không đổi vẫn giữ nguyên
+                model.model_validate_json(json.dumps(record), strict=True)
+                ops.append(BulkOp("upsert", record["id"], record))
+            elif op == "delete":
+                ops.append(BulkOp("delete", id_adapter.validate_python(entry.get("id")), None))
+            else:
+                raise ValueError(f"Unknown op {op!r} (expected 'upsert' or 'delete')")
+        except (ValueError, ValidationError) as e:
+            total_errors += 1
+            if len(errors) < BULK_IMPORT_MAX_ERRORS:
+                errors.append({"line": line_number, "error": _error_message(e)})
+
+    if total_errors:
+        raise BulkImportError(errors, total_errors)
+    return ops
+
+
+async def aread_lines(chunks: AsyncIterable[bytes], max_lines: int = BULK_IMPORT_MAX_RECORDS) -> List[bytes]:
+    """Tách body dạng stream thành các dòng, dừng sớm khi vượt quá số dòng cho phép"""
+    lines, buffer = [], b""
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        lines.extend(complete)
+        if len(lines) > max_lines:
+            raise BulkImportTooLarge(f"More than {max_lines} records")
+    if buffer.strip():
+        lines.append(buffer)
+    return lines
@@ -0,0 +1,299 @@
+"""
+Nhật ký thay đổi chỉ-ghi-thêm cho products/policies/faqs.
+
+Mỗi file JSON (vd. products.json) là snapshot; mọi thay đổi từng bản ghi được
+ghi thêm thành một dòng vào `<file>.journal` (JSONL: {"op", "id", "record"}),
+nên một lần thêm/sửa/xóa là O(1) thay vì ghi lại cả file. Một commit nhiều thay
+đổi là một dòng {"op": "batch", "changes": [...]}: dòng ghi dở bị bỏ qua nên cả
+lô được áp dụng hoặc không. Khi journal đủ
+CHANGE_LOG_COMPACT_EVERY dòng, trạng thái hiện tại được ghi thành snapshot mới
+và journal được làm rỗng.
+
+ChangeLog giữ trạng thái đã áp dụng trong bộ nhớ và chỉ đọc phần journal mới
+ghi thêm (kể cả do tiến trình khác ghi). Mỗi thay đổi tăng `version`; các chỉ
+mục trong bộ nhớ (Catalog, BM25, snippet, vector database...) gọi
+`delta(version)` để lấy các thay đổi kể từ lần cập nhật trước, và chỉ dựng lại
+toàn bộ khi lịch sử không còn đủ (snapshot bị thay, journal được compact ở
+tiến trình khác...).
+"""
+import os
+import json
+import itertools
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from .json_store import atomic_write_json, dump_json, json_file_store
+
+CHANGE_LOG_COMPACT_EVERY = int(os.getenv("CHANGE_LOG_COMPACT_EVERY", "1000"))
+# Số thay đổi gần nhất giữ lại cho delta(); consumer chậm hơn sẽ dựng lại toàn bộ
+CHANGE_LOG_HISTORY = int(os.getenv("CHANGE_LOG_HISTORY", "10000"))
+CHANGE_LOG_FSYNC = os.getenv("CHANGE_LOG_FSYNC", "true").lower() == "true"
+
+UPSERT = "upsert"
+DELETE = "delete"
+# Một dòng journal chứa nhiều thay đổi ghi trong cùng một commit
+BATCH = "batch"
+
+# Phiên bản dùng chung cho mọi ChangeLog: luôn tăng, nên phiên bản của log này
+# không bao giờ bị nhầm với phiên bản của log khác (vd. khi đổi file catalog)
+_versions = itertools.count(1)
+
+
+class Change(NamedTuple):
+    version: int
+    op: str  # "upsert" | "delete"
+    id: Hashable
+    record: Optional[Dict]
+
+
+def _stat_key(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ChangeLog:
+    def __init__(self, path: str, compact_every: int = CHANGE_LOG_COMPACT_EVERY, history: int = CHANGE_LOG_HISTORY):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_every = compact_every
+        # Dùng chung lock với JsonFileStore của snapshot (thread lock + flock)
+        self.store = json_file_store(path)
+        self._lock = threading.Lock()
+        self._records: Dict[Hashable, Dict] = {}
+        self._list: Optional[List[Dict]] = None
+        self._history: deque = deque(maxlen=history)
+        self.version = 0
+        # delta(since) chỉ trả được các thay đổi khi since >= _base_version (lần đọc lại
+        # toàn bộ gần nhất) và since >= _history_floor (thay đổi cũ nhất đã bị bỏ khỏi lịch sử)
+        self._base_version = 0
+        self._history_floor = 0
+        self._loaded = False
+        self._snapshot_key = None
+        self._journal_inode = None
+        self._offset = 0
+        self._entries = 0
+        self.counters = {"appended": 0, "full_loads": 0, "tailed": 0, "compactions": 0}
+
+    # --- Đọc ---
+
+    def _journal_stat(self):
+        try:
+            return os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+
+    def _needs_full_load(self, journal) -> bool:
+        if not self._loaded or _stat_key(self.path) != self._snapshot_key:
+            return True
+        if journal is None:
+            return self._journal_inode is not None
+        if self._journal_inode is not None and journal.st_ino != self._journal_inode:
+            return True
+        return journal.st_size < self._offset
+
+    def refresh(self):
+        """Đồng bộ trạng thái trong bộ nhớ với snapshot + journal trên đĩa"""
+        journal = self._journal_stat()
+        if self._needs_full_load(journal):
+            # Đọc snapshot và journal trong lock để không lẫn với một lần compact đang chạy
+            with self.store.locked():
+                with self._lock:
+                    self._refresh_locked()
+        elif journal is not None and journal.st_size > self._offset:
+            with self._lock:
+                self._tail()
+
+    def _refresh_locked(self):
+        journal = self._journal_stat()
+        if self._needs_full_load(journal):
+            self._full_load()
+        elif journal is not None and journal.st_size > self._offset:
+            self._tail()
+
+    def _full_load(self):
+        records = self.store.load()
+        if not isinstance(records, list):
+            records = []
+        self._records = {record["id"]: record for record in records}
+        self._snapshot_key = _stat_key(self.path)
+        self._journal_inode, self._offset, self._entries = None, 0, 0
+        if os.path.exists(self.journal_path):
+            self._tail(record_history=False)
+        self.version = next(_versions)
+        self._base_version = self.version
+        self._history_floor = 0
+        self._history.clear()
+        self._list = None
+        self._loaded = True
+        self.counters["full_loads"] += 1
+
+    def _tail(self, record_history: bool = True) -> List[Change]:
+        """Áp các dòng journal mới ghi thêm từ _offset; bỏ qua dòng cuối chưa ghi xong"""
+        with open(self.journal_path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if self._journal_inode is None:
+                self._journal_inode = inode
+            elif inode != self._journal_inode:
+                # Journal vừa được compact ở tiến trình khác: lần refresh sau sẽ đọc lại toàn bộ
+                return []
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        changes = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            for entry in entry["changes"] if entry["op"] == BATCH else (entry,):
+                if entry["op"] == DELETE:
+                    self._records.pop(entry["id"], None)
+                else:
+                    self._records[entry["id"]] = entry["record"]
+                self._entries += 1
+                if record_history:
+                    self.version = next(_versions)
+                    change = Change(self.version, entry["op"], entry["id"], entry.get("record"))
+                    if len(self._history) == self._history.maxlen:
+                        self._history_floor = self._history[0].version
+                    self._history.append(change)
+                    changes.append(change)
+        self._offset += end
+        if changes:
+            self._list = None
+            self.counters["tailed"] += len(changes)
+        return changes
+
+    def current_version(self) -> int:
+        self.refresh()
+        return self.version
+
+    def records(self) -> List[Dict]:
+        """Danh sách bản ghi hiện tại (không được sửa trực tiếp)"""
+        self.refresh()
+        with self._lock:
+            if self._list is None:
+                self._list = list(self._records.values())
+            return self._list
+
+    def get(self, record_id) -> Optional[Dict]:
+        self.refresh()
+        return self._records.get(record_id)
+
+    def delta(self, since: Optional[int]) -> Tuple[int, List[Dict], Optional[List[Change]]]:
+        """
+        (version hiện tại, bản ghi hiện tại, các thay đổi sau phiên bản `since`).
+        Thay đổi là None khi không còn đủ lịch sử: consumer cần dựng lại từ bản ghi.
+        """
+        self.refresh()
+        with self._lock:
+            if self._list is None:
+                self._list = list(self._records.values())
+            if since is None or since < max(self._base_version, self._history_floor) or since > self.version:
+                changes = None
+            else:
+                changes = [change for change in self._history if change.version > since]
+            return self.version, self._list, changes
+
+    # --- Ghi ---
+
+    def commit(self, decide: Callable[[Dict[Hashable, Dict]], List[Tuple[str, Hashable, Optional[Dict]]]]) -> List[Change]:
+        """
+        Gọi decide(bản ghi hiện tại theo id) để lấy danh sách (op, id, record) rồi ghi
+        thêm vào journal trong lock; trả về các Change đã áp dụng (rỗng nếu không có gì).
+        """
+        with self.store.locked():
+            with self._lock:
+                self._refresh_locked()
+                ops = decide(self._records)
+                if not ops:
+                    return []
+                entries = [{"op": op, "id": record_id, "record": record} for op, record_id, record in ops]
+                line = dump_json(entries[0] if len(entries) == 1 else {"op": BATCH, "changes": entries})
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    # Phần sau _offset là dòng ghi dở của một lần ghi bị ngắt: bỏ đi trước khi ghi tiếp
+                    f.truncate(self._offset)
+                    f.write(line + "\n")
+                    f.flush()
+                    if CHANGE_LOG_FSYNC:
+                        os.fsync(f.fileno())
+                changes = self._tail()
+                self.counters["appended"] += len(changes)
+                if self._entries >= self.compact_every:
+                    self._compact_locked()
+                return changes
+
+    def upsert(self, record: Dict, only_if_new: bool = False) -> bool:
+        def decide(records):
+            if only_if_new and record["id"] in records:
+                return []
+            return [(UPSERT, record["id"], record)]
+        return bool(self.commit(decide))
+
+    def replace(self, record_id, record: Dict) -> bool:
+        """Thay bản ghi đã tồn tại (giữ nguyên ID)"""
+        def decide(records):
+            if record_id not in records:
+                return []
+            record["id"] = record_id
+            return [(UPSERT, record_id, record)]
+        return bool(self.commit(decide))
+
+    def delete(self, record_id) -> bool:
+        def decide(records):
+            return [(DELETE, record_id, None)] if record_id in records else []
+        return bool(self.commit(decide))
+
+    def _reset_journal(self):
+        """Thay journal bằng file rỗng (inode mới, để tiến trình khác biết cần đọc lại)"""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8"):
+            pass
+        os.replace(tmp_path, self.journal_path)
+
+    def _compact_locked(self):
+        atomic_write_json(self.path, list(self._records.values()))
+        self._reset_journal()
+        self._snapshot_key = _stat_key(self.path)
+        self._journal_inode = self._journal_stat().st_ino
+        self._offset, self._entries = 0, 0
+        self.counters["compactions"] += 1
+
+    def compact(self):
+        """Ghi trạng thái hiện tại thành snapshot và làm rỗng journal"""
+        with self.store.locked():
+            with self._lock:
+                self._refresh_locked()
+                self._compact_locked()
+
+    def reset(self, records: List[Dict]):
+        """Thay toàn bộ dữ liệu (vd. catalog mới tải từ API): snapshot mới, journal rỗng"""
+        with self.store.locked():
+            with self._lock:
+                atomic_write_json(self.path, records)
+                self._reset_journal()
+                self._full_load()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "version": self.version, "journal_entries": self._entries, "records": len(self._records)}
+
+
+_logs: Dict[str, ChangeLog] = {}
+_logs_lock = threading.Lock()
+
+
+def change_log(path: str) -> ChangeLog:
+    """ChangeLog dùng chung cho mỗi file snapshot"""
+    key = os.path.abspath(path)
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = ChangeLog(path)
+        return log
+
+
+def find_change_log(path: str) -> Optional[ChangeLog]:
+    return _logs.get(os.path.abspath(path))
@@ -1,15 +1,28 @@
 import os
+import json
+import time
+import hashlib
+import asyncio
+import textwrap
 import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 
 from .database import (
     search_products,
     search_policies,
     search_faqs,
-    get_user_orders
+    get_user_orders,
+    embed_query,
+    register_change_listener
 )
 from .models import UserSession
+from .intent import create_intent_classifier, INTENT_CONFIDENCE_THRESHOLD
+from .response_cache import (
+    SemanticResponseCache, RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_HISTORY_MESSAGES, RESPONSE_CACHE_INTENTS
+)
+from .prompt_builder import PromptBuilder, BuiltPrompt
 
 load_dotenv()
 
@@ -20,10 +33,39 @@ if not GOOGLE_API_KEY:
 
 genai.configure(api_key=GOOGLE_API_KEY)
 
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Truy xuất song song cả ba collection trong lúc chờ LLM phân loại ý định
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+LOG_TIMINGS = os.getenv("LOG_TIMINGS", "false").lower() == "true"
+
+RETRIEVAL_SOURCES = {
+    "products": search_products,
+    "policies": search_policies,
+    "faqs": search_faqs,
+}
+
+# intent -> (nguồn dữ liệu, khóa trong context)
+INTENT_SOURCES = {
+    "product_inquiry": ("products", "products"),
+    "policy_inquiry": ("policies", "policies"),
+    "general_question": ("faqs", "faqs"),
+    "product_recommendation": ("products", "recommended_products"),
+}
+
+_retrieval_executor = ThreadPoolExecutor(max_workers=len(RETRIEVAL_SOURCES) * 4)
+
+def _discard_speculative(futures):
+    """Hủy các truy xuất đoán trước không dùng tới; lấy exception của truy xuất đã xong để asyncio không cảnh báo"""
+    for future in futures:
+        if not future.done():
+            future.cancel()
+        elif not future.cancelled():
+            future.exception()
+
 class Chatbot:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-        self.system_prompt = """
+        self.system_prompt = textwrap.dedent("""
         Bạn là trợ lý ảo của Interlux - cửa hàng nội thất cao cấp. Nhiệm vụ của bạn là hỗ trợ khách hàng với các vấn đề sau:
 
         1. Tư vấn bán hàng: Giới thiệu sản phẩm, tính năng, giá cả, và giúp khách hàng tìm sản phẩm phù hợp.
@@ -50,11 +92,36 @@ class Chatbot:
         - KHÔNG đề cập đến hình ảnh hoặc URL trong phản hồi văn bản.
         - Tập trung vào việc cung cấp thông tin hữu ích và tư vấn cho khách hàng.
         - Hệ thống sẽ tự động xử lý việc hiển thị sản phẩm dựa trên ngữ cảnh.
-        """
-
-    def classify_intent(self, message: str) -> str:
-        """Phân loại ý định của người dùng"""
-        prompt = f"""
+        """).strip()
+
+        # Model cho phân loại ý định và tóm tắt (không mang vai trò trợ lý bán hàng)
+        self.task_model = genai.GenerativeModel(GEMINI_MODEL)
+        try:
+            # System prompt tĩnh gửi qua system_instruction thay vì lặp lại trong mỗi prompt
+            self.model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=self.system_prompt)
+            inline_system_prompt = False
+        except TypeError:
+            # google-generativeai < 0.5 chưa hỗ trợ system_instruction
+            self.model = self.task_model
+            inline_system_prompt = True
+        self.prompt_builder = PromptBuilder(self.system_prompt, include_system_prompt=inline_system_prompt)
+        self.intent_classifier = create_intent_classifier()
+        self.intent_threshold = INTENT_CONFIDENCE_THRESHOLD
+        self.speculative_retrieval = SPECULATIVE_RETRIEVAL
+        self.prompt_stats = {
+            "turns": 0, "total_bytes": 0, "max_bytes": 0,
+            "total_tokens": 0, "max_tokens": 0, "trimmed_items": 0, "gemini_prompt_tokens": 0
+        }
+        # user_id của các phiên đang được tóm tắt: mỗi phiên chỉ một lần tóm tắt tại một thời điểm
+        self._summarizing = set()
+        self.response_cache = SemanticResponseCache(embed=embed_query) if RESPONSE_CACHE_ENABLED else None
+        if self.response_cache is not None:
+            # Xóa các câu trả lời đã cache khi products/policies/faqs thay đổi
+            register_change_listener(lambda collection, doc_id: self.response_cache.invalidate(collection))
+
+    def build_intent_prompt(self, message: str) -> str:
+        """Tạo prompt phân loại ý định"""
+        return f"""
         Phân loại ý định của tin nhắn sau vào một trong các danh mục:
         - product_inquiry: Hỏi về sản phẩm, tính năng, giá cả
         - policy_inquiry: Hỏi về chính sách bảo hành, đổi trả, vận chuyển, thanh toán
@@ -67,10 +134,10 @@ class Chatbot:
         Trả về chỉ một danh mục duy nhất.
         """
 
-        response = self.model.generate_content(prompt)
-        intent = response.text.strip().lower()
+    def normalize_intent(self, text: str) -> str:
+        """Chuẩn hóa phản hồi của model về một nhãn ý định"""
+        intent = text.strip().lower()
 
-        # Normalize intent
         if "product_inquiry" in intent:
             return "product_inquiry"
         elif "policy_inquiry" in intent:
@@ -82,141 +149,372 @@ class Chatbot:
         else:
             return "general_question"
 
+    def classify_intent_locally(self, message: str):
+        """Phân loại bằng classifier cục bộ; trả về None nếu không đủ chắc chắn"""
+        if self.intent_classifier is None:
+            return None
+
+        try:
+            prediction = self.intent_classifier.predict(message)
+        except Exception as e:
+            print(f"Error in local intent classifier: {e}")
+            return None
+
+        if prediction.confidence >= self.intent_threshold:
+            return prediction.intent
+        return None
+
+    def classify_intent_with_llm(self, message: str) -> str:
+        """Phân loại ý định bằng Gemini"""
+        response = self.task_model.generate_content(self.build_intent_prompt(message))
+        return self.normalize_intent(response.text)
+
+    async def aclassify_intent_with_llm(self, message: str) -> str:
+        """Phân loại ý định bằng Gemini (async)"""
+        response = await self.task_model.generate_content_async(self.build_intent_prompt(message))
+        return self.normalize_intent(response.text)
+
+    def classify_intent(self, message: str) -> str:
+        """Phân loại ý định của người dùng"""
+        return self.classify_intent_locally(message) or self.classify_intent_with_llm(message)
+
+    async def aclassify_intent(self, message: str) -> str:
+        """Phân loại ý định của người dùng (async)"""
+        intent = await asyncio.to_thread(self.classify_intent_locally, message)
+        return intent or await self.aclassify_intent_with_llm(message)
+
+    def search_source(self, source: str, message: str) -> List[Dict]:
+        """Tìm kiếm trong một nguồn dữ liệu (products, policies, faqs)"""
+        return RETRIEVAL_SOURCES[source](message)
+
     def retrieve_context(self, message: str, intent: str) -> Dict[str, Any]:
         """Truy xuất thông tin liên quan từ cơ sở dữ liệu"""
-        context = {}
+        if intent not in INTENT_SOURCES:
+            return {}
 
-        if intent == "product_inquiry":
-            products = search_products(message)
-            context["products"] = products
+        source, key = INTENT_SOURCES[intent]
+        return {key: self.search_source(source, message)}
 
-        elif intent == "policy_inquiry":
-            policies = search_policies(message)
-            context["policies"] = policies
+    async def aretrieve_context(self, message: str, intent: str) -> Dict[str, Any]:
+        """Truy xuất ngữ cảnh trong thread pool để không chặn event loop"""
+        return await asyncio.to_thread(self.retrieve_context, message, intent)
 
-        elif intent == "general_question":
-            faqs = search_faqs(message)
-            context["faqs"] = faqs
+    def turn_context(self, session: UserSession) -> Dict[str, Any]:
+        """
+        Ngữ cảnh riêng cho một lượt: chỉ mang theo định danh người dùng và
+        các sản phẩm được nhắc gần đây, không tích lũy kết quả truy xuất cũ.
+        """
+        context = {}
+        if "user_id" in session.context:
+            context["user_id"] = session.context["user_id"]
+        if session.recent_products:
+            context["recent_products"] = list(session.recent_products)
+        return context
 
-        elif intent == "product_recommendation":
-            products = search_products(message)
-            context["recommended_products"] = products
+    def build_prompt(self, message: str, session: UserSession, context: Dict[str, Any], intent: Optional[str] = None) -> BuiltPrompt:
+        """Tạo prompt trả lời từ ngữ cảnh và lịch sử trò chuyện trong ngân sách token"""
+        return self.prompt_builder.build(message, session, context, intent)
 
-        return context
+    def build_response_data(self, intent: str, context: Dict[str, Any]) -> List[Dict]:
+        """Dữ liệu có cấu trúc (thẻ sản phẩm, đơn hàng) đi kèm phản hồi"""
+        if intent in ["product_inquiry", "product_recommendation"] and "products" in context:
+            return self.format_products_data(context["products"])
+        elif intent == "product_recommendation" and "recommended_products" in context:
+            return self.format_products_data(context["recommended_products"])
+        elif intent == "order_management" and "orders" in context:
+            return self.format_orders_data(context["orders"])
+        return []
 
-    def format_product_info(self, product):
-        """Helper function to format product information"""
-        info = f"- Tên: {product['title']}\n"
-        info += f"  Mô tả: {product.get('description', 'Không có mô tả')}\n"
-        info += f"  Giá: {product['price']} USD"
-        if product.get('percentOff', 0) > 0:
-            info += f" (Giảm giá: {product['percentOff']}%)\n"
-        else:
-            info += "\n"
-
-        if "category" in product and "name" in product["category"]:
-            info += f"  Danh mục: {product['category']['name']}\n"
-
-        if "variations" in product and product["variations"]:
-            info += "  Biến thể:\n"
-            for variation in product["variations"][:3]:
-                info += f"    * {variation.get('sku', 'Không xác định')}: {variation.get('price', 0)} USD"
-                if variation.get('percentOff', 0) > 0:
-                    info += f" (Giảm giá: {variation['percentOff']}%)"
-                info += "\n"
-
-
-        return info
-
-    def format_context_for_prompt(self, context: Dict[str, Any]) -> str:
-        """Định dạng ngữ cảnh để đưa vào prompt"""
-        formatted_context = "Thông tin từ cơ sở dữ liệu:\n"
-
-        if "products" in context and context["products"]:
-            formatted_context += "\nSản phẩm:\n"
-            for product in context["products"]:
-                formatted_context += self.format_product_info(product)
-
-        if "policies" in context and context["policies"]:
-            formatted_context += "\nChính sách:\n"
-            for policy in context["policies"]:
-                formatted_context += f"- {policy['title']}: {policy['content']}\n"
-
-        if "faqs" in context and context["faqs"]:
-            formatted_context += "\nCâu hỏi thường gặp:\n"
-            for faq in context["faqs"]:
-                formatted_context += f"- Câu hỏi: {faq['question']}\n"
-                formatted_context += f"  Trả lời: {faq['answer']}\n"
-
-        if "recommended_products" in context and context["recommended_products"]:
-            formatted_context += "\nSản phẩm được đề xuất:\n"
-            for product in context["recommended_products"]:
-                formatted_context += self.format_product_info(product)
-
-        if "orders" in context and context["orders"]:
-            formatted_context += "\nĐơn hàng:\n"
-            for order in context["orders"]:
-                formatted_context += f"- Mã đơn hàng: {order['id']}\n"
-                formatted_context += f"  Trạng thái: {order['status']}\n"
-                formatted_context += f"  Tổng tiền: {order['total_amount']} USD\n"
-                formatted_context += "  Sản phẩm:\n"
-                for product in order["products"]:
-                    formatted_context += f"    + {product.get('title', 'Sản phẩm')} - Số lượng: {product['quantity']}"
-                    if "variation" in product:
-                        formatted_context += f" - Biến thể: {product['variation']}"
-                    if "finalPrice" in product:
-                        formatted_context += f" - Giá: {product['finalPrice']} USD"
-                    formatted_context += "\n"
-
-        return formatted_context
+    def build_structured_response(self, message_text: str, intent: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Đóng gói phản hồi văn bản cùng dữ liệu có cấu trúc"""
+        return {
+            "message": message_text,
+            "data": self.build_response_data(intent, context)
+        }
+
+    def record_prompt_size(self, prompt: BuiltPrompt) -> int:
+        """Đếm số byte/token prompt của lượt hiện tại và cộng dồn vào thống kê"""
+        prompt_bytes = len(prompt.text.encode("utf-8"))
+        stats = self.prompt_stats
+        stats["turns"] += 1
+        stats["total_bytes"] += prompt_bytes
+        stats["max_bytes"] = max(stats["max_bytes"], prompt_bytes)
+        stats["total_tokens"] += prompt.tokens
+        stats["max_tokens"] = max(stats["max_tokens"], prompt.tokens)
+        stats["trimmed_items"] += sum(prompt.trimmed.values())
+        return prompt_bytes
+
+    def record_usage(self, response):
+        """Cộng số token prompt Gemini báo về (usage_metadata), nếu SDK có trả về"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_stats["gemini_prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+
+    def response_cache_key(self, message: str, session: UserSession, intent: str, context: Dict[str, Any]) -> Optional[str]:
+        """
+        Hash của ngữ cảnh truy xuất được và RESPONSE_CACHE_HISTORY_MESSAGES tin nhắn gần
+        nhất trước tin nhắn hiện tại. Bản tóm tắt và phần lịch sử cũ hơn không tính: các
+        intent được cache (chính sách, câu hỏi chung) chỉ phụ thuộc vào lượt ngay trước
+        (câu hỏi nối tiếp), nên câu hỏi lặp lại ở lượt sau của một phiên khác vẫn dùng
+        lại được câu trả lời. None nếu intent này không được cache.
+        """
+        if self.response_cache is None or intent not in RESPONSE_CACHE_INTENTS or intent not in INTENT_SOURCES:
+            return None
+        _, key = INTENT_SOURCES[intent]
+        history = [[msg.role, msg.content] for msg in session.messages]
+        # Tin nhắn hiện tại đã được thêm vào phiên trước khi xử lý
+        if history and history[-1] == ["user", message]:
+            history.pop()
+        recent = history[len(history) - RESPONSE_CACHE_HISTORY_MESSAGES:] if RESPONSE_CACHE_HISTORY_MESSAGES > 0 else []
+        payload = json.dumps([context.get(key, []), recent], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup_cached_response(self, message: str, session: UserSession, intent: str, context: Dict[str, Any]) -> Optional[str]:
+        context_hash = self.response_cache_key(message, session, intent, context)
+        if context_hash is None:
+            return None
+        try:
+            return self.response_cache.lookup(message, intent, context_hash)
+        except Exception as e:
+            print(f"Error looking up response cache: {e}")
+            return None
+
+    def store_cached_response(self, message: str, session: UserSession, intent: str, context: Dict[str, Any], response_text: str):
+        context_hash = self.response_cache_key(message, session, intent, context)
+        if context_hash is None or not response_text:
+            return
+        try:
+            self.response_cache.store(message, intent, context_hash, INTENT_SOURCES[intent][0], response_text)
+        except Exception as e:
+            print(f"Error storing response cache: {e}")
+
+    def log_timings(self, intent: str, timings: Dict[str, float], prompt_bytes: int, prompt_tokens: int = 0):
+        if LOG_TIMINGS:
+            stages = " ".join(f"{stage}={ms:.1f}ms" for stage, ms in timings.items())
+            print(f"[timings] intent={intent} prompt_bytes={prompt_bytes} prompt_tokens={prompt_tokens} {stages}")
 
     def process_message(self, message: str, session: UserSession) -> Dict[str, Any]:
         """Xử lý tin nhắn từ người dùng và trả về phản hồi có cấu trúc"""
-        intent = self.classify_intent(message)
+        timings = {}
+        started = stage_start = time.perf_counter()
+
+        intent = self.classify_intent_locally(message)
+        speculative = None
+        if intent is None:
+            # Chưa chắc ý định: vừa hỏi LLM vừa truy xuất trước cả ba nguồn
+            if self.speculative_retrieval:
+                speculative = {
+                    source: _retrieval_executor.submit(self.search_source, source, message)
+                    for source in RETRIEVAL_SOURCES
+                }
+            intent = self.classify_intent_with_llm(message)
+        timings["classify"] = (time.perf_counter() - stage_start) * 1000
 
-        context = session.context
+        stage_start = time.perf_counter()
+        context = self.turn_context(session)
         if intent == "order_management" and "user_id" in context:
             print("Order management")
             user_id = context["user_id"]
             orders = get_user_orders(user_id)
             context["orders"] = orders
 
-        retrieved_context = self.retrieve_context(message, intent)
+        if speculative is not None:
+            retrieved_context = {}
+            if intent in INTENT_SOURCES:
+                source, key = INTENT_SOURCES[intent]
+                retrieved_context[key] = speculative[source].result()
+            for future in speculative.values():
+                future.cancel()
+        else:
+            retrieved_context = self.retrieve_context(message, intent)
         context.update(retrieved_context)
-        session.context = context
-        formatted_context = self.format_context_for_prompt(context)
-        chat_history = session.get_chat_history()
+        session.remember_products(context.get("products") or context.get("recommended_products") or [])
+        timings["retrieve"] = (time.perf_counter() - stage_start) * 1000
+
+        stage_start = time.perf_counter()
+        response_text = self.lookup_cached_response(message, session, intent, context)
+        cached = response_text is not None
+        prompt_bytes = prompt_tokens = 0
+        if not cached:
+            prompt = self.build_prompt(message, session, context, intent)
+            prompt_bytes, prompt_tokens = self.record_prompt_size(prompt), prompt.tokens
+            response = self.model.generate_content(prompt.text)
+            self.record_usage(response)
+            response_text = response.text.strip()
+            self.store_cached_response(message, session, intent, context, response_text)
+        timings["generate"] = (time.perf_counter() - stage_start) * 1000
+        timings["total"] = (time.perf_counter() - started) * 1000
+        self.log_timings(intent, timings, prompt_bytes, prompt_tokens)
+
+        structured_response = self.build_structured_response(response_text, intent, context)
+        structured_response["timings"] = timings
+        structured_response["prompt_bytes"] = prompt_bytes
+        structured_response["prompt_tokens"] = prompt_tokens
+        structured_response["cached"] = cached
+        return structured_response
 
-        # Tạo prompt
-        prompt = f"""
-        {self.system_prompt}
+    async def aprepare_context(self, message: str, session: UserSession, timings: Dict[str, float]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Phân loại ý định và truy xuất ngữ cảnh (async), ghi thời gian từng bước vào timings.
+
+        Khi phải chờ LLM phân loại, cả ba nguồn được truy xuất đoán trước trong
+        _retrieval_executor. Truy xuất không dùng tới (hoặc khi LLM lỗi) bị hủy, nhưng
+        một thread đã bắt đầu chạy thì không dừng được: nó chạy tới hết và kết quả bị
+        bỏ. Executor riêng có số thread cố định nên các truy xuất thừa đó không chiếm
+        thread pool mặc định.
+        """
+        stage_start = time.perf_counter()
+
+        intent = await asyncio.to_thread(self.classify_intent_locally, message)
+        speculative: Optional[Dict[str, asyncio.Future]] = None
+        try:
+            if intent is None:
+                if self.speculative_retrieval:
+                    loop = asyncio.get_running_loop()
+                    speculative = {
+                        source: loop.run_in_executor(_retrieval_executor, self.search_source, source, message)
+                        for source in RETRIEVAL_SOURCES
+                    }
+                intent = await self.aclassify_intent_with_llm(message)
+            timings["classify"] = (time.perf_counter() - stage_start) * 1000
+
+            stage_start = time.perf_counter()
+            context = self.turn_context(session)
+            if intent == "order_management" and "user_id" in context:
+                user_id = context["user_id"]
+                orders = await asyncio.to_thread(get_user_orders, user_id)
+                context["orders"] = orders
+
+            if speculative is not None:
+                retrieved_context = {}
+                if intent in INTENT_SOURCES:
+                    source, key = INTENT_SOURCES[intent]
+                    retrieved_context[key] = await speculative.pop(source)
+            else:
+                retrieved_context = await self.aretrieve_context(message, intent)
+        finally:
+            if speculative is not None:
+                _discard_speculative(speculative.values())
+        context.update(retrieved_context)
+        session.remember_products(context.get("products") or context.get("recommended_products") or [])
+        timings["retrieve"] = (time.perf_counter() - stage_start) * 1000
 
-        {formatted_context}
+        return intent, context
 
-        Lịch sử trò chuyện:
-        {chat_history}
+    async def aprocess_message(self, message: str, session: UserSession) -> Dict[str, Any]:
+        """
+        Phiên bản async của process_message.
+        Gọi Gemini qua client async, truy vấn ChromaDB/file JSON trong thread pool
+        để một worker có thể phục vụ nhiều cuộc hội thoại cùng lúc.
+        """
+        timings = {}
+        started = time.perf_counter()
+        intent, context = await self.aprepare_context(message, session, timings)
+
+        stage_start = time.perf_counter()
+        response_text = await asyncio.to_thread(self.lookup_cached_response, message, session, intent, context)
+        cached = response_text is not None
+        prompt_bytes = prompt_tokens = 0
+        if not cached:
+            prompt = self.build_prompt(message, session, context, intent)
+            prompt_bytes, prompt_tokens = self.record_prompt_size(prompt), prompt.tokens
+            response = await self.model.generate_content_async(prompt.text)
+            self.record_usage(response)
+            response_text = response.text.strip()
+            await asyncio.to_thread(self.store_cached_response, message, session, intent, context, response_text)
+        timings["generate"] = (time.perf_counter() - stage_start) * 1000
+        timings["total"] = (time.perf_counter() - started) * 1000
+        self.log_timings(intent, timings, prompt_bytes, prompt_tokens)
+
+        structured_response = self.build_structured_response(response_text, intent, context)
+        structured_response["timings"] = timings
+        structured_response["prompt_bytes"] = prompt_bytes
+        structured_response["prompt_tokens"] = prompt_tokens
+        structured_response["cached"] = cached
+        return structured_response
 
-        Tin nhắn mới nhất của khách hàng: {message}
+    async def astream_message(self, message: str, session: UserSession) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Xử lý tin nhắn và trả về các sự kiện theo thứ tự:
+        ("data", [...]) ngay khi truy xuất xong, ("delta", "...") cho từng đoạn văn bản
+        Gemini sinh ra, và cuối cùng ("done", {"message": ..., "timings": ...}).
+        """
+        timings = {}
+        started = time.perf_counter()
+        intent, context = await self.aprepare_context(message, session, timings)
+        yield "data", self.build_response_data(intent, context)
+
+        stage_start = time.perf_counter()
+        cached_text = await asyncio.to_thread(self.lookup_cached_response, message, session, intent, context)
+        if cached_text is not None:
+            # Câu trả lời đã có trong cache: gửi một lần, không gọi Gemini
+            timings["first_token"] = timings["generate"] = (time.perf_counter() - stage_start) * 1000
+            timings["total"] = (time.perf_counter() - started) * 1000
+            self.log_timings(intent, timings, 0)
+            yield "delta", cached_text
+            yield "done", {"message": cached_text, "timings": timings, "prompt_bytes": 0, "prompt_tokens": 0, "cached": True}
+            return
+
+        prompt = self.build_prompt(message, session, context, intent)
+        prompt_bytes = self.record_prompt_size(prompt)
+        response = await self.model.generate_content_async(prompt.text, stream=True)
+
+        chunks = []
+        async for chunk in response:
+            if "first_token" not in timings:
+                timings["first_token"] = (time.perf_counter() - stage_start) * 1000
+            text = chunk.text
+            if text:
+                chunks.append(text)
+                yield "delta", text
+
+        self.record_usage(response)
+        timings["generate"] = (time.perf_counter() - stage_start) * 1000
+        timings["total"] = (time.perf_counter() - started) * 1000
+        self.log_timings(intent, timings, prompt_bytes, prompt.tokens)
+
+        response_text = "".join(chunks).strip()
+        await asyncio.to_thread(self.store_cached_response, message, session, intent, context, response_text)
+        yield "done", {
+            "message": response_text, "timings": timings,
+            "prompt_bytes": prompt_bytes, "prompt_tokens": prompt.tokens, "cached": False
+        }
 
-        Trả lời:
+    async def asummarize_history(self, session: UserSession) -> bool:
         """
+        Gộp các tin nhắn cũ vào bản tóm tắt của phiên để lịch sử không tăng mãi.
+        Trả về True nếu bản tóm tắt đã được áp dụng vào session.
+        """
+        pending = session.pending_summary_messages()
+        if not pending or session.user_id in self._summarizing:
+            return False
+        # Số thứ tự tuyệt đối của tin nhắn đầu tiên không được gộp: các lượt mới thêm
+        # trong lúc chờ LLM không làm lệch phần cần bỏ
+        until = session.first_message_index() + len(pending)
+
+        transcript = "\n".join(f"{msg.role.capitalize()}: {msg.content}" for msg in pending)
+        prompt = f"""
+        Tóm tắt ngắn gọn (tối đa 5 câu) cuộc trò chuyện giữa khách hàng và trợ lý Interlux.
+        Giữ lại nhu cầu, sản phẩm, đơn hàng và thông tin khách hàng đã cung cấp.
 
-        response = self.model.generate_content(prompt)
-        message_text = response.text.strip()
+        Tóm tắt trước đó:
+        {session.summary or "(chưa có)"}
 
-        structured_response = {
-            "message": message_text,
-            "data": []
-        }
+        Các tin nhắn mới cần gộp:
+        {transcript}
 
-        if intent in ["product_inquiry", "product_recommendation"] and "products" in context:
-            structured_response["data"] = self.format_products_data(context["products"])
-        elif intent == "product_recommendation" and "recommended_products" in context:
-            structured_response["data"] = self.format_products_data(context["recommended_products"])
-        elif intent == "order_management" and "orders" in context:
-            structured_response["data"] = self.format_orders_data(context["orders"])
+        Tóm tắt:
+        """
 
-        return structured_response
+        self._summarizing.add(session.user_id)
+        try:
+            response = await self.task_model.generate_content_async(prompt)
+            return session.apply_summary(response.text.strip(), until)
+        except Exception as e:
+            print(f"Error summarizing chat history: {e}")
+            return False
+        finally:
+            self._summarizing.discard(session.user_id)
 
     def format_products_data(self, products: List[Dict]) -> List[Dict]:
         """Format products data for structured response"""
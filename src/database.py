@@ -1,14 +1,67 @@
 import os
 import json
-import requests
+import math
+import time
+import asyncio
+import bisect
+import hashlib
+import threading
+import httpx
+from collections import OrderedDict
+from contextlib import nullcontext
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
-from datetime import datetime
+
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+from .order_store import OrderStore
+from .json_store import atomic_write_json, json_file_store
+from .change_log import UPSERT, change_log, find_change_log
+from .product_filters import ProductFilters, extract_product_filters, product_facets
 
 load_dotenv()
 
-# Try to import ChromaDB
-try:
+# ChromaDB được khởi tạo lười qua init_vector_db() (chạy nền khi ứng dụng khởi động),
+# cho tới lúc đó các hàm search_* dùng tìm kiếm từ khóa
+VECTOR_DB_ENABLED = False
+client = None
+embedding_function = None
+product_collection = None
+policy_collection = None
+faq_collection = None
+_vector_db_lock = threading.Lock()
+_vector_db_initialized = False
+
+# "chroma" (ChromaDB qua HTTP hoặc file local) hoặc "numpy" (vector index trong tiến trình)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "./data/vector_index")
+
+def _get_or_create_collection(name):
+    if VECTOR_BACKEND == "numpy":
+        from .vector_index import NumpyCollection
+
+        return NumpyCollection(name, VECTOR_INDEX_PATH, embedding_function)
+
+    try:
+        collection = client.get_collection(name)
+        print(f"Found existing {name} collection")
+    except:
+        print(f"Creating new {name} collection")
+        collection = client.create_collection(
+            name=name,
+            embedding_function=embedding_function
+        )
+    return collection
+
+def _init_numpy_backend():
+    global embedding_function
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    embedding_function = lambda texts: model.encode(list(texts)).tolist()
+    print(f"Using in-process vector index at {VECTOR_INDEX_PATH}")
+
+def _init_chroma_backend():
+    global client, embedding_function
     import chromadb
     from chromadb.utils import embedding_functions
 
@@ -29,57 +82,73 @@ try:
         model_name="all-MiniLM-L6-v2"
     )
 
-    # Create collections if they don't exist
-    try:
-        product_collection = client.get_collection("products")
-        print("Found existing products collection")
-    except:
-        print("Creating new products collection")
-        product_collection = client.create_collection(
-            name="products",
-            embedding_function=embedding_function
-        )
+def init_vector_db():
+    """Kết nối vector database và tải model embedding (chỉ chạy một lần). Trả về VECTOR_DB_ENABLED."""
+    global VECTOR_DB_ENABLED
+    global product_collection, policy_collection, faq_collection, _vector_db_initialized
 
-    try:
-        policy_collection = client.get_collection("policies")
-        print("Found existing policies collection")
-    except:
-        print("Creating new policies collection")
-        policy_collection = client.create_collection(
-            name="policies",
-            embedding_function=embedding_function
-        )
+    with _vector_db_lock:
+        if _vector_db_initialized:
+            return VECTOR_DB_ENABLED
+        _vector_db_initialized = True
 
-    try:
-        faq_collection = client.get_collection("faqs")
-        print("Found existing faqs collection")
-    except:
-        print("Creating new faqs collection")
-        faq_collection = client.create_collection(
-            name="faqs",
-            embedding_function=embedding_function
-        )
+        try:
+            if VECTOR_BACKEND == "numpy":
+                _init_numpy_backend()
+            else:
+                _init_chroma_backend()
 
-    print("ChromaDB initialized successfully!")
-    VECTOR_DB_ENABLED = True
+            # Create collections if they don't exist
+            product_collection = _get_or_create_collection("products")
+            policy_collection = _get_or_create_collection("policies")
+            faq_collection = _get_or_create_collection("faqs")
+
+            print(f"Vector database ({VECTOR_BACKEND}) initialized successfully!")
+            VECTOR_DB_ENABLED = True
+
+        except Exception as e:
+            print(f"Error initializing vector database: {e}")
+            print("Falling back to simple keyword search...")
+            VECTOR_DB_ENABLED = False
 
-except Exception as e:
-    print(f"Error initializing ChromaDB: {e}")
-    print("Falling back to simple keyword search...")
-    VECTOR_DB_ENABLED = False
+        return VECTOR_DB_ENABLED
+
+# Số document embed và ghi vào ChromaDB trong một lần gọi
+VECTOR_BATCH_SIZE = int(os.getenv("VECTOR_BATCH_SIZE", "256"))
 
 # Sample data storage (in a real application, this would be a database)
 DATA_DIR = "./data"
 PRODUCTS_FILE = f"{DATA_DIR}/products.json"
 USERS_FILE = f"{DATA_DIR}/users.json"
 ORDERS_FILE = f"{DATA_DIR}/orders.json"
+ORDERS_DB_FILE = os.getenv("ORDERS_DB_FILE", f"{DATA_DIR}/orders.db")
 POLICIES_FILE = f"{DATA_DIR}/policies.json"
 FAQS_FILE = f"{DATA_DIR}/faqs.json"
+# Hash nội dung của từng sản phẩm đã nạp vào vector database
+VECTOR_MANIFEST_FILE = f"{DATA_DIR}/vector_manifest.json"
+PRODUCTS_API_URL = os.getenv(
+    "PRODUCTS_API_URL",
+    "https://interlux-be-dwbhhhf7gkemhzbm.eastasia-01.azurewebsites.net/api/v1/client/product"
+)
+PRODUCTS_API_PAGE_SIZE = int(os.getenv("PRODUCTS_API_PAGE_SIZE", "200"))
+PRODUCTS_API_CONCURRENCY = int(os.getenv("PRODUCTS_API_CONCURRENCY", "4"))
+PRODUCTS_API_TIMEOUT = float(os.getenv("PRODUCTS_API_TIMEOUT", "10"))
+PRODUCTS_API_RETRIES = int(os.getenv("PRODUCTS_API_RETRIES", "3"))
+PRODUCTS_API_BACKOFF = float(os.getenv("PRODUCTS_API_BACKOFF", "0.5"))
+# Trang API đã tải kèm ETag/Last-Modified, dùng cho request có điều kiện
+API_CACHE_DIR = f"{DATA_DIR}/api_cache"
 
 # Create data directory if it doesn't exist
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # Helper functions
+def product_vector_metadata(product):
+    """
+    Metadata lưu trong vector database: chỉ ID và các trường lọc vô hướng (giá, giảm giá,
+    tồn kho, danh mục). Nội dung đầy đủ được lấy lại từ catalog trong bộ nhớ khi tìm kiếm.
+    """
+    return {"id": product["id"], **product_facets(product)._asdict()}
+
 def create_product_text_for_embedding(product):
     """Create text representation of product for embedding"""
     category_name = product["category"]["name"] if "category" in product and "name" in product["category"] else "Unknown"
@@ -94,9 +163,15 @@ def create_product_text_for_embedding(product):
     return product_text
 
 def save_json_file(file_path, data):
-    """Save data to JSON file"""
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    """
+    Ghi đè file JSON (ghi nguyên tử, dùng chung lock với các thao tác sửa từng bản ghi).
+    Với file có change log (products/policies/faqs), journal cũng được làm rỗng.
+    """
+    log = find_change_log(file_path)
+    if log is not None:
+        log.reset(data)
+    else:
+        json_file_store(file_path).replace(data)
 
 def load_json_file(file_path):
     """Load data from JSON file"""
@@ -106,30 +181,484 @@ def load_json_file(file_path):
     except FileNotFoundError:
         return []
 
+# Các hàm được gọi khi products/policies/faqs thay đổi (vd. để xóa cache câu trả lời)
+_change_listeners = []
+
+def register_change_listener(listener):
+    """Đăng ký listener(collection_name, doc_id) được gọi sau mỗi thay đổi dữ liệu"""
+    _change_listeners.append(listener)
+
+def notify_data_changed(collection_name, doc_id=None):
+    for listener in _change_listeners:
+        try:
+            listener(collection_name, doc_id)
+        except Exception as e:
+            print(f"Error in data change listener: {e}")
+
+def _as_list(vector):
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+# Số embedding truy vấn gần đây được giữ lại trong bộ nhớ
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+
+class QueryEmbeddingCache:
+    """
+    LRU embedding của các câu truy vấn gần đây. Dùng chung cho products, policies,
+    faqs, cache câu trả lời và bộ phân loại ý định nên mỗi tin nhắn chỉ embed một lần.
+    """
+
+    def __init__(self, max_entries=QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get_many(self, texts, embed):
+        """
+        Trả về embedding cho từng text; chỉ gọi embed (một batch) cho các text chưa có.
+        Nếu một thread khác đang embed cùng text (truy xuất song song ba collection),
+        chờ kết quả của thread đó thay vì embed lại.
+        """
+        results = {}
+        to_compute, to_wait = [], {}
+        with self._lock:
+            for text in dict.fromkeys(texts):
+                if text in self._entries:
+                    self._entries.move_to_end(text)
+                    results[text] = self._entries[text]
+                    self.counters["hits"] += 1
+                elif text in self._pending:
+                    to_wait[text] = self._pending[text]
+                    self.counters["hits"] += 1
+                else:
+                    self._pending[text] = threading.Event()
+                    to_compute.append(text)
+
+        if to_compute:
+            vectors = []
+            try:
+                vectors = [_as_list(vector) for vector in embed(to_compute)]
+            finally:
+                with self._lock:
+                    for text, vector in zip(to_compute, vectors):
+                        results[text] = vector
+                        self._entries[text] = vector
+                    self.counters["misses"] += len(to_compute)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                    for text in to_compute:
+                        self._pending.pop(text).set()
+
+        for text, event in to_wait.items():
+            event.wait()
+            with self._lock:
+                vector = self._entries.get(text)
+            # Thread kia lỗi hoặc mục đã bị loại khỏi LRU: tự embed
+            results[text] = vector if vector is not None else _as_list(embed([text])[0])
+
+        return [results[text] for text in texts]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "embeddings_avoided": self.counters["hits"],
+                "entries": len(self._entries),
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+query_embedding_cache = QueryEmbeddingCache()
+
+def embed_queries(texts):
+    """Embedding của nhiều câu truy vấn qua query_embedding_cache"""
+    return query_embedding_cache.get_many(texts, embedding_function)
+
+def embed_query(text):
+    """Embedding của một câu truy vấn, None nếu model embedding chưa sẵn sàng"""
+    if not VECTOR_DB_ENABLED:
+        return None
+    return embed_queries([text])[0]
+
+class Catalog:
+    """
+    Danh mục sản phẩm trong bộ nhớ với các chỉ mục theo id, slug, danh mục và SKU,
+    cùng ProductFacets (giá, giảm giá, tồn kho) tính sẵn từ variations để lọc theo
+    ràng buộc. Đọc qua ChangeLog của file: thay đổi từng sản phẩm được áp dụng tăng
+    dần vào các chỉ mục; chỉ dựng lại toàn bộ khi snapshot bị thay hoặc invalidate().
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.path = path
+        # Phiên bản ChangeLog đã áp dụng, để các chỉ mục phụ (BM25...) biết khi nào cần cập nhật
+        self.version = None
+        self.products = []
+        self.by_id = {}
+        self.by_slug = {}
+        self.by_category = {}
+        self.by_sku = {}
+        self.facets = {}
+        self.categories = {}
+        self._category_counts = {}
+        # (giá thấp nhất, id) tăng dần, để lọc "dưới X USD" bằng bisect
+        self.by_min_price = []
+
+    @property
+    def path(self):
+        return self.changes.path
+
+    @path.setter
+    def path(self, path):
+        self.changes = change_log(path)
+        self._stale = True
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    @staticmethod
+    def _category_keys(product):
+        category = product.get("category")
+        if not isinstance(category, dict):
+            return []
+        return [key.lower() for key in (category.get("slug"), category.get("name")) if key]
+
+    def _index(self, product, keep_sorted=True):
+        product_id = product["id"]
+        self.by_id[product_id] = product
+        if product.get("slug"):
+            self.by_slug[product["slug"]] = product
+        for key in self._category_keys(product):
+            if keep_sorted:
+                # Danh sách mới thay vì append: get_by_category có thể đang sao chép bản cũ
+                self.by_category[key] = self.by_category.get(key, []) + [product]
+            else:
+                self.by_category.setdefault(key, []).append(product)
+        for variation in product.get("variations") or []:
+            if variation.get("sku"):
+                self.by_sku[variation["sku"]] = product
+
+        facet = product_facets(product)
+        self.facets[product_id] = facet
+        if keep_sorted:
+            bisect.insort(self.by_min_price, (facet.min_price, product_id))
+        else:
+            self.by_min_price.append((facet.min_price, product_id))
+
+        category = product.get("category")
+        if isinstance(category, dict) and category.get("name"):
+            name = category["name"]
+            self._category_counts[name] = self._category_counts.get(name, 0) + 1
+            if self.categories.get(name) != facet.category_slug:
+                # Thay cả dict thay vì sửa tại chỗ: extract_product_filters có thể đang duyệt bản cũ
+                self.categories = {**self.categories, name: facet.category_slug}
+
+    def _unindex(self, product_id):
+        product = self.by_id.pop(product_id, None)
+        if product is None:
+            return
+        if product.get("slug") and self.by_slug.get(product["slug"]) is product:
+            del self.by_slug[product["slug"]]
+        for key in self._category_keys(product):
+            remaining = [other for other in self.by_category.get(key, []) if other is not product]
+            if remaining:
+                self.by_category[key] = remaining
+            else:
+                self.by_category.pop(key, None)
+        for variation in product.get("variations") or []:
+            if self.by_sku.get(variation.get("sku")) is product:
+                del self.by_sku[variation["sku"]]
+
+        facet = self.facets.pop(product_id)
+        position = bisect.bisect_left(self.by_min_price, (facet.min_price, product_id))
+        if position < len(self.by_min_price) and self.by_min_price[position] == (facet.min_price, product_id):
+            del self.by_min_price[position]
+
+        category = product.get("category")
+        if isinstance(category, dict) and category.get("name"):
+            name = category["name"]
+            self._category_counts[name] -= 1
+            if not self._category_counts[name]:
+                del self._category_counts[name]
+                self.categories = {key: slug for key, slug in self.categories.items() if key != name}
+
+    def _rebuild(self, products):
+        self.by_id, self.by_slug, self.by_category, self.by_sku = {}, {}, {}, {}
+        self.facets, self.categories, self._category_counts = {}, {}, {}
+        self.by_min_price = []
+        for product in products:
+            self._index(product, keep_sorted=False)
+        self.by_min_price.sort()
+
+    def _ensure_loaded(self):
+        if not self._stale and self.changes.current_version() == self.version:
+            return
+
+        with self._lock:
+            version, products, changes = self.changes.delta(None if self._stale else self.version)
+            if not self._stale and version == self.version:
+                return
+            # Lô thay đổi lớn (vd. nhập hàng loạt): dựng lại nhanh hơn áp từng thay đổi
+            if changes is None or len(changes) > len(products) // 4:
+                self._rebuild(products)
+            else:
+                for change in changes:
+                    self._unindex(change.id)
+                    if change.op == UPSERT:
+                        self._index(change.record)
+            self.products = products
+            self.version = version
+            self._stale = False
+
+    def delta(self, since):
+        """(phiên bản, sản phẩm, thay đổi sau `since` hoặc None nếu cần dựng lại toàn bộ)"""
+        self._ensure_loaded()
+        return self.changes.delta(since)
+
+    def all(self):
+        self._ensure_loaded()
+        return self.products
+
+    def current_version(self):
+        self._ensure_loaded()
+        return self.version
+
+    def get(self, product_id):
+        self._ensure_loaded()
+        # Chấp nhận cả ID dạng chuỗi số lẫn số nguyên
+        if isinstance(product_id, str) and product_id.isdigit():
+            product_id = int(product_id)
+        return self.by_id.get(product_id)
+
+    def get_by_slug(self, slug):
+        self._ensure_loaded()
+        return self.by_slug.get(slug)
+
+    def get_by_sku(self, sku):
+        self._ensure_loaded()
+        return self.by_sku.get(sku)
+
+    def get_by_category(self, category):
+        """Tìm theo slug hoặc tên danh mục (không phân biệt hoa thường)"""
+        self._ensure_loaded()
+        return list(self.by_category.get(category.lower(), []))
+
+    def category_names(self):
+        """{tên danh mục: slug} của các danh mục đang có sản phẩm"""
+        self._ensure_loaded()
+        return self.categories
+
+    def filter(self, filters: ProductFilters):
+        """Sản phẩm thỏa ràng buộc, bán chạy nhất trước"""
+        self._ensure_loaded()
+        by_min_price, facets, by_id = self.by_min_price, self.facets, self.by_id
+        if filters.max_price is not None:
+            end = bisect.bisect_right(by_min_price, (filters.max_price, float("inf")))
+            candidate_ids = [product_id for _, product_id in by_min_price[:end]]
+        else:
+            candidate_ids = [product_id for _, product_id in by_min_price]
+        matched = [by_id[product_id] for product_id in candidate_ids if filters.matches(facets[product_id])]
+        return sorted(matched, key=lambda product: product.get("sold", 0), reverse=True)
+
+catalog = Catalog(PRODUCTS_FILE)
+# Đơn hàng trên SQLite; lần đầu được chuyển từ ORDERS_FILE
+order_store = OrderStore(ORDERS_DB_FILE, catalog, legacy_json=ORDERS_FILE)
+
+# Kết hợp kết quả vector và BM25 (Reciprocal Rank Fusion) khi có vector database
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+
+def _product_search_text(product):
+    category = product.get("category") or {}
+    skus = " ".join(variation.get("sku", "") for variation in product.get("variations") or [])
+    return f"{product['title']} {category.get('name', '')} {product.get('description', '')} {product.get('slug', '')} {skus}"
+
+# Thay đổi chính sách / FAQ được ghi thêm vào journal (xem change_log.py)
+policy_changes = change_log(POLICIES_FILE)
+faq_changes = change_log(FAQS_FILE)
+
+product_lexical_index = LexicalIndex(catalog.current_version, catalog.all, _product_search_text, delta=catalog.delta)
+policy_lexical_index = LexicalIndex(
+    policy_changes.current_version,
+    policy_changes.records,
+    lambda policy: f"{policy['title']} {policy['content']}",
+    delta=policy_changes.delta
+)
+faq_lexical_index = LexicalIndex(
+    faq_changes.current_version,
+    faq_changes.records,
+    lambda faq: f"{faq['question']} {faq['answer']}",
+    delta=faq_changes.delta
+)
+
+def hybrid_search(collection, lexical_index, query, limit, label, where=None, allowed=None):
+    """
+    Tìm bằng vector database (nếu có) và BM25. Khi HYBRID_SEARCH bật, hai danh sách
+    được gộp bằng RRF; khi không có vector database chỉ dùng BM25.
+    `where` (bộ lọc metadata) và `allowed` (tập id) giới hạn kết quả trong các ứng viên đã lọc.
+    Vector database chỉ trả về ID; bản ghi đầy đủ được lấy từ lexical_index (dữ liệu hiện tại).
+    """
+    vector_results = []
+    if VECTOR_DB_ENABLED:
+        try:
+            query_args = {"where": where} if where else {}
+            results = collection.query(
+                query_embeddings=[embed_query(query)],
+                n_results=limit,
+                **query_args
+            )
+            if results and results["metadatas"]:
+                ids = [metadata.get("id") for metadata in results["metadatas"][0] if metadata]
+                if allowed is not None:
+                    ids = [doc_id for doc_id in ids if doc_id in allowed]
+                vector_results = lexical_index.hydrate(ids)
+        except Exception as e:
+            print(f"Error searching {label} in vector database: {e}")
+            print("Falling back to keyword search...")
+
+    if vector_results and not HYBRID_SEARCH:
+        return vector_results
+
+    lexical_results = lexical_index.search(query, limit, allowed)
+    if vector_results:
+        return reciprocal_rank_fusion([vector_results, lexical_results], limit)
+    return lexical_results
+
 # Function to fetch products from API
-def fetch_products_from_api():
-    """Fetch products from the API"""
-    api_url = "https://interlux-be-dwbhhhf7gkemhzbm.eastasia-01.azurewebsites.net/api/v1/client/product"
+async def _fetch_product_page(client, api_url, page, page_size, semaphore):
+    """
+    Tải một trang sản phẩm với timeout, retry + backoff và request có điều kiện.
+    Trang đã tải được lưu vào API_CACHE_DIR kèm ETag/Last-Modified để lần sau
+    (kể cả khi lần trước bị gián đoạn) server chỉ cần trả 304.
+    """
+    url_key = hashlib.sha1(api_url.encode("utf-8")).hexdigest()[:12]
+    cache_path = f"{API_CACHE_DIR}/products-{url_key}-{page_size}-{page}.json"
+    cached = load_json_file(cache_path) if os.path.exists(cache_path) else None
+
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
     params = {
-        "page": 1,
-        "limit": 1000,
+        "page": page,
+        "limit": page_size,
         "sortBy": "createdAt",
         "sortDirection": "desc"
     }
 
-    try:
-        response = requests.get(api_url, params=params)
-        if response.status_code == 200:
+    last_error = None
+    async with semaphore:
+        for attempt in range(PRODUCTS_API_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(PRODUCTS_API_BACKOFF * 2 ** (attempt - 1))
+            try:
+                response = await client.get(api_url, params=params, headers=headers)
+            except httpx.TransportError as e:
+                last_error = e
+                continue
+
+            if response.status_code == 304 and cached:
+                return cached["payload"]
+            if response.status_code == 429 or response.status_code >= 500:
+                last_error = f"HTTP {response.status_code}"
+                continue
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to fetch products page {page}: HTTP {response.status_code}")
+
             data = response.json()
-            if data["statusCode"] == 200 and "data" in data and "data" in data["data"]:
-                print(f"{data["message"]}")
-                return data["data"]["data"]
-        print(f"Failed to fetch products from API: {response.status_code}")
-        return []
+            if data.get("statusCode") != 200 or "data" not in data or "data" not in data["data"]:
+                raise RuntimeError(f"Unexpected response for products page {page}: {data.get('message')}")
+
+            payload = data["data"]
+            # Ghi tạm rồi rename: các lần tải song song hoặc bị ngắt không để lại file cache hỏng
+            atomic_write_json(cache_path, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "payload": payload
+            })
+            return payload
+
+    raise RuntimeError(f"Failed to fetch products page {page} after retries: {last_error}")
+
+def _page_totals(payload):
+    """(tổng số sản phẩm, tổng số trang) theo metadata phân trang của API, None nếu API không trả về"""
+    meta = payload.get("meta", payload)
+    total_items = next((int(meta[key]) for key in ("total", "totalItems", "count") if meta.get(key) is not None), None)
+    total_pages = int(meta["totalPages"]) if meta.get("totalPages") else None
+    return total_items, total_pages
+
+async def afetch_products_from_api(api_url=PRODUCTS_API_URL, page_size=None, concurrency=None, transport=None):
+    """
+    Tải toàn bộ catalog theo trang với một httpx.AsyncClient dùng chung kết nối,
+    tối đa `concurrency` trang song song. Lỗi ở bất kỳ trang nào sẽ làm hỏng cả
+    lần tải để không ghi đè products.json bằng catalog bị cắt cụt.
+    `transport` (vd. httpx.MockTransport) thay cho kết nối mạng thật.
+    """
+    page_size = page_size or PRODUCTS_API_PAGE_SIZE
+    concurrency = concurrency or PRODUCTS_API_CONCURRENCY
+    os.makedirs(API_CACHE_DIR, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=PRODUCTS_API_TIMEOUT, limits=limits, transport=transport) as client:
+        first_page = await _fetch_product_page(client, api_url, 1, page_size, semaphore)
+        products = list(first_page["data"])
+        # API có thể giới hạn `limit` nhỏ hơn page_size: số trang tính theo số sản phẩm thực nhận mỗi trang
+        returned = len(products)
+        total_items, total_pages = _page_totals(first_page)
+        if total_items is not None and returned:
+            total_pages = math.ceil(total_items / returned)
+
+        if total_pages is not None:
+            pages = await asyncio.gather(*(
+                _fetch_product_page(client, api_url, page, page_size, semaphore)
+                for page in range(2, total_pages + 1)
+            ))
+            for payload in pages:
+                products.extend(payload["data"])
+        else:
+            # API không cho biết số trang: tải từng đợt cho tới khi gặp trang thiếu hoặc rỗng
+            page = 2
+            last_page_full = returned > 0
+            while last_page_full:
+                batch = range(page, page + concurrency)
+                pages = await asyncio.gather(*(
+                    _fetch_product_page(client, api_url, p, page_size, semaphore) for p in batch
+                ))
+                for payload in pages:
+                    products.extend(payload["data"])
+                    if len(payload["data"]) < returned:
+                        last_page_full = False
+                        break
+                page += concurrency
+
+    if total_items is not None and len(products) < total_items:
+        # Không ghi đè products.json bằng catalog bị cắt cụt
+        raise RuntimeError(f"Fetched only {len(products)} of {total_items} products from API")
+    return products
+
+def fetch_products_from_api(api_url=PRODUCTS_API_URL):
+    """Fetch products from the API"""
+    try:
+        return asyncio.run(afetch_products_from_api(api_url))
     except Exception as e:
         print(f"Error fetching products from API: {e}")
         return []
 
+def ensure_data_files():
+    """Tạo các file dữ liệu rỗng nếu chưa có (nhanh, chạy đồng bộ khi khởi động)"""
+    for file_path in [PRODUCTS_FILE, USERS_FILE, ORDERS_FILE, POLICIES_FILE, FAQS_FILE]:
+        if not os.path.exists(file_path):
+            save_json_file(file_path, [])
+
 # Initialize data files if they don't exist
 def initialize_data_files():
     # Products - fetch from API
@@ -138,249 +667,331 @@ def initialize_data_files():
     if api_products:
         print(f"Fetched {len(api_products)} products from API")
 
-        # Save to file
+        # Snapshot mới, journal rỗng
         save_json_file(PRODUCTS_FILE, api_products)
+        notify_data_changed("products")
 
-        # Add products to vector database if enabled
-        if VECTOR_DB_ENABLED:
-            try:
-                # Clear existing products in vector database
-                try:
-                    product_collection.delete(where={})
-                    print("Cleared existing products from vector database")
-                except Exception as e:
-                    print(f"Error clearing products from vector database: {e}")
-
-                # Add new products
-                for product in api_products:
-                    product_text = create_product_text_for_embedding(product)
-                    product_collection.add(
-                        documents=[product_text],
-                        metadatas=[product],
-                        ids=[str(product["id"])]
-                    )
-                print(f"Added {len(api_products)} products to vector database")
-            except Exception as e:
-                print(f"Error adding products to vector database: {e}")
-    else:
-        # If API fetch fails, create empty products file
-        if not os.path.exists(PRODUCTS_FILE):
-            save_json_file(PRODUCTS_FILE, [])
+        # Sync products to vector database if enabled
+        vector_sync["products"].sync()
 
     # Initialize other data files with empty arrays if they don't exist
-    for file_path in [USERS_FILE, ORDERS_FILE, POLICIES_FILE, FAQS_FILE]:
-        if not os.path.exists(file_path):
-            save_json_file(file_path, [])
-
-# Hàm tiện ích để quản lý dữ liệu trong vector database
-def add_product_to_vector_db(product):
-    """Add a new product to the vector database"""
-    if not VECTOR_DB_ENABLED:
-        return False
+    ensure_data_files()
 
-    try:
-        product_text = create_product_text_for_embedding(product)
-        product_collection.add(
-            documents=[product_text],
-            metadatas=[product],
-            ids=[str(product["id"])]
-        )
-        return True
-    except Exception as e:
-        print(f"Error adding product to vector database: {e}")
-        return False
+    # Đưa chính sách / FAQ chưa có trong vector database vào (từ change log)
+    vector_sync["policies"].sync()
+    vector_sync["faqs"].sync()
 
-def add_policy_to_vector_db(policy):
-    """Thêm chính sách mới vào vector database"""
-    if not VECTOR_DB_ENABLED:
-        return False
-
-    try:
-        policy_collection.add(
-            documents=[f"{policy['title']}: {policy['content']}"],
-            metadatas=[policy],
-            ids=[policy["id"]]
-        )
-        return True
-    except Exception as e:
-        print(f"Error adding policy to vector database: {e}")
-        return False
-
-def add_faq_to_vector_db(faq):
-    """Thêm câu hỏi thường gặp mới vào vector database"""
-    if not VECTOR_DB_ENABLED:
-        return False
-
-    try:
-        faq_collection.add(
-            documents=[f"Câu hỏi: {faq['question']} Trả lời: {faq['answer']}"],
-            metadatas=[faq],
-            ids=[faq["id"]]
+# Hàm tiện ích để quản lý dữ liệu trong vector database
+def vector_write_batch(collection):
+    """Gộp các lần ghi của một lần nạp thành một lần ghi file (NumpyCollection); Chroma tự quản lý việc ghi"""
+    batch = getattr(collection, "batch", None)
+    return batch() if batch is not None else nullcontext()
+
+def upsert_products_to_vector_db(products, batch_size=VECTOR_BATCH_SIZE, collection=None):
+    """Embed và ghi sản phẩm vào vector database theo lô, in tiến độ và thời gian"""
+    if not VECTOR_DB_ENABLED or not products:
+        return 0
+
+    collection = collection or product_collection
+
+    total = len(products)
+    start = time.perf_counter()
+    embed_seconds = 0.0
+
+    with vector_write_batch(collection):
+        for offset in range(0, total, batch_size):
+            batch = products[offset:offset + batch_size]
+            documents = [create_product_text_for_embedding(product) for product in batch]
+
+            # Embed cả lô một lần thay vì để Chroma embed từng document
+            embed_start = time.perf_counter()
+            embeddings = embedding_function(documents)
+            embed_seconds += time.perf_counter() - embed_start
+
+            collection.upsert(
+                ids=[str(product["id"]) for product in batch],
+                documents=documents,
+                embeddings=embeddings,
+                metadatas=[product_vector_metadata(product) for product in batch]
+            )
+            done = min(offset + batch_size, total)
+            print(f"Upserted {done}/{total} products to vector database ({time.perf_counter() - start:.1f}s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"Added {total} products to vector database in {elapsed:.1f}s "
+          f"(embedding {embed_seconds:.1f}s, {total / elapsed if elapsed else 0:.0f} products/s)")
+    return total
+
+def product_content_hashes(product):
+    """Hash của văn bản embedding và của metadata, để biết cần embed lại hay chỉ cập nhật metadata"""
+    text_hash = hashlib.sha256(create_product_text_for_embedding(product).encode("utf-8")).hexdigest()
+    metadata_hash = hashlib.sha256(
+        json.dumps(product_vector_metadata(product), sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return [text_hash, metadata_hash]
+
+def _load_vector_manifest(manifest_path, collection):
+    manifest = load_json_file(manifest_path) if os.path.exists(manifest_path) else {}
+    if not isinstance(manifest, dict) or collection.count() != len(manifest):
+        # Manifest không khớp với collection (mất volume, lần chạy đầu...): coi như chưa có gì
+        return {}
+    return manifest
+
+def _write_changed_products(collection, products, manifest, current):
+    """
+    So hash trong manifest: chỉ embed sản phẩm mới hoặc đổi văn bản, chỉ cập nhật
+    metadata khi văn bản không đổi, bỏ qua sản phẩm không đổi. Trả về (to_embed, metadata_only).
+    """
+    to_embed, metadata_only = [], []
+    for product in products:
+        product_id = str(product["id"])
+        previous = manifest.get(product_id)
+        if previous is None or previous[0] != current[product_id][0]:
+            to_embed.append(product)
+        elif previous[1] != current[product_id][1]:
+            metadata_only.append(product)
+
+    if metadata_only:
+        collection.update(
+            ids=[str(p["id"]) for p in metadata_only],
+            metadatas=[product_vector_metadata(p) for p in metadata_only]
         )
-        return True
-    except Exception as e:
-        print(f"Error adding FAQ to vector database: {e}")
-        return False
+    upsert_products_to_vector_db(to_embed, collection=collection)
+    return to_embed, metadata_only
 
-def update_product_in_vector_db(product):
-    """Update a product in the vector database"""
+def sync_products_to_vector_db(products, manifest_path=VECTOR_MANIFEST_FILE, collection=None):
+    """
+    Đồng bộ tăng dần: chỉ embed sản phẩm mới hoặc đổi nội dung, chỉ cập nhật
+    metadata khi văn bản không đổi, xóa ID không còn trong catalog.
+    Manifest (id -> [hash văn bản, hash metadata]) được lưu lại sau mỗi lần đồng bộ.
+    """
     if not VECTOR_DB_ENABLED:
-        return False
-
-    try:
-        # Delete old product
-        product_collection.delete(ids=[str(product["id"])])
+        return
+
+    collection = collection or product_collection
+    manifest = _load_vector_manifest(manifest_path, collection)
+    current = {str(product["id"]): product_content_hashes(product) for product in products}
+    removed_ids = [product_id for product_id in manifest if product_id not in current]
+
+    with vector_write_batch(collection):
+        if removed_ids:
+            collection.delete(ids=removed_ids)
+        to_embed, metadata_only = _write_changed_products(collection, products, manifest, current)
+
+    save_json_file(manifest_path, current)
+    print(f"Vector sync: {len(to_embed)} embedded, {len(metadata_only)} metadata updated, "
+          f"{len(removed_ids)} removed, {len(products) - len(to_embed) - len(metadata_only)} unchanged")
+
+def update_vector_manifest(products, deleted_ids=(), manifest_path=VECTOR_MANIFEST_FILE, hashes=None):
+    """Cập nhật manifest cho nhiều sản phẩm thêm/sửa và ID đã xóa trong một lần ghi"""
+    if not products and not deleted_ids:
+        return
+    if hashes is None:
+        hashes = {str(product["id"]): product_content_hashes(product) for product in products}
+
+    def apply(manifest):
+        if not isinstance(manifest, dict):
+            return False
+        for product_id in deleted_ids:
+            manifest.pop(str(product_id), None)
+        manifest.update(hashes)
+    json_file_store(manifest_path, default=dict).update(apply)
+
+def policy_vector_document(policy):
+    return f"{policy['title']}: {policy['content']}"
+
+def faq_vector_document(faq):
+    return f"Câu hỏi: {faq['question']} Trả lời: {faq['answer']}"
+
+def _upsert_documents(collection, records, to_document, batch_size=VECTOR_BATCH_SIZE):
+    with vector_write_batch(collection):
+        for offset in range(0, len(records), batch_size):
+            batch = records[offset:offset + batch_size]
+            collection.upsert(
+                ids=[str(record["id"]) for record in batch],
+                documents=[to_document(record) for record in batch],
+                metadatas=[{"id": record["id"]} for record in batch]
+            )
 
-        # Add new product (reuse the add_product_to_vector_db function)
-        return add_product_to_vector_db(product)
-    except Exception as e:
-        print(f"Error updating product in vector database: {e}")
-        return False
+class VectorChangeConsumer:
+    """
+    Đưa các thay đổi trong change log vào một collection của vector database: mỗi lần
+    sync() lấy các thay đổi kể từ lần trước (ChangeLog.delta), gộp theo ID rồi ghi
+    theo lô (một lần upsert, một lần delete). Khi không còn đủ lịch sử (lần chạy đầu,
+    snapshot mới...) thì đồng bộ lại toàn bộ collection.
+    """
 
-def delete_from_vector_db(collection_name, doc_id):
-    """Xóa một document từ vector database"""
-    if not VECTOR_DB_ENABLED:
-        return False
+    def __init__(self, name, delta):
+        self.name = name
+        self.delta = delta
+        self.version = None
+        self._lock = threading.Lock()
+
+    def _collection(self):
+        return {"products": product_collection, "policies": policy_collection, "faqs": faq_collection}[self.name]
+
+    def _apply(self, upserts, deleted_ids):
+        collection = self._collection()
+        # Đọc manifest trước khi xóa, lúc số document của collection còn khớp với manifest
+        manifest = _load_vector_manifest(VECTOR_MANIFEST_FILE, collection) if self.name == "products" else None
+        with vector_write_batch(collection):
+            if deleted_ids:
+                collection.delete(ids=[str(doc_id) for doc_id in deleted_ids])
+            if self.name == "products":
+                # Sản phẩm có hash không đổi so với manifest thì không embed lại
+                current = {str(product["id"]): product_content_hashes(product) for product in upserts}
+                _write_changed_products(collection, upserts, manifest, current)
+            elif upserts:
+                _upsert_documents(collection, upserts, policy_vector_document if self.name == "policies" else faq_vector_document)
+        if self.name == "products":
+            update_vector_manifest(upserts, deleted_ids, hashes=current)
+
+    def _resync(self, records):
+        if self.name == "products":
+            sync_products_to_vector_db(records)
+            return
+        collection = self._collection()
+        current = {str(record["id"]) for record in records}
+        stale = [doc_id for doc_id in collection.get()["ids"] if doc_id not in current]
+        self._apply(list(records), stale)
+
+    def sync(self):
+        """Áp các thay đổi chưa đồng bộ; trả về số thay đổi đã áp dụng (-1 nếu đồng bộ lại toàn bộ)"""
+        if not VECTOR_DB_ENABLED:
+            return 0
+        with self._lock:
+            version, records, changes = self.delta(self.version)
+            if changes is not None and not changes:
+                return 0
+            try:
+                if changes is None:
+                    self._resync(records)
+                else:
+                    latest = {}
+                    for change in changes:
+                        latest[change.id] = change
+                    upserts = [change.record for change in latest.values() if change.op == UPSERT]
+                    deleted_ids = [change.id for change in latest.values() if change.op != UPSERT]
+                    self._apply(upserts, deleted_ids)
+            except Exception as e:
+                print(f"Error syncing {self.name} changes to vector database: {e}")
+                return 0
+            self.version = version
+            return -1 if changes is None else len(changes)
+
+vector_sync = {
+    "products": VectorChangeConsumer("products", catalog.delta),
+    "policies": VectorChangeConsumer("policies", policy_changes.delta),
+    "faqs": VectorChangeConsumer("faqs", faq_changes.delta),
+}
+
+def apply_bulk_changes(collection_name, ops):
+    """
+    Áp một lô thao tác (BulkOp: upsert/delete) cho products/policies/faqs trong một
+    commit của change log, bỏ qua bản ghi không đổi, rồi embed theo lô các bản ghi
+    thay đổi. Trả về số bản ghi created/updated/deleted/unchanged.
+    """
+    changes_log = {"products": catalog.changes, "policies": policy_changes, "faqs": faq_changes}[collection_name]
+    counts = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    def decide(records):
+        counts.update(created=0, updated=0, deleted=0, unchanged=0)
+        # Nhiều thao tác trên cùng ID: thao tác cuối cùng được áp dụng
+        latest = {}
+        for op in ops:
+            latest.pop(op.id, None)
+            latest[op.id] = op
+        decided = []
+        for op in latest.values():
+            existing = records.get(op.id)
+            if op.op == UPSERT:
+                if existing == op.record:
+                    counts["unchanged"] += 1
+                    continue
+                counts["created" if existing is None else "updated"] += 1
+            elif existing is None:
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["deleted"] += 1
+            decided.append((op.op, op.id, op.record))
+        return decided
 
-    try:
-        if collection_name == "products":
-            product_collection.delete(ids=[doc_id])
-        elif collection_name == "policies":
-            policy_collection.delete(ids=[doc_id])
-        elif collection_name == "faqs":
-            faq_collection.delete(ids=[doc_id])
-        else:
-            return False
-        return True
-    except Exception as e:
-        print(f"Error deleting from vector database: {e}")
-        return False
+    if changes_log.commit(decide):
+        vector_sync[collection_name].sync()
+        notify_data_changed(collection_name)
+    return counts
 
 # Database functions
 def get_products():
-    return load_json_file(PRODUCTS_FILE)
+    """Danh sách sản phẩm (bản sao nông, có thể sửa mà không ảnh hưởng catalog)"""
+    return list(catalog.all())
 
 def get_product_by_id(product_id):
     """Get a product by ID (accepts both string and integer IDs)"""
-    # Convert product_id to int if it's a string containing a number
-    if isinstance(product_id, str) and product_id.isdigit():
-        product_id = int(product_id)
-
-    products = get_products()
-    for product in products:
-        if product["id"] == product_id:
-            return product
-    return None
+    return catalog.get(product_id)
 
 def add_product(product):
     """Thêm sản phẩm mới vào cơ sở dữ liệu"""
-    products = get_products()
-
-    # Kiểm tra xem sản phẩm đã tồn tại chưa
-    for existing_product in products:
-        if existing_product["id"] == product["id"]:
-            return False
-
-    # Thêm sản phẩm mới
-    products.append(product)
+    if not catalog.changes.upsert(product, only_if_new=True):
+        return False
 
-    # Lưu vào file
-    save_json_file(PRODUCTS_FILE, products)
+    # Vector database đọc thay đổi từ change log
+    vector_sync["products"].sync()
 
-    # Thêm vào vector database
-    add_product_to_vector_db(product)
+    notify_data_changed("products", product["id"])
 
     return True
 
 def update_product(product_id: str, updated_product):
     """Cập nhật sản phẩm trong cơ sở dữ liệu"""
-    products = get_products()
-
-    # Tìm và cập nhật sản phẩm
-    for i, product in enumerate(products):
-        if product["id"] == product_id:
-            # Giữ nguyên ID
-            updated_product["id"] = product_id
-            products[i] = updated_product
-
-            # Lưu vào file
-            with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(products, f, ensure_ascii=False, indent=4)
+    if not catalog.changes.replace(product_id, updated_product):
+        return False
 
-            # Cập nhật trong vector database
-            update_product_in_vector_db(updated_product)
+    vector_sync["products"].sync()
 
-            return True
+    notify_data_changed("products", product_id)
 
-    return False
+    return True
 
 def delete_product(product_id: str):
     """Xóa sản phẩm khỏi cơ sở dữ liệu"""
-    products = get_products()
-
-    # Tìm và xóa sản phẩm
-    for i, product in enumerate(products):
-        if product["id"] == product_id:
-            del products[i]
-
-            # Lưu vào file
-            with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(products, f, ensure_ascii=False, indent=4)
+    if not catalog.changes.delete(product_id):
+        return False
 
-            # Xóa khỏi vector database
-            delete_from_vector_db("products", product_id)
+    vector_sync["products"].sync()
 
-            return True
+    notify_data_changed("products", product_id)
 
-    return False
+    return True
 
-def search_products(query: str, limit: int = 5):
+def search_products(query: str, limit: int = 5, filters: ProductFilters = None):
     """
     Search for products based on keywords in query
-    Uses vector database if available, otherwise falls back to simple keyword search
+    Uses vector database if available (fused with BM25), otherwise BM25 keyword search.
+    Price/category/discount/stock constraints in the query are applied before ranking;
+    if no product satisfies them, the unfiltered search is used instead.
     """
-    if VECTOR_DB_ENABLED:
-        try:
-            results = product_collection.query(
-                query_texts=[query],
-                n_results=limit
-            )
-
-            if results and results["metadatas"] and len(results["metadatas"][0]) > 0:
-                return results["metadatas"][0]
-        except Exception as e:
-            print(f"Error searching products in vector database: {e}")
-            print("Falling back to keyword search...")
-
-    # Fallback to keyword search
-    products = get_products()
-    query = query.lower()
-
-    # Search for products containing keywords in title, description or category
-    matched_products = []
-    for product in products:
-        # Check in title and description
-        if (query in product["title"].lower() or
-            query in product.get("description", "").lower() or
-            query in product["slug"].lower()):
-            matched_products.append(product)
-            continue
-
-        # Check in category
-        if "category" in product and "name" in product["category"]:
-            if query in product["category"]["name"].lower():
-                matched_products.append(product)
-                continue
-
-        # Check in variations
-        if "variations" in product:
-            for variation in product["variations"]:
-                if "sku" in variation and query in variation["sku"].lower():
-                    matched_products.append(product)
-                    break
+    if filters is None:
+        filters = extract_product_filters(query, catalog.category_names())
+    if filters.is_empty():
+        return hybrid_search(product_collection, product_lexical_index, query, limit, "products")
+
+    candidates = catalog.filter(filters)
+    if not candidates:
+        # Không sản phẩm nào thỏa ràng buộc: trả về kết quả gần nhất thay vì danh sách rỗng
+        print(f"No products match {filters}, falling back to unfiltered search")
+        return hybrid_search(product_collection, product_lexical_index, query, limit, "products")
+    allowed = {product["id"] for product in candidates}
+    results = hybrid_search(
+        product_collection, product_lexical_index, query, limit, "products",
+        where=filters.to_where(), allowed=allowed
+    )
 
-    # Limit the number of results
-    return matched_products[:limit]
+    # Câu hỏi chỉ có ràng buộc ("sản phẩm dưới 1000 USD"): bổ sung các ứng viên bán chạy nhất
+    seen = {product["id"] for product in results}
+    results += [product for product in candidates if product["id"] not in seen][:limit - len(results)]
+    return results
 
 def get_users():
     with open(USERS_FILE, "r", encoding="utf-8") as f:
@@ -394,249 +1005,113 @@ def get_user_by_id(user_id: str):
     return None
 
 def get_orders():
-    with open(ORDERS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return order_store.all_orders()
+
+def get_user_orders(user_id: str, limit: Optional[int] = None, offset: int = 0, status: Optional[str] = None):
+    """Đơn hàng của người dùng (mới nhất trước), đã kèm thông tin sản phẩm từ catalog"""
+    return order_store.user_orders(user_id, limit=limit, offset=offset, status=status)
 
-def get_user_orders(user_id: str):
-    orders = get_orders()
-    user_orders = [order for order in orders if order["user_id"] == user_id]
-
-    # Enrich orders with product details
-    for order in user_orders:
-        for product in order["products"]:
-            product_details = get_product_by_id(product["product_id"])
-            if product_details:
-                product["title"] = product_details["title"]
-                # Add more product details
-                if "images" in product_details and product_details["images"]:
-                    product["image"] = product_details["images"][0]["filePath"] if "filePath" in product_details["images"][0] else None
-                # Add variation details if available
-                if "variations" in product_details:
-                    default_variation = next((var for var in product_details["variations"] if var.get("isDefault", False)), None)
-                    if default_variation:
-                        product["variation"] = default_variation["sku"]
-                        product["finalPrice"] = default_variation["finalPrice"]
-
-    return user_orders
+def count_user_orders(user_id: str, status: Optional[str] = None):
+    return order_store.count_user_orders(user_id, status=status)
+
+def save_orders(orders: List[Dict]):
+    """Thêm hoặc thay thế đơn hàng"""
+    count = order_store.save_orders(orders)
+    for user_id in {str(order["user_id"]) for order in orders}:
+        notify_data_changed("orders", user_id)
+    return count
+
+def update_order_status(order_id: str, status: str):
+    user_id = order_store.update_status(order_id, status)
+    if user_id is None:
+        return False
+    notify_data_changed("orders", user_id)
+    return True
 
 def get_policies():
-    with open(POLICIES_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return list(policy_changes.records())
 
 def add_policy(policy):
     """Thêm chính sách mới vào cơ sở dữ liệu"""
-    policies = get_policies()
-
-    # Kiểm tra xem chính sách đã tồn tại chưa
-    for existing_policy in policies:
-        if existing_policy["id"] == policy["id"]:
-            return False
-
-    # Thêm chính sách mới
-    policies.append(policy)
+    if not policy_changes.upsert(policy, only_if_new=True):
+        return False
 
-    # Lưu vào file
-    with open(POLICIES_FILE, "w", encoding="utf-8") as f:
-        json.dump(policies, f, ensure_ascii=False, indent=4)
+    # Vector database đọc thay đổi từ change log
+    vector_sync["policies"].sync()
 
-    # Thêm vào vector database
-    add_policy_to_vector_db(policy)
+    notify_data_changed("policies", policy["id"])
 
     return True
 
 def update_policy(policy_id: str, updated_policy):
     """Cập nhật chính sách trong cơ sở dữ liệu"""
-    policies = get_policies()
-
-    # Tìm và cập nhật chính sách
-    for i, policy in enumerate(policies):
-        if policy["id"] == policy_id:
-            # Giữ nguyên ID
-            updated_policy["id"] = policy_id
-            policies[i] = updated_policy
-
-            # Lưu vào file
-            with open(POLICIES_FILE, "w", encoding="utf-8") as f:
-                json.dump(policies, f, ensure_ascii=False, indent=4)
-
-            # Cập nhật trong vector database
-            if VECTOR_DB_ENABLED:
-                try:
-                    # Xóa chính sách cũ
-                    policy_collection.delete(ids=[policy_id])
-
-                    # Thêm chính sách mới
-                    policy_collection.add(
-                        documents=[f"{updated_policy['title']}: {updated_policy['content']}"],
-                        metadatas=[updated_policy],
-                        ids=[policy_id]
-                    )
-                except Exception as e:
-                    print(f"Error updating policy in vector database: {e}")
-
-            return True
-
-    return False
+    if not policy_changes.replace(policy_id, updated_policy):
+        return False
 
-def delete_policy(policy_id: str):
-    """Xóa chính sách khỏi cơ sở dữ liệu"""
-    policies = get_policies()
+    vector_sync["policies"].sync()
 
-    # Tìm và xóa chính sách
-    for i, policy in enumerate(policies):
-        if policy["id"] == policy_id:
-            del policies[i]
+    notify_data_changed("policies", policy_id)
 
-            # Lưu vào file
-            with open(POLICIES_FILE, "w", encoding="utf-8") as f:
-                json.dump(policies, f, ensure_ascii=False, indent=4)
+    return True
 
-            # Xóa khỏi vector database
-            delete_from_vector_db("policies", policy_id)
+def delete_policy(policy_id: str):
+    """Xóa chính sách khỏi cơ sở dữ liệu"""
+    if not policy_changes.delete(policy_id):
+        return False
 
-            return True
+    vector_sync["policies"].sync()
 
-    return False
+    notify_data_changed("policies", policy_id)
+
+    return True
 
 def search_policies(query: str, limit: int = 3):
     """
     Tìm kiếm chính sách dựa trên từ khóa trong query
-    Sử dụng vector database nếu có, nếu không sẽ sử dụng tìm kiếm từ khóa đơn giản
+    Sử dụng vector database nếu có (kết hợp BM25), nếu không sẽ chỉ dùng BM25
     """
-    if VECTOR_DB_ENABLED:
-        try:
-            results = policy_collection.query(
-                query_texts=[query],
-                n_results=limit
-            )
-
-            if results and results["metadatas"] and len(results["metadatas"][0]) > 0:
-                return results["metadatas"][0]
-        except Exception as e:
-            print(f"Error searching policies in vector database: {e}")
-            print("Falling back to keyword search...")
-
-    # Fallback to keyword search
-    policies = get_policies()
-    query = query.lower()
-
-    # Tìm kiếm chính sách có chứa từ khóa trong tiêu đề hoặc nội dung
-    matched_policies = []
-    for policy in policies:
-        if (query in policy["title"].lower() or
-            query in policy["content"].lower()):
-            matched_policies.append(policy)
-
-    # Giới hạn số lượng kết quả
-    return matched_policies[:limit]
+    return hybrid_search(policy_collection, policy_lexical_index, query, limit, "policies")
 
 def get_faqs():
-    with open(FAQS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return list(faq_changes.records())
 
 def add_faq(faq):
     """Thêm câu hỏi thường gặp mới vào cơ sở dữ liệu"""
-    faqs = get_faqs()
-
-    # Kiểm tra xem câu hỏi đã tồn tại chưa
-    for existing_faq in faqs:
-        if existing_faq["id"] == faq["id"]:
-            return False
-
-    # Thêm câu hỏi mới
-    faqs.append(faq)
+    if not faq_changes.upsert(faq, only_if_new=True):
+        return False
 
-    # Lưu vào file
-    with open(FAQS_FILE, "w", encoding="utf-8") as f:
-        json.dump(faqs, f, ensure_ascii=False, indent=4)
+    # Vector database đọc thay đổi từ change log
+    vector_sync["faqs"].sync()
 
-    # Thêm vào vector database
-    add_faq_to_vector_db(faq)
+    notify_data_changed("faqs", faq["id"])
 
     return True
 
 def update_faq(faq_id: str, updated_faq):
     """Cập nhật câu hỏi thường gặp trong cơ sở dữ liệu"""
-    faqs = get_faqs()
-
-    # Tìm và cập nhật câu hỏi
-    for i, faq in enumerate(faqs):
-        if faq["id"] == faq_id:
-            # Giữ nguyên ID
-            updated_faq["id"] = faq_id
-            faqs[i] = updated_faq
-
-            # Lưu vào file
-            with open(FAQS_FILE, "w", encoding="utf-8") as f:
-                json.dump(faqs, f, ensure_ascii=False, indent=4)
-
-            # Cập nhật trong vector database
-            if VECTOR_DB_ENABLED:
-                try:
-                    # Xóa câu hỏi cũ
-                    faq_collection.delete(ids=[faq_id])
-
-                    # Thêm câu hỏi mới
-                    faq_collection.add(
-                        documents=[f"Câu hỏi: {updated_faq['question']} Trả lời: {updated_faq['answer']}"],
-                        metadatas=[updated_faq],
-                        ids=[faq_id]
-                    )
-                except Exception as e:
-                    print(f"Error updating FAQ in vector database: {e}")
-
-            return True
-
-    return False
+    if not faq_changes.replace(faq_id, updated_faq):
+        return False
 
-def delete_faq(faq_id: str):
-    """Xóa câu hỏi thường gặp khỏi cơ sở dữ liệu"""
-    faqs = get_faqs()
+    vector_sync["faqs"].sync()
 
-    # Tìm và xóa câu hỏi
-    for i, faq in enumerate(faqs):
-        if faq["id"] == faq_id:
-            del faqs[i]
+    notify_data_changed("faqs", faq_id)
 
-            # Lưu vào file
-            with open(FAQS_FILE, "w", encoding="utf-8") as f:
-                json.dump(faqs, f, ensure_ascii=False, indent=4)
+    return True
 
-            # Xóa khỏi vector database
-            delete_from_vector_db("faqs", faq_id)
+def delete_faq(faq_id: str):
+    """Xóa câu hỏi thường gặp khỏi cơ sở dữ liệu"""
+    if not faq_changes.delete(faq_id):
+        return False
 
-            return True
+    vector_sync["faqs"].sync()
 
-    return False
+    notify_data_changed("faqs", faq_id)
+
+    return True
 
 def search_faqs(query: str, limit: int = 3):
     """
     Tìm kiếm câu hỏi thường gặp dựa trên từ khóa trong query
-    Sử dụng vector database nếu có, nếu không sẽ sử dụng tìm kiếm từ khóa đơn giản
+    Sử dụng vector database nếu có (kết hợp BM25), nếu không sẽ chỉ dùng BM25
     """
-    if VECTOR_DB_ENABLED:
-        try:
-            results = faq_collection.query(
-                query_texts=[query],
-                n_results=limit
-            )
-
-            if results and results["metadatas"] and len(results["metadatas"][0]) > 0:
-                return results["metadatas"][0]
-        except Exception as e:
-            print(f"Error searching FAQs in vector database: {e}")
-            print("Falling back to keyword search...")
-
-    # Fallback to keyword search
-    faqs = get_faqs()
-    query = query.lower()
-
-    # Tìm kiếm FAQ có chứa từ khóa trong câu hỏi hoặc câu trả lời
-    matched_faqs = []
-    for faq in faqs:
-        if (query in faq["question"].lower() or
-            query in faq["answer"].lower()):
-            matched_faqs.append(faq)
-
-    # Giới hạn số lượng kết quả
-    return matched_faqs[:limit]
+    return hybrid_search(faq_collection, faq_lexical_index, query, limit, "FAQs")
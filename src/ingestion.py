@@ -0,0 +1,93 @@
+"""
+Khởi tạo nền khi ứng dụng khởi động: kết nối ChromaDB / tải model embedding
+và nạp catalog mà không chặn việc phục vụ request.
+
+Chỉ một worker (giữ được file lock INGEST_LOCK_FILE) thực hiện tải catalog từ API
+và đồng bộ vector; các worker khác chỉ khởi tạo kết nối và đọc products.json
+khi file thay đổi (xem Catalog).
+"""
+import os
+import time
+import asyncio
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, coi như worker duy nhất
+    fcntl = None
+
+from . import database
+from .prompt_builder import product_snippets
+
+INGEST_LOCK_FILE = os.getenv("INGEST_LOCK_FILE", f"{database.DATA_DIR}/ingest.lock")
+
+status = {
+    "vector_db": "pending",   # pending | initializing | ready | disabled
+    "ingestion": "pending",   # pending | running | done | failed | follower
+    "leader": False,
+    "started_at": time.time(),
+    "vector_db_seconds": None,
+    "ingestion_seconds": None,
+}
+
+# Giữ file lock trong suốt vòng đời tiến trình leader
+_lock_file = None
+
+
+def acquire_leader_lock(path: str = INGEST_LOCK_FILE) -> bool:
+    """Thử giữ lock không chặn; True nếu tiến trình này trở thành leader"""
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    if fcntl is None:
+        return True
+
+    lock_file = open(path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _lock_file = lock_file
+    return True
+
+
+async def run_background_ingestion():
+    start = time.perf_counter()
+    status["vector_db"] = "initializing"
+    enabled = await asyncio.to_thread(database.init_vector_db)
+    status["vector_db"] = "ready" if enabled else "disabled"
+    status["vector_db_seconds"] = round(time.perf_counter() - start, 2)
+
+    if not acquire_leader_lock():
+        status["ingestion"] = "follower"
+        print("Another worker is ingesting the catalog, skipping")
+        await asyncio.to_thread(product_snippets.warm)
+        return
+
+    status["leader"] = True
+    status["ingestion"] = "running"
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(database.initialize_data_files)
+        # Dựng sẵn snippet prompt cho toàn bộ catalog vừa nạp
+        await asyncio.to_thread(product_snippets.warm)
+        status["ingestion"] = "done"
+    except Exception as e:
+        print(f"Error during background ingestion: {e}")
+        status["ingestion"] = "failed"
+    status["ingestion_seconds"] = round(time.perf_counter() - start, 2)
+
+
+def start_background_ingestion() -> Optional[asyncio.Task]:
+    """Tạo data file rỗng nếu thiếu rồi chạy phần khởi tạo chậm trong task nền"""
+    database.ensure_data_files()
+    return asyncio.create_task(run_background_ingestion())
+
+
+def is_ready() -> bool:
+    """Sẵn sàng phục vụ khi vector DB đã kết nối (hoặc đã chuyển sang tìm kiếm từ khóa)"""
+    return status["vector_db"] in ("ready", "disabled")
@@ -0,0 +1,323 @@
+"""
+Bộ phân loại ý định chạy cục bộ, dùng trước khi phải gọi Gemini.
+
+Mỗi classifier trả về (intent, confidence). Chatbot chỉ gọi LLM khi
+confidence thấp hơn ngưỡng INTENT_CONFIDENCE_THRESHOLD.
+"""
+import os
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .text_utils import normalize_text
+
+INTENTS = [
+    "product_inquiry",
+    "policy_inquiry",
+    "order_management",
+    "general_question",
+    "product_recommendation",
+]
+
+# Câu mẫu để dựng centroid cho EmbeddingIntentClassifier
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "product_inquiry": [
+        "Bàn làm việc này giá bao nhiêu?",
+        "Ghế sofa này làm bằng chất liệu gì?",
+        "Kích thước của tủ quần áo là bao nhiêu?",
+        "Sản phẩm này còn hàng không?",
+        "Có màu khác cho chiếc ghế này không?",
+        "How much is the executive office desk?",
+        "What material is this chair made of?",
+        "Is this bed frame in stock?",
+    ],
+    "policy_inquiry": [
+        "Chính sách bảo hành như thế nào?",
+        "Tôi có thể đổi trả sản phẩm không?",
+        "Phí vận chuyển là bao nhiêu?",
+        "Có hỗ trợ trả góp không?",
+        "Các phương thức thanh toán được chấp nhận?",
+        "What is your return policy?",
+        "How long is the warranty?",
+        "Do you offer free shipping?",
+    ],
+    "order_management": [
+        "Đơn hàng của tôi đang ở đâu?",
+        "Kiểm tra trạng thái đơn hàng giúp tôi",
+        "Tôi muốn xem lịch sử mua hàng",
+        "Khi nào đơn hàng của tôi được giao?",
+        "Tôi đã mua những gì?",
+        "Where is my order?",
+        "Show me my purchase history",
+        "What is the status of my order?",
+    ],
+    "general_question": [
+        "Cửa hàng mở cửa lúc mấy giờ?",
+        "Showroom của Interlux ở đâu?",
+        "Số hotline của cửa hàng là gì?",
+        "Có dịch vụ lắp đặt không?",
+        "Xin chào",
+        "What are your opening hours?",
+        "Where is your showroom?",
+        "How can I contact you?",
+    ],
+    "product_recommendation": [
+        "Gợi ý cho tôi một bộ sofa cho phòng khách nhỏ",
+        "Tôi nên mua bàn làm việc nào?",
+        "Tư vấn giúp tôi ghế phù hợp cho văn phòng",
+        "Có mẫu giường nào phù hợp với phòng ngủ hiện đại không?",
+        "Đề xuất vài sản phẩm dưới 1000 USD",
+        "Can you recommend a desk for a home office?",
+        "Suggest a comfortable chair for gaming",
+        "Which sofa should I buy for a small apartment?",
+    ],
+}
+
+# Từ khóa (đã bỏ dấu, chữ thường) và trọng số cho từng ý định
+INTENT_KEYWORDS: Dict[str, List[tuple]] = {
+    "order_management": [
+        (r"\bdon hang\b", 2.0),
+        (r"\bdon cua toi\b", 2.0),
+        (r"\bma don\b", 2.0),
+        (r"\blich su mua\b", 2.0),
+        (r"\bda mua\b", 1.5),
+        (r"\bda dat\b", 1.5),
+        (r"\bmy orders?\b", 2.0),
+        (r"\border status\b", 2.0),
+        (r"\bpurchase history\b", 2.0),
+        (r"\btrack(ing)?\b", 1.5),
+    ],
+    "policy_inquiry": [
+        (r"\bchinh sach\b", 2.0),
+        (r"\bbao hanh\b", 2.0),
+        (r"\bdoi tra\b", 2.0),
+        (r"\bhoan tien\b", 2.0),
+        (r"\bvan chuyen\b", 1.5),
+        (r"\bphi ship\b", 1.5),
+        (r"\bmien phi giao\b", 1.5),
+        (r"\bthanh toan\b", 1.5),
+        (r"\btra gop\b", 1.5),
+        (r"\bpolic(y|ies)\b", 2.0),
+        (r"\bwarranty\b", 2.0),
+        (r"\breturns?\b", 1.5),
+        (r"\brefunds?\b", 2.0),
+        (r"\bshipping\b", 1.5),
+        (r"\bpayments?\b", 1.5),
+        (r"\binstallments?\b", 1.5),
+        (r"\bgiao hang\b", 1.5),
+        (r"\bdeliver(y|ed)?\b", 1.5),
+    ],
+    "product_recommendation": [
+        (r"\bgoi y\b", 3.0),
+        (r"\bde xuat\b", 3.0),
+        (r"\btu van\b", 2.0),
+        (r"\bnen mua\b", 3.0),
+        (r"\bnen chon\b", 3.0),
+        (r"\bphu hop\b", 1.0),
+        (r"\brecommend", 3.0),
+        (r"\bsuggest", 3.0),
+        (r"\bshould i (buy|choose|get)\b", 3.0),
+        (r"\bbest .* for\b", 1.0),
+    ],
+    "product_inquiry": [
+        (r"\bgia\b(?! dinh)", 1.5),
+        (r"\bbao nhieu tien\b", 2.0),
+        (r"\bcon hang\b", 1.5),
+        (r"\bchat lieu\b", 1.5),
+        (r"\bkich thuoc\b", 1.5),
+        (r"\bsan pham\b", 1.0),
+        (r"\bhow much\b", 2.0),
+        (r"\bprices?\b", 1.5),
+        (r"\bin stock\b", 1.5),
+        (r"\bmaterial\b", 1.5),
+        (r"\bdimensions?\b", 1.5),
+        (r"\b(desk|chair|table|sofa|bed|cabinet|shelf|lamp|wardrobe)s?\b", 1.0),
+    ],
+    "general_question": [
+        (r"\bcua hang\b", 1.0),
+        (r"\bshowroom\b", 2.0),
+        (r"\bdia chi\b", 2.0),
+        (r"\bgio mo cua\b", 2.0),
+        (r"\bmo cua\b", 1.5),
+        (r"\bhotline\b", 2.0),
+        (r"\blien he\b", 2.0),
+        (r"\blap dat\b", 1.5),
+        (r"\bdat hang\b", 1.0),
+        (r"\bxin chao\b", 2.0),
+        (r"\b(hello|hi)\b", 1.5),
+        (r"\bopening hours\b", 2.0),
+        (r"\baddress\b", 2.0),
+        (r"\bcontact\b", 2.0),
+        (r"\binstall(ation)?\b", 1.5),
+    ],
+}
+
+
+# Từ mà dạng bỏ dấu trùng với từ khác ("bàn"/"bạn", "tủ"/"tư", "đèn"/"đến", "màu"/"mẫu"/"mau"):
+# so khớp trên văn bản có dấu; tin nhắn gõ không dấu thì so khớp trên dạng đã bỏ dấu
+INTENT_ACCENTED_KEYWORDS: Dict[str, List[tuple]] = {
+    "product_inquiry": [
+        (r"\b(mẫu|màu)\b", 1.0),
+        (r"\b(bàn|ghế|sofa|tủ|kệ|giường|đèn|thảm)\b", 1.0),
+    ],
+}
+
+
+class IntentPrediction(NamedTuple):
+    intent: str
+    confidence: float
+
+
+class KeywordIntentClassifier:
+    """Phân loại bằng regex trên văn bản đã bỏ dấu (và có dấu, xem INTENT_ACCENTED_KEYWORDS); gần như không tốn thời gian"""
+
+    def __init__(
+        self,
+        keywords: Dict[str, List[tuple]] = INTENT_KEYWORDS,
+        accented_keywords: Dict[str, List[tuple]] = INTENT_ACCENTED_KEYWORDS,
+    ):
+        self.patterns = {
+            intent: [(re.compile(pattern), weight) for pattern, weight in rules]
+            for intent, rules in keywords.items()
+        }
+        self.accented_patterns = {
+            intent: [(re.compile(pattern), weight) for pattern, weight in rules]
+            for intent, rules in accented_keywords.items()
+        }
+        self.folded_accented_patterns = {
+            intent: [(re.compile(normalize_text(pattern)), weight) for pattern, weight in rules]
+            for intent, rules in accented_keywords.items()
+        }
+
+    def predict(self, message: str) -> IntentPrediction:
+        text = normalize_text(message)
+        accented = " ".join(unicodedata.normalize("NFC", message).lower().split())
+        if accented == text:
+            accented_text, accented_patterns = text, self.folded_accented_patterns
+        else:
+            accented_text, accented_patterns = accented, self.accented_patterns
+        scores = {
+            intent: sum(weight for pattern, weight in rules if pattern.search(text))
+            for intent, rules in self.patterns.items()
+        }
+        for intent, rules in accented_patterns.items():
+            scores[intent] += sum(weight for pattern, weight in rules if pattern.search(accented_text))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (top_intent, top_score), (_, second_score) = ranked[0], ranked[1]
+        if top_score <= 0:
+            return IntentPrediction("general_question", 0.0)
+
+        # Giảm theo điểm của đối thủ gần nhất, phạt khi chỉ khớp từ khóa yếu
+        confidence = 1.0 - 0.5 * second_score / top_score
+        confidence *= min(1.0, top_score / 2.0)
+        return IntentPrediction(top_intent, confidence)
+
+
+def _default_embedder() -> Optional[Callable[[List[str]], List[List[float]]]]:
+    """
+    Dùng chung model all-MiniLM-L6-v2 của vector database (database.embed_queries).
+    None khi vector database chưa sẵn sàng hoặc bị tắt: không tự tải thêm một bản model.
+    """
+    from . import database, ingestion
+
+    if ingestion.is_ready() and database.VECTOR_DB_ENABLED:
+        return database.embed_queries
+    return None
+
+
+class EmbeddingIntentClassifier:
+    """Nearest-centroid trên embedding của các câu mẫu trong INTENT_EXAMPLES"""
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        examples: Dict[str, List[str]] = INTENT_EXAMPLES,
+        temperature: float = 0.05,
+    ):
+        self._embed = embed
+        self.examples = examples
+        self.temperature = temperature
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _normalize(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _ensure_centroids(self) -> bool:
+        """Dựng centroid một lần (các request đồng thời chờ nhau); False nếu chưa có model embedding"""
+        if self.centroids is not None:
+            return True
+        with self._lock:
+            if self.centroids is not None:
+                return True
+            if self._embed is None:
+                self._embed = _default_embedder()
+                if self._embed is None:
+                    return False
+
+            labels, centroids = [], []
+            for intent, sentences in self.examples.items():
+                vectors = self._normalize(self._embed(sentences))
+                centroids.append(vectors.mean(axis=0))
+                labels.append(intent)
+            self.labels = labels
+            self.centroids = self._normalize(centroids)
+        return True
+
+    def predict(self, message: str) -> IntentPrediction:
+        if not self._ensure_centroids():
+            # Chưa có model embedding: confidence 0 để dùng từ khóa / LLM
+            return IntentPrediction("general_question", 0.0)
+        query = self._normalize(self._embed([message]))[0]
+        similarities = self.centroids @ query
+
+        # Softmax trên cosine similarity để có confidence trong khoảng [0, 1]
+        logits = (similarities - similarities.max()) / self.temperature
+        probabilities = np.exp(logits) / np.exp(logits).sum()
+        best = int(np.argmax(probabilities))
+        return IntentPrediction(self.labels[best], float(probabilities[best]))
+
+
+class CascadeIntentClassifier:
+    """Thử lần lượt các classifier, dừng ở kết quả đầu tiên vượt ngưỡng"""
+
+    def __init__(self, classifiers: List, threshold: float):
+        self.classifiers = classifiers
+        self.threshold = threshold
+
+    def predict(self, message: str) -> IntentPrediction:
+        best = IntentPrediction("general_question", 0.0)
+        for classifier in self.classifiers:
+            prediction = classifier.predict(message)
+            if prediction.confidence >= self.threshold:
+                return prediction
+            if prediction.confidence > best.confidence:
+                best = prediction
+        return best
+
+
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "hybrid")
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7"))
+
+
+def create_intent_classifier(name: str = INTENT_CLASSIFIER, threshold: float = INTENT_CONFIDENCE_THRESHOLD):
+    """
+    Tạo classifier theo cấu hình:
+    - "keyword": chỉ dùng regex
+    - "embedding": nearest-centroid trên all-MiniLM-L6-v2
+    - "hybrid": regex trước, embedding khi regex không chắc chắn
+    - "llm": không dùng classifier cục bộ (trả về None)
+    """
+    if name == "keyword":
+        return KeywordIntentClassifier()
+    if name == "embedding":
+        return EmbeddingIntentClassifier()
+    if name == "hybrid":
+        return CascadeIntentClassifier([KeywordIntentClassifier(), EmbeddingIntentClassifier()], threshold)
+    return None
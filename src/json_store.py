@@ -0,0 +1,171 @@
+"""
+Ghi file JSON an toàn khi có nhiều luồng / tiến trình cùng sửa.
+
+- Ghi ra file tạm trong cùng thư mục, fsync rồi os.replace: người đọc luôn thấy
+  bản cũ hoặc bản mới đầy đủ, không bao giờ thấy file ghi dở.
+- Mỗi file có một lock trong tiến trình và một file lock (flock) giữa các tiến
+  trình; đọc - sửa - ghi nằm trọn trong lock nên không mất cập nhật.
+- Gộp ghi (group commit): các thay đổi đến trong lúc một lần ghi đang chạy được
+  áp dụng cùng nhau ở lần đọc - ghi kế tiếp, thay vì mỗi thay đổi ghi lại cả file.
+- Serialize gọn (không indent) để file nhỏ và ghi nhanh hơn.
+"""
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ khóa trong tiến trình
+    fcntl = None
+
+
+def dump_json(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def atomic_write_json(file_path: str, data):
+    """Ghi JSON ra file tạm rồi rename đè lên file đích"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", dir=directory)
+    try:
+        # mkstemp tạo file quyền 0600: giữ quyền của file cũ
+        try:
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(dump_json(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class _Mutation:
+    __slots__ = ("apply", "done", "result", "error")
+
+    def __init__(self, apply: Callable[[Any], Any]):
+        self.apply = apply
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class JsonFileStore:
+    """Một file JSON, sửa qua update(fn) với lock và gộp ghi"""
+
+    def __init__(self, path: str, default: Callable[[], Any] = list):
+        self.path = path
+        self.default = default
+        self._commit_lock = threading.Lock()
+        self._queue_lock = threading.Lock()
+        self._pending: List[_Mutation] = []
+        self.counters = {"mutations": 0, "writes": 0}
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked(self):
+        """Giữ lock của file (trong tiến trình và giữa các tiến trình) cho một thao tác đọc - ghi tự quản"""
+        with self._commit_lock, self._file_lock():
+            yield
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self.default()
+
+    def load(self):
+        return self._read()
+
+    def update(self, apply: Callable[[Any], Any]):
+        """
+        Gọi apply(data) trên nội dung hiện tại của file rồi ghi lại; trả về kết quả của apply.
+        apply trả về False nghĩa là không có gì thay đổi. Các lời gọi đồng thời được gộp
+        vào một lần đọc - ghi; mỗi lời gọi chỉ trả về sau khi thay đổi của nó đã nằm trên đĩa.
+        """
+        mutation = _Mutation(apply)
+        with self._queue_lock:
+            self._pending.append(mutation)
+
+        with self._commit_lock:
+            if not mutation.done:
+                with self._queue_lock:
+                    batch, self._pending = self._pending, []
+                self._commit(batch)
+
+        if mutation.error is not None:
+            raise mutation.error
+        return mutation.result
+
+    def _commit(self, batch: List[_Mutation]):
+        try:
+            with self._file_lock():
+                data = self._read()
+                changed = False
+                for mutation in batch:
+                    try:
+                        mutation.result = mutation.apply(data)
+                        changed = changed or mutation.result is not False
+                    except Exception as e:
+                        mutation.error = e
+                if changed:
+                    atomic_write_json(self.path, data)
+                    self.counters["writes"] += 1
+        except Exception as e:
+            for mutation in batch:
+                if mutation.error is None:
+                    mutation.error = e
+        finally:
+            self.counters["mutations"] += len(batch)
+            for mutation in batch:
+                mutation.done = True
+
+    def replace(self, data):
+        """Ghi đè toàn bộ nội dung file (không cần đọc nội dung cũ)"""
+        with self.locked():
+            atomic_write_json(self.path, data)
+            self.counters["mutations"] += 1
+            self.counters["writes"] += 1
+
+    def stats(self) -> Dict:
+        return dict(self.counters)
+
+
+_stores: Dict[str, JsonFileStore] = {}
+_stores_lock = threading.Lock()
+
+
+def json_file_store(path: str, default: Optional[Callable[[], Any]] = None) -> JsonFileStore:
+    """
+    JsonFileStore dùng chung cho mỗi đường dẫn, để mọi nơi ghi cùng file chia sẻ một lock.
+    `default` (mặc định list) là giá trị khi file chưa tồn tại.
+    """
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = JsonFileStore(path, default or list)
+        elif default is not None:
+            store.default = default
+        return store
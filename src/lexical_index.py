@@ -0,0 +1,231 @@
+"""
+Chỉ mục BM25 cho products, policies và FAQs.
+
+Văn bản được bỏ dấu, tách thành âm tiết và cặp âm tiết liền kề ("ban_lam",
+"lam_viec") vì từ tiếng Việt thường gồm nhiều âm tiết. Một vài cụm từ nội thất
+tiếng Việt được mở rộng sang tiếng Anh để khớp tên sản phẩm trong catalog,
+và vài cách nói đồng nghĩa ("giao hàng" / "vận chuyển") được mở rộng cho nhau.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from .text_utils import normalize_text
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Từ chức năng phổ biến (đã bỏ dấu), không mang thông tin để xếp hạng
+STOPWORDS = {
+    "toi", "minh", "em", "anh", "chi", "muon", "can", "cho", "cua", "la", "co", "khong", "nao",
+    "gi", "va", "voi", "mot", "nhung", "cac", "thi", "nhe", "o", "duoc", "de",
+    "a", "the", "is", "are", "and", "or", "of", "to", "for", "in", "on", "with", "my", "me",
+    "i", "do", "you", "your", "what", "how",
+}
+
+# Cụm từ tiếng Việt -> từ khóa tiếng Anh trong tên/danh mục sản phẩm, hoặc cách nói
+# khác dùng trong chính sách/FAQ. So khớp trên văn bản có dấu để phân biệt "bàn"/"bạn",
+# "tủ"/"tư"; câu hỏi gõ không dấu thì so khớp trên dạng đã bỏ dấu.
+QUERY_SYNONYMS = {
+    "bàn làm việc": "desk office",
+    "bàn ăn": "dining table",
+    "bàn": "table desk",
+    "ghế": "chair",
+    "sofa": "sofa",
+    "giường": "bed",
+    "tủ quần áo": "wardrobe",
+    "tủ": "cabinet",
+    "kệ tivi": "tv unit",
+    "kệ tv": "tv unit",
+    "kệ": "shelf",
+    "đèn": "lamp",
+    "thảm": "rug",
+    "da thật": "leather",
+    "da": "leather",
+    "góc": "corner",
+    "văn phòng": "office",
+    "giao hàng": "vận chuyển",
+    "ship": "vận chuyển",
+    "trả góp": "thanh toán",
+    "đổi hàng": "đổi trả",
+    "trả hàng": "đổi trả",
+}
+
+
+def _compile_synonyms(fold: bool):
+    phrases = sorted(QUERY_SYNONYMS.items(), key=lambda item: -len(item[0]))
+    return [
+        (re.compile(rf"\b{re.escape(normalize_text(phrase) if fold else phrase)}\b"), expansion)
+        for phrase, expansion in phrases
+    ]
+
+
+_SYNONYM_RES = _compile_synonyms(fold=False)
+_FOLDED_SYNONYM_RES = _compile_synonyms(fold=True)
+
+
+def tokenize(text: str) -> List[str]:
+    """Âm tiết (bỏ stopword) và cặp âm tiết liền kề trên văn bản đã bỏ dấu"""
+    words = _TOKEN_RE.findall(normalize_text(text))
+    tokens = [word for word in words if word not in STOPWORDS]
+    tokens.extend(f"{a}_{b}" for a, b in zip(words, words[1:]))
+    return tokens
+
+
+def expand_query(query: str) -> str:
+    """Thêm từ khóa tiếng Anh cho các cụm từ nội thất tiếng Việt trong câu hỏi"""
+    text = " ".join(query.lower().split())
+    folded = normalize_text(query)
+    patterns = _FOLDED_SYNONYM_RES if text == folded else _SYNONYM_RES
+    # Cụm dài được xét trước; cụm ngắn nằm trong cụm đã khớp ("bàn" trong "bàn ăn") không mở rộng thêm
+    expansions, spans = [], []
+    for pattern, expansion in patterns:
+        for match in pattern.finditer(text):
+            if not any(match.start() < end and start < match.end() for start, end in spans):
+                spans.append(match.span())
+                expansions.append(expansion)
+                break
+    return " ".join([query] + expansions)
+
+
+class BM25Index:
+    """
+    Chỉ mục BM25 hỗ trợ thêm/xóa từng document. IDF và độ dài trung bình được tính
+    khi tìm kiếm nên không phải dựng lại cả chỉ mục khi một document thay đổi.
+    """
+
+    def __init__(self, documents: List[Tuple[Hashable, str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {id document: tần suất}; sửa tại chỗ khi thêm/xóa document, search duyệt
+        # trên bản sao list(...) (sao chép nguyên tử dưới GIL) nên không lỗi khi bị sửa đồng thời
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.doc_terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self.total_length = 0
+        for doc_id, text in documents:
+            self.add(doc_id, text)
+
+    def add(self, doc_id: Hashable, text: str):
+        """Thêm (hoặc thay) một document"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.doc_terms[doc_id] = tuple(counts)
+        self.total_length += len(tokens)
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def remove(self, doc_id: Hashable):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def search(self, query: str, limit: int = 5, allowed: Optional[Set] = None) -> List[Tuple[Hashable, float]]:
+        """
+        (id, điểm BM25) của các document khớp ít nhất một term, điểm giảm dần.
+        `allowed`: chỉ xếp hạng các id trong tập này (ứng viên đã lọc trước).
+        """
+        total = len(self.doc_lengths)
+        avg_length = self.total_length / total if total else 0.0
+        scores: Dict[Hashable, float] = {}
+        for term in set(tokenize(expand_query(query))):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in list(postings.items()):
+                length = self.doc_lengths.get(doc_id)
+                if length is None:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / (avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        if allowed is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if doc_id in allowed}
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class LexicalIndex:
+    """
+    BM25Index trên một nguồn dữ liệu, cập nhật khi version (phiên bản change log,
+    catalog...) thay đổi. Nếu có `delta(since)` (xem ChangeLog.delta), chỉ các bản ghi
+    thay đổi được thêm/xóa khỏi chỉ mục; nếu không thì dựng lại toàn bộ.
+    """
+
+    def __init__(
+        self,
+        version: Callable[[], Hashable],
+        load: Callable[[], List[Dict]],
+        text_of: Callable[[Dict], str],
+        key: str = "id",
+        delta: Optional[Callable] = None,
+    ):
+        self.version = version
+        self.load = load
+        self.text_of = text_of
+        self.key = key
+        self.delta = delta
+        self._lock = threading.Lock()
+        # (version, id -> record, BM25Index)
+        self._state = (object(), {}, None)
+
+    def _ensure_built(self):
+        version = self.version()
+        if version == self._state[0]:
+            return self._state
+        with self._lock:
+            built_version, records, index = self._state
+            if version == built_version:
+                return self._state
+            changes = None
+            if self.delta is not None and index is not None:
+                version, _, changes = self.delta(built_version)
+            if changes is None:
+                loaded = self.load()
+                records = {record[self.key]: record for record in loaded}
+                index = BM25Index([(record[self.key], self.text_of(record)) for record in loaded])
+            else:
+                for change in changes:
+                    records.pop(change.id, None)
+                    index.remove(change.id)
+                    if change.record is not None:
+                        records[change.id] = change.record
+                        index.add(change.id, self.text_of(change.record))
+            self._state = (version, records, index)
+        return self._state
+
+    def hydrate(self, ids) -> List[Dict]:
+        """Bản ghi hiện tại theo thứ tự ids, bỏ qua id không còn tồn tại"""
+        _, records, _ = self._ensure_built()
+        return [record for record in map(records.get, ids) if record is not None]
+
+    def search(self, query: str, limit: int = 5, allowed: Optional[Set] = None) -> List[Dict]:
+        _, records, index = self._ensure_built()
+        matches = (records.get(doc_id) for doc_id, _ in index.search(query, limit, allowed))
+        return [record for record in matches if record is not None]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], limit: int, key: str = "id", k: int = 60) -> List[Dict]:
+    """Gộp nhiều danh sách kết quả theo RRF: điểm = tổng 1 / (k + thứ hạng)"""
+    scores: Dict[Hashable, float] = {}
+    records: Dict[Hashable, Dict] = {}
+    for results in result_lists:
+        for rank, record in enumerate(results):
+            doc_id = record[key]
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+            records.setdefault(doc_id, record)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [records[doc_id] for doc_id in ranked]
@@ -1,44 +1,210 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional, Literal
+import os
+import time
+from array import array
+from pydantic import BaseModel, ConfigDict
+from typing import List, Dict, Optional, Literal, NamedTuple, Iterator
 from datetime import datetime
 
-class ChatMessage(BaseModel):
-    role: Literal["user", "bot"]
+from .text_utils import estimate_tokens
+
+# Giới hạn lịch sử đưa vào prompt và ngưỡng gộp tin nhắn cũ thành bản tóm tắt
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARIZE_AFTER = int(os.getenv("HISTORY_SUMMARIZE_AFTER", "20"))
+HISTORY_KEEP_MESSAGES = int(os.getenv("HISTORY_KEEP_MESSAGES", "10"))
+# Số sản phẩm gần nhất được mang sang các lượt sau
+CARRIED_PRODUCTS_LIMIT = int(os.getenv("CARRIED_PRODUCTS_LIMIT", "5"))
+
+# Vai trò được lưu dưới dạng mã 1 byte trong MessageLog
+ROLES = ("user", "bot")
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+class ChatMessage(NamedTuple):
+    """View của một tin nhắn, được tạo khi đọc từ MessageLog"""
+    role: str
     content: str
-    timestamp: datetime = datetime.now()
+    timestamp: int  # epoch seconds
 
-class UserSession(BaseModel):
-    user_id: str
-    messages: List[ChatMessage] = []
-    context: Dict = {}
-    last_activity: datetime = datetime.now()
+class MessageLog:
+    """
+    Danh sách tin nhắn lưu theo cột: mã vai trò (array 'B'), timestamp epoch
+    (array 'q') và nội dung (list str), thay vì một object cho mỗi tin nhắn.
+    """
+    __slots__ = ("roles", "timestamps", "contents")
+
+    def __init__(self):
+        self.roles = array("B")
+        self.timestamps = array("q")
+        self.contents: List[str] = []
+
+    def append(self, role: str, content: str, timestamp: Optional[int] = None):
+        self.roles.append(ROLE_CODES[role])
+        self.timestamps.append(int(time.time()) if timestamp is None else timestamp)
+        self.contents.append(content)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __getitem__(self, index: int) -> ChatMessage:
+        return ChatMessage(ROLES[self.roles[index]], self.contents[index], self.timestamps[index])
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        for index in range(len(self.contents)):
+            yield self[index]
+
+    def __reversed__(self) -> Iterator[ChatMessage]:
+        for index in range(len(self.contents) - 1, -1, -1):
+            yield self[index]
+
+    def slice(self, start: int = 0, stop: Optional[int] = None) -> List[ChatMessage]:
+        return [self[index] for index in range(*slice(start, stop).indices(len(self.contents)))]
+
+    def drop_first(self, count: int):
+        del self.roles[:count]
+        del self.timestamps[:count]
+        del self.contents[:count]
+
+class UserSession:
+    """Phiên chat của một người dùng; dùng __slots__ để giảm bộ nhớ mỗi phiên"""
+    __slots__ = ("user_id", "messages", "context", "last_activity", "summary", "message_count", "recent_products")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.messages = MessageLog()
+        self.context: Dict = {}
+        self.last_activity = int(time.time())  # epoch seconds
+        self.summary = ""
+        self.message_count = 0  # Tổng số tin nhắn từng được thêm, kể cả đã gộp vào summary
+        self.recent_products: List[Dict] = []
 
     def add_message(self, role: Literal["user", "bot"], content: str):
-        self.messages.append(ChatMessage(role=role, content=content))
+        self.messages.append(role, content)
+        self.message_count += 1
+
+    def get_messages(self, since: int = 0):
+        """Tin nhắn có số thứ tự >= since (chỉ trả về phần còn giữ trong bộ nhớ)"""
+        offset = max(0, since - (self.message_count - len(self.messages)))
+        return [{"role": msg.role, "content": msg.content, "timestamp": datetime.fromtimestamp(msg.timestamp).isoformat()}
+                for msg in self.messages.slice(offset)]
 
-    def get_messages(self):
-        return [{"role": msg.role, "content": msg.content, "timestamp": msg.timestamp.isoformat()}
-                for msg in self.messages]
+    def get_chat_history(self, max_tokens: int = HISTORY_TOKEN_BUDGET):
+        """Bản tóm tắt cũ cộng các tin nhắn gần nhất vừa với ngân sách token"""
+        lines = []
+        used_tokens = 0
+        for msg in reversed(self.messages):
+            line = f"{msg.role.capitalize()}: {msg.content}"
+            tokens = estimate_tokens(line)
+            if lines and used_tokens + tokens > max_tokens:
+                break
+            lines.append(line)
+            used_tokens += tokens
 
-    def get_chat_history(self):
-        return "\n".join([f"{msg.role.capitalize()}: {msg.content}" for msg in self.messages])
+        history = "\n".join(reversed(lines))
+        if self.summary:
+            history = f"Tóm tắt hội thoại trước đó: {self.summary}\n{history}"
+        return history
+
+    def remember_products(self, products: List[Dict], limit: int = CARRIED_PRODUCTS_LIMIT):
+        """Lưu bản rút gọn của các sản phẩm vừa nhắc đến, chỉ giữ `limit` sản phẩm mới nhất"""
+        for product in products:
+            self.recent_products = [p for p in self.recent_products if p["id"] != product["id"]]
+            self.recent_products.append({
+                "id": product["id"],
+                "title": product.get("title", ""),
+                "price": product.get("price", 0),
+            })
+        del self.recent_products[:-limit]
+
+    def first_message_index(self) -> int:
+        """Số thứ tự (tính từ đầu phiên) của tin nhắn cũ nhất còn giữ trong bộ nhớ"""
+        return self.message_count - len(self.messages)
+
+    def pending_summary_messages(self) -> List[ChatMessage]:
+        """Các tin nhắn cũ cần gộp vào summary khi lịch sử vượt HISTORY_SUMMARIZE_AFTER"""
+        if len(self.messages) <= HISTORY_SUMMARIZE_AFTER:
+            return []
+        return self.messages.slice(0, len(self.messages) - HISTORY_KEEP_MESSAGES)
+
+    def apply_summary(self, summary: str, until: int) -> bool:
+        """
+        Thay summary và bỏ các tin nhắn có số thứ tự < until (tin nhắn đã được gộp).
+        Trả về False nếu các tin nhắn này đã được gộp trước đó (không thay đổi gì).
+        """
+        folded_count = min(until - self.first_message_index(), len(self.messages))
+        if folded_count <= 0:
+            return False
+        self.summary = summary
+        self.messages.drop_first(folded_count)
+        return True
+
+    def to_dict(self) -> Dict:
+        return {
+            "user_id": self.user_id,
+            "roles": self.messages.roles.tolist(),
+            "timestamps": self.messages.timestamps.tolist(),
+            "contents": self.messages.contents,
+            "context": self.context,
+            "last_activity": self.last_activity,
+            "summary": self.summary,
+            "message_count": self.message_count,
+            "recent_products": self.recent_products,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "UserSession":
+        session = cls(user_id=data["user_id"])
+        session.messages.roles.extend(data.get("roles", []))
+        session.messages.timestamps.extend(data.get("timestamps", []))
+        session.messages.contents.extend(data.get("contents", []))
+        session.context = data.get("context", {})
+        session.last_activity = data.get("last_activity", session.last_activity)
+        session.summary = data.get("summary", "")
+        session.message_count = data.get("message_count", len(session.messages))
+        session.recent_products = data.get("recent_products", [])
+        return session
 
 class ProductModel(BaseModel):
     file: str
     format: str
 
+class ProductImage(BaseModel):
+    type: str = "image"
+    fileName: Optional[str] = None
+    filePath: str
+
+class ProductCategory(BaseModel):
+    id: Optional[int] = None
+    name: str
+    slug: str
+
+class ProductVariation(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: Optional[int] = None
+    sku: str
+    price: float
+    percentOff: Optional[float] = 0
+    finalPrice: Optional[float] = None
+    inventory: Optional[int] = 0
+    isDefault: Optional[bool] = False
+    images: List[ProductImage] = []
+
 class Product(BaseModel):
+    """Sản phẩm theo dạng của API catalog; các trường khác của API được giữ nguyên"""
+    model_config = ConfigDict(extra="allow")
+
     id: int
     title: str
     slug: str
-    description: str
+    description: Optional[str] = ""
     price: float
-    percentOff: Optional[int] = 0
+    percentOff: Optional[float] = 0
+    finalPrice: Optional[float] = None
     sold: Optional[int] = 0
     attributes: Dict[str, str] = {}
-    category: str
+    category: ProductCategory
     model: Optional[ProductModel] = None
-    images: List[str] = []
+    images: List[ProductImage] = []
+    variations: List[ProductVariation] = []
     sort: Optional[int] = 0
     status: str = "PUBLISHED"
     createdAt: Optional[datetime] = None
@@ -0,0 +1,139 @@
+"""
+Lịch sử đơn hàng cho endpoint /orders/{user_id}, không qua LLM.
+
+Mỗi trang kết quả được lưu sẵn dưới dạng JSON đã mã hóa kèm ETag, theo từng
+người dùng. Cache của một người dùng bị xóa khi đơn hàng của họ thay đổi
+(listener "orders" trong database), và mọi mục hết hạn khi catalog đổi phiên
+bản (thông tin sản phẩm trong đơn thay đổi) hoặc sau ORDERS_CACHE_TTL_SECONDS.
+
+Đơn hàng là dữ liệu cá nhân: chỉ trả về khi request có header
+"Authorization: Bearer <token>" với token = HMAC-SHA256(ORDERS_AUTH_SECRET, user_id).
+Token được cấp cùng user_id khi server tạo phiên chat mới (/chat, /chat/stream),
+hoặc bởi backend Interlux dùng chung khóa bí mật cho người dùng đã đăng nhập.
+"""
+import os
+import hmac
+import json
+import secrets
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from .database import catalog, count_user_orders, get_user_orders, register_change_listener
+
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "20"))
+ORDERS_MAX_PAGE_SIZE = int(os.getenv("ORDERS_MAX_PAGE_SIZE", "100"))
+ORDERS_CACHE_TTL_SECONDS = float(os.getenv("ORDERS_CACHE_TTL_SECONDS", "300"))
+ORDERS_CACHE_MAX_ENTRIES = int(os.getenv("ORDERS_CACHE_MAX_ENTRIES", "10000"))
+# Khóa ký token xem đơn hàng; không đặt thì mỗi tiến trình tự sinh một khóa ngẫu nhiên,
+# token chỉ dùng được trên tiến trình đã cấp và mất hiệu lực khi khởi động lại
+ORDERS_AUTH_SECRET = os.getenv("ORDERS_AUTH_SECRET")
+if not ORDERS_AUTH_SECRET:
+    print("ORDERS_AUTH_SECRET is not set, using a random per-process key for order access tokens")
+    ORDERS_AUTH_SECRET = secrets.token_hex(32)
+
+
+class OrderPage(NamedTuple):
+    body: bytes
+    etag: str
+    catalog_version: int
+    created_at: float
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """So khớp header If-None-Match (có thể là danh sách, W/ hoặc *) với ETag"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def order_access_token(user_id: str, secret: Optional[str] = None) -> str:
+    """Token cho phép xem đơn hàng của user_id"""
+    key = (secret or ORDERS_AUTH_SECRET).encode("utf-8")
+    return hmac.new(key, user_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def order_access_allowed(user_id: str, authorization: Optional[str]) -> bool:
+    """Header Authorization có mang token của đúng user_id không"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if not ORDERS_AUTH_SECRET or scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.strip(), order_access_token(user_id))
+
+
+class OrderHistoryCache:
+    def __init__(self, ttl_seconds: float = ORDERS_CACHE_TTL_SECONDS, max_entries: int = ORDERS_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (user_id, limit, offset, status) -> OrderPage, theo thứ tự LRU
+        self._pages: "OrderedDict[tuple, OrderPage]" = OrderedDict()
+        # Tăng khi cache bị xóa, để không lưu trang được dựng từ dữ liệu trước lúc xóa
+        self._generation = 0
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _build(self, user_id: str, limit: int, offset: int, status: Optional[str]) -> OrderPage:
+        version = catalog.current_version()
+        orders = get_user_orders(user_id, limit=limit, offset=offset, status=status)
+        total = count_user_orders(user_id, status=status)
+        body = json.dumps({
+            "user_id": user_id,
+            "orders": orders,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "has_more": offset + len(orders) < total,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        return OrderPage(body, etag, version, time.time())
+
+    def get(self, user_id: str, limit: int = ORDERS_PAGE_SIZE, offset: int = 0, status: Optional[str] = None) -> OrderPage:
+        key = (user_id, limit, offset, status)
+        version = catalog.current_version()
+        with self._lock:
+            page = self._pages.get(key)
+            if page and page.catalog_version == version and time.time() - page.created_at < self.ttl_seconds:
+                self._pages.move_to_end(key)
+                self.counters["hits"] += 1
+                return page
+            self.counters["misses"] += 1
+            generation = self._generation
+
+        page = self._build(user_id, limit, offset, status)
+        with self._lock:
+            if generation != self._generation:
+                return page
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Xóa cache của một người dùng, hoặc tất cả"""
+        with self._lock:
+            keys = [key for key in self._pages if user_id is None or key[0] == user_id]
+            for key in keys:
+                del self._pages[key]
+            self._generation += 1
+            self.counters["invalidations"] += len(keys)
+
+    def on_data_changed(self, collection: str, doc_id=None):
+        if collection == "orders":
+            self.invalidate(None if doc_id is None else str(doc_id))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._pages),
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+order_history = OrderHistoryCache()
+register_change_listener(order_history.on_data_changed)
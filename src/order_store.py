@@ -0,0 +1,251 @@
+"""
+Kho đơn hàng trên SQLite, thay cho việc đọc lại cả data/orders.json và lọc bằng
+list comprehension ở mỗi request.
+
+- Bảng `orders` có index theo (user_id, created_at), status và created_at nên tra
+  cứu đơn của một người dùng không phụ thuộc tổng số đơn.
+- Thông tin sản phẩm dùng để làm giàu đơn hàng (title, image, variation,
+  finalPrice) được tính sẵn vào bảng `product_summaries` mỗi khi catalog đổi phiên
+  bản và ghép bằng JOIN, thay vì tra catalog và sửa trực tiếp dict đơn hàng.
+- Lần mở đầu tiên, đơn hàng trong file JSON cũ được chuyển sang (migrate_from_json).
+"""
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    status TEXT,
+    total_amount NUMERIC,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    product_id TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (order_id, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS product_summaries (
+    product_id TEXT PRIMARY KEY,
+    title TEXT,
+    image TEXT,
+    variation TEXT,
+    final_price NUMERIC
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Các trường của đơn hàng được lưu thành cột riêng; phần còn lại nằm trong cột data
+ORDER_COLUMNS = ("id", "user_id", "status", "total_amount", "created_at")
+ITEM_QUERY_CHUNK = 500
+
+
+def product_summary(product: Dict):
+    """(product_id, title, image, variation, final_price) dùng để làm giàu dòng sản phẩm trong đơn"""
+    image = None
+    images = product.get("images") or []
+    if images and "filePath" in images[0]:
+        image = images[0]["filePath"]
+    variation = final_price = None
+    default_variation = next((var for var in product.get("variations") or [] if var.get("isDefault", False)), None)
+    if default_variation:
+        variation = default_variation.get("sku")
+        final_price = default_variation.get("finalPrice")
+    return str(product["id"]), product.get("title"), image, variation, final_price
+
+
+class OrderStore:
+    def __init__(self, path: str, catalog=None, legacy_json: Optional[str] = None):
+        self.path = path
+        self.catalog = catalog
+        self.legacy_json = legacy_json
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ready = False
+        self._summaries_version = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Mỗi thread một connection (asyncio.to_thread chạy trên nhiều thread)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _ensure_ready(self) -> sqlite3.Connection:
+        connection = self._connect()
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    connection.executescript(SCHEMA)
+                    migrated = connection.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+                    if migrated is None and self.legacy_json and os.path.exists(self.legacy_json):
+                        self.migrate_from_json(self.legacy_json)
+                    self._ready = True
+        self._refresh_summaries(connection)
+        return connection
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """Chuyển đơn hàng từ file JSON cũ vào SQLite (chạy một lần, ghi dấu trong bảng meta)"""
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                orders = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error reading orders from {json_path}: {e}")
+            orders = []
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        with connection:
+            self._write_orders(connection, orders)
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)", (json_path,)
+            )
+        print(f"Migrated {len(orders)} orders from {json_path} to {self.path}")
+        return len(orders)
+
+    def _refresh_summaries(self, connection: sqlite3.Connection):
+        """Cập nhật product_summaries khi catalog đổi phiên bản (chỉ các sản phẩm thay đổi nếu có thể)"""
+        if self.catalog is None:
+            return
+        version = self.catalog.current_version()
+        if version == self._summaries_version:
+            return
+        with self._lock:
+            if version == self._summaries_version:
+                return
+            version, products, changes = self.catalog.delta(self._summaries_version)
+            with connection:
+                if changes is None:
+                    connection.execute("DELETE FROM product_summaries")
+                    rows = [product_summary(product) for product in products]
+                else:
+                    connection.executemany(
+                        "DELETE FROM product_summaries WHERE product_id = ?",
+                        [(str(change.id),) for change in changes]
+                    )
+                    latest = {change.id: change.record for change in changes}
+                    rows = [product_summary(record) for record in latest.values() if record is not None]
+                connection.executemany("INSERT OR REPLACE INTO product_summaries VALUES (?, ?, ?, ?, ?)", rows)
+            self._summaries_version = version
+
+    @staticmethod
+    def _write_orders(connection: sqlite3.Connection, orders: Iterable[Dict]):
+        order_rows, item_rows, order_ids = [], [], []
+        for order in orders:
+            order_id = str(order["id"])
+            extra = {key: value for key, value in order.items() if key not in ORDER_COLUMNS and key != "products"}
+            order_rows.append((
+                order_id, str(order["user_id"]), order.get("status"), order.get("total_amount"),
+                order.get("created_at"), json.dumps(extra, ensure_ascii=False, separators=(",", ":")),
+            ))
+            order_ids.append((order_id,))
+            for position, item in enumerate(order.get("products") or []):
+                product_id = item.get("product_id")
+                item_rows.append((
+                    order_id, position, None if product_id is None else str(product_id),
+                    json.dumps(item, ensure_ascii=False, separators=(",", ":")),
+                ))
+        connection.executemany("DELETE FROM order_items WHERE order_id = ?", order_ids)
+        connection.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?)", order_rows)
+        connection.executemany("INSERT INTO order_items VALUES (?, ?, ?, ?)", item_rows)
+
+    def save_orders(self, orders: List[Dict]) -> int:
+        """Thêm hoặc thay thế nhiều đơn hàng trong một transaction"""
+        connection = self._ensure_ready()
+        with connection:
+            self._write_orders(connection, orders)
+        return len(orders)
+
+    def update_status(self, order_id: str, status: str) -> Optional[str]:
+        """Đổi trạng thái đơn hàng, trả về user_id của đơn (None nếu không tồn tại)"""
+        connection = self._ensure_ready()
+        with connection:
+            row = connection.execute("SELECT user_id FROM orders WHERE id = ?", (str(order_id),)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE orders SET status = ? WHERE id = ?", (status, str(order_id)))
+        return row[0]
+
+    def _hydrate(self, connection: sqlite3.Connection, rows) -> List[Dict]:
+        """Dựng dict đơn hàng mới (kèm sản phẩm đã làm giàu) từ các dòng của bảng orders"""
+        orders, by_id = [], {}
+        for order_id, user_id, status, total_amount, created_at, data in rows:
+            order = {"id": order_id, "user_id": user_id, "products": [], "total_amount": total_amount,
+                     "status": status, "created_at": created_at}
+            order.update(json.loads(data))
+            orders.append(order)
+            by_id[order_id] = order
+        if not orders:
+            return orders
+
+        order_ids = list(by_id)
+        items = []
+        # Giới hạn số tham số mỗi câu lệnh của SQLite
+        for start in range(0, len(order_ids), ITEM_QUERY_CHUNK):
+            chunk = order_ids[start:start + ITEM_QUERY_CHUNK]
+            items += connection.execute(
+                f"""SELECT i.order_id, i.data, s.title, s.image, s.variation, s.final_price
+                    FROM order_items i LEFT JOIN product_summaries s ON s.product_id = i.product_id
+                    WHERE i.order_id IN ({",".join("?" * len(chunk))}) ORDER BY i.order_id, i.position""",
+                chunk,
+            ).fetchall()
+        for order_id, data, title, image, variation, final_price in items:
+            item = json.loads(data)
+            if title is not None:
+                item["title"] = title
+                if image is not None:
+                    item["image"] = image
+                if variation is not None:
+                    item["variation"] = variation
+                    item["finalPrice"] = final_price
+            by_id[order_id]["products"].append(item)
+        return orders
+
+    def user_orders(self, user_id: str, limit: Optional[int] = None, offset: int = 0,
+                    status: Optional[str] = None) -> List[Dict]:
+        """Đơn hàng của một người dùng, mới nhất trước"""
+        connection = self._ensure_ready()
+        query = f"SELECT {', '.join(ORDER_COLUMNS)}, data FROM orders WHERE user_id = ?"
+        params: list = [str(user_id)]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        return self._hydrate(connection, connection.execute(query, params).fetchall())
+
+    def count_user_orders(self, user_id: str, status: Optional[str] = None) -> int:
+        connection = self._ensure_ready()
+        query = "SELECT COUNT(*) FROM orders WHERE user_id = ?"
+        params: list = [str(user_id)]
+        if status is not None:
+            query += " AND status = ?"
+            params.append(status)
+        return connection.execute(query, params).fetchone()[0]
+
+    def all_orders(self) -> List[Dict]:
+        connection = self._ensure_ready()
+        rows = connection.execute(
+            f"SELECT {', '.join(ORDER_COLUMNS)}, data FROM orders ORDER BY created_at DESC"
+        ).fetchall()
+        return self._hydrate(connection, rows)
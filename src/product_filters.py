@@ -0,0 +1,229 @@
+"""
+Ràng buộc có cấu trúc trong câu hỏi về sản phẩm ("bàn làm việc dưới 1000 USD đang
+giảm giá", "sofa còn hàng trên $2k") để lọc ngay khi truy xuất thay vì để LLM lọc
+lại 5 kết quả ngữ nghĩa.
+
+ProductFacets là các giá trị vô hướng tính sẵn từ `variations` của mỗi sản phẩm
+(giá thấp/cao nhất sau giảm giá, mức giảm lớn nhất, tổng tồn kho, danh mục), dùng
+cho cả chỉ mục trong Catalog lẫn metadata `where` của vector database.
+"""
+import os
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .lexical_index import expand_query
+from .text_utils import normalize_text
+
+
+class ProductFacets(NamedTuple):
+    min_price: float
+    max_price: float
+    max_discount: float
+    total_inventory: int
+    category_slug: str
+
+
+def _final_price(item) -> float:
+    if item.get("finalPrice") is not None:
+        return float(item["finalPrice"])
+    return float(item.get("price", 0)) * (1 - float(item.get("percentOff") or 0) / 100)
+
+
+def product_facets(product) -> ProductFacets:
+    variations = product.get("variations") or []
+    prices = [_final_price(variation) for variation in variations] or [_final_price(product)]
+    discounts = [float(item.get("percentOff") or 0) for item in [product] + variations]
+    if variations:
+        inventory = sum(int(variation.get("inventory") or 0) for variation in variations)
+    else:
+        inventory = int(product.get("inventory") or 0)
+    category = product.get("category") or {}
+    return ProductFacets(
+        min_price=min(prices),
+        max_price=max(prices),
+        max_discount=max(discounts),
+        total_inventory=inventory,
+        category_slug=(category.get("slug") or category.get("name") or "").lower(),
+    )
+
+
+class ProductFilters(NamedTuple):
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    categories: Tuple[str, ...] = ()
+    on_sale: bool = False
+    in_stock: bool = False
+
+    def is_empty(self) -> bool:
+        return self == ProductFilters()
+
+    def matches(self, facets: ProductFacets) -> bool:
+        """Sản phẩm khớp khi khoảng giá các biến thể giao với khoảng giá yêu cầu"""
+        if self.max_price is not None and facets.min_price > self.max_price:
+            return False
+        if self.min_price is not None and facets.max_price < self.min_price:
+            return False
+        if self.categories and facets.category_slug not in self.categories:
+            return False
+        if self.on_sale and facets.max_discount <= 0:
+            return False
+        if self.in_stock and facets.total_inventory <= 0:
+            return False
+        return True
+
+    def to_where(self) -> Optional[Dict]:
+        """Bộ lọc `where` theo cú pháp metadata của Chroma (None nếu không có ràng buộc)"""
+        clauses = []
+        if self.max_price is not None:
+            clauses.append({"min_price": {"$lte": self.max_price}})
+        if self.min_price is not None:
+            clauses.append({"max_price": {"$gte": self.min_price}})
+        if self.categories:
+            clauses.append({"category_slug": {"$in": list(self.categories)}})
+        if self.on_sale:
+            clauses.append({"max_discount": {"$gt": 0}})
+        if self.in_stock:
+            clauses.append({"total_inventory": {"$gt": 0}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+# Giá trong catalog là USD; giá VND trong câu hỏi ("5 triệu", "500k", "3.000.000đ") được quy đổi
+VND_PER_USD = float(os.getenv("VND_PER_USD", "25000"))
+# "giá 1,500 USD", "khoảng 2 triệu": khoảng giá ±PRICE_AROUND_TOLERANCE quanh số tiền
+PRICE_AROUND_TOLERANCE = float(os.getenv("PRICE_AROUND_TOLERANCE", "0.2"))
+# "Nk" không kèm đơn vị tiền: từ mức này trở lên hiểu là VND ("500k"), dưới thì là USD ("2k")
+_VND_MIN_AMOUNT = 100_000
+
+# Một số tiền: "$1000", "1.000 usd", "2k", "1.5 triệu", "3.000.000đ"... Số theo sau bởi đơn vị
+# khác ("6 người", "120kg", "1m6") không khớp
+_UNITS = r"nguoi|kg|g|cm|mm|m|m2|inch|lit|cho|canh|tang|phong|mon|cai|chiec|ghe"
+_NUMBER = (
+    r"(\$)?\s*(\d+(?:[.,]\d+)*)\s*(k|nghin|ngan|tr|trieu)?\s*(usd|\$|do|dollars?|vnd|dong|d)?"
+    rf"(?![a-z0-9])(?!\s*(?:{_UNITS})\b)"
+)
+_RANGE_RE = re.compile(rf"\b(?:tu|between|from|khoang)\s*{_NUMBER}\s*(?:den|toi|-|to|and)\s*{_NUMBER}")
+_MAX_RE = re.compile(
+    rf"(?:\bduoi|\bunder|\bbelow|\bless than|\bcheaper than|\btoi da|\bkhong qua|\bup to|\bmax|\bre hon|<=?)\s*{_NUMBER}"
+)
+_AROUND_RE = re.compile(rf"(?:\b(gia|priced at)|\bkhoang|\btam|\baround|\babout|\bapproximately|~)\s*{_NUMBER}")
+# "từ X" chỉ được hiểu là giá khi đi cùng "đến Y" (_RANGE_RE), tránh nhầm với "tủ 2 cánh"
+_MIN_RE = re.compile(rf"(?:\btren|\bover|\babove|\bmore than|\bat least|\btoi thieu|>=?)\s*{_NUMBER}")
+# Từ cho biết câu hỏi nói về giá: khi có, số không kèm đơn vị tiền được hiểu là USD
+_PRICE_WORD_RE = re.compile(r"\b(gia|price[sd]?|cost|budget|ngan sach|tien)\b")
+_SALE_RE = re.compile(r"\b(giam gia|khuyen mai|uu dai|dang sale|on sale|sale|discount(ed|s)?|deals?)\b")
+_STOCK_RE = re.compile(r"\b(con hang|san hang|co san|in stock|available)\b")
+
+
+def _parse_number(raw: str) -> float:
+    """
+    "1,500", "1.500", "3.000.000", "1,250,000": dấu phân cách hàng nghìn.
+    "1.5", "1,5", "1,500.50", "1.500,50": dấu cuối cùng là dấu thập phân.
+    """
+    separators = re.findall(r"[.,]", raw)
+    if not separators:
+        return float(raw)
+    last = max(raw.rfind("."), raw.rfind(","))
+    decimals = raw[last + 1:]
+    if len(set(separators)) == 1 and (len(separators) > 1 or len(decimals) == 3):
+        return float(re.sub(r"[.,]", "", raw))
+    return float(re.sub(r"[.,]", "", raw[:last]) + "." + decimals)
+
+
+def _parse_amount(groups, price_hint: bool) -> Optional[float]:
+    """
+    Số tiền (USD) từ các nhóm của _NUMBER; None nếu không có đơn vị tiền và câu hỏi
+    không nhắc tới giá (số đó có thể là số người, kích thước...).
+    """
+    dollar, raw, multiplier, currency = groups
+    value = _parse_number(raw)
+    if multiplier:
+        value *= 1_000_000 if multiplier in ("tr", "trieu") else 1000
+
+    if dollar or currency in ("usd", "$", "do", "dollar", "dollars"):
+        return value
+    if currency in ("vnd", "dong", "d") or multiplier in ("tr", "trieu"):
+        return value / VND_PER_USD
+    if multiplier:
+        return value / VND_PER_USD if value >= _VND_MIN_AMOUNT else value
+    return value if price_hint else None
+
+
+def _range_groups(match) -> Tuple[tuple, tuple]:
+    low, high = match.groups()[:4], match.groups()[4:]
+    # "từ 2 đến 3 triệu": đơn vị ở cuối áp dụng cho cả hai số
+    if not any((low[0], low[2], low[3])):
+        low = (high[0], low[1], high[2], high[3])
+    return low, high
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if word.endswith("s") and len(word) > 3 else word
+
+
+def _match_categories(text: str, categories: Dict[str, str]) -> Tuple[str, ...]:
+    """
+    Danh mục nhắc tới trong câu hỏi (đã mở rộng đồng nghĩa), theo từ chính (từ cuối
+    của tên danh mục). Khi câu hỏi có đủ các từ của một tên nhiều từ ("bàn ăn" ->
+    Dining Tables) thì chỉ giữ tên dài nhất đó; từ chung có thể chỉ nhiều danh mục
+    ("bàn" -> table desk) khớp mọi danh mục có từ chính đó: Desks, Tables, Dining Tables.
+    """
+    words = {_singular(word) for word in re.findall(r"[a-z0-9]+", text)}
+    by_head: Dict[str, list] = {}
+    for name, slug in categories.items():
+        name_words = [_singular(word) for word in re.findall(r"[a-z0-9]+", normalize_text(name))]
+        if name_words and name_words[-1] in words:
+            by_head.setdefault(name_words[-1], []).append((name_words, slug))
+
+    matched = []
+    for entries in by_head.values():
+        specific = [(len(name_words), slug) for name_words, slug in entries if len(name_words) > 1 and set(name_words) <= words]
+        if specific:
+            longest = max(size for size, _ in specific)
+            slugs = [slug for size, slug in specific if size == longest]
+        else:
+            slugs = [slug for _, slug in entries]
+        matched.extend(slug for slug in slugs if slug not in matched)
+    return tuple(matched)
+
+
+def extract_product_filters(query: str, categories: Optional[Dict[str, str]] = None) -> ProductFilters:
+    """
+    Trích ràng buộc giá (quy về USD; chỉ khi có đơn vị tiền hoặc từ "giá"), danh mục,
+    giảm giá và tồn kho từ câu hỏi.
+    `categories` là {tên danh mục: slug} của catalog hiện tại.
+    """
+    text = normalize_text(query)
+    price_hint = bool(_PRICE_WORD_RE.search(text))
+    min_price = max_price = None
+
+    match = _RANGE_RE.search(text)
+    low = high = None
+    if match:
+        low_groups, high_groups = _range_groups(match)
+        low, high = _parse_amount(low_groups, price_hint), _parse_amount(high_groups, price_hint)
+    if low is not None and high is not None:
+        min_price, max_price = min(low, high), max(low, high)
+    else:
+        match = _MAX_RE.search(text)
+        if match:
+            max_price = _parse_amount(match.groups(), price_hint)
+        match = _MIN_RE.search(text)
+        if match:
+            min_price = _parse_amount(match.groups(), price_hint)
+        match = _AROUND_RE.search(text)
+        if min_price is None and max_price is None and match:
+            # Số ngay sau "giá" là giá dù không kèm đơn vị; sau "khoảng" thì cần đơn vị tiền ("khoảng 3 ngày")
+            amount = _parse_amount(match.groups()[1:], price_hint or bool(match.group(1)))
+            if amount is not None:
+                min_price = amount * (1 - PRICE_AROUND_TOLERANCE)
+                max_price = amount * (1 + PRICE_AROUND_TOLERANCE)
+
+    return ProductFilters(
+        min_price=min_price,
+        max_price=max_price,
+        categories=_match_categories(normalize_text(expand_query(query)), categories or {}),
+        on_sale=bool(_SALE_RE.search(text)),
+        in_stock=bool(_STOCK_RE.search(text)),
+    )
@@ -0,0 +1,212 @@
+"""
+Dựng prompt trả lời trong giới hạn token.
+
+- Đoạn mô tả của từng sản phẩm được tính sẵn một lần cho mỗi phiên bản catalog
+  (ProductSnippetCache) thay vì ghép chuỗi lại ở mỗi lượt.
+- Các phần ngữ cảnh được thêm theo thứ tự ưu tiên: dữ liệu của ý định hiện tại,
+  lịch sử trò chuyện, sản phẩm đã nhắc trước đó, rồi các phần còn lại; phần nào
+  vượt PROMPT_TOKEN_BUDGET thì bị cắt bớt từ cuối.
+- System prompt tĩnh được gửi qua `system_instruction` của Gemini nên không nằm
+  trong prompt của từng lượt.
+"""
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .database import catalog
+from .models import HISTORY_TOKEN_BUDGET, UserSession
+from .text_utils import estimate_tokens
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+
+SECTION_HEADERS = {
+    "products": "Sản phẩm:",
+    "recommended_products": "Sản phẩm được đề xuất:",
+    "policies": "Chính sách:",
+    "faqs": "Câu hỏi thường gặp:",
+    "orders": "Đơn hàng:",
+    "recent_products": "Sản phẩm đã nhắc đến trước đó:",
+}
+
+# Phần ngữ cảnh chính của từng ý định, được giữ trước tiên khi cắt theo ngân sách
+INTENT_PRIMARY_SECTIONS = {
+    "product_inquiry": ["products"],
+    "product_recommendation": ["recommended_products", "products"],
+    "policy_inquiry": ["policies"],
+    "general_question": ["faqs"],
+    "order_management": ["orders"],
+}
+
+
+def format_product_snippet(product: Dict) -> str:
+    lines = [f"- Tên: {product['title']}", f"  Mô tả: {product.get('description', 'Không có mô tả')}"]
+    price = f"  Giá: {product['price']} USD"
+    if product.get("percentOff", 0) > 0:
+        price += f" (Giảm giá: {product['percentOff']}%)"
+    lines.append(price)
+
+    if "category" in product and "name" in product["category"]:
+        lines.append(f"  Danh mục: {product['category']['name']}")
+
+    if product.get("variations"):
+        lines.append("  Biến thể:")
+        for variation in product["variations"][:3]:
+            line = f"    * {variation.get('sku', 'Không xác định')}: {variation.get('price', 0)} USD"
+            if variation.get("percentOff", 0) > 0:
+                line += f" (Giảm giá: {variation['percentOff']}%)"
+            lines.append(line)
+
+    return "\n".join(lines)
+
+
+def format_order_snippet(order: Dict) -> str:
+    lines = [
+        f"- Mã đơn hàng: {order['id']}",
+        f"  Trạng thái: {order['status']}",
+        f"  Tổng tiền: {order['total_amount']} USD",
+        "  Sản phẩm:",
+    ]
+    for product in order["products"]:
+        line = f"    + {product.get('title', 'Sản phẩm')} - Số lượng: {product['quantity']}"
+        if "variation" in product:
+            line += f" - Biến thể: {product['variation']}"
+        if "finalPrice" in product:
+            line += f" - Giá: {product['finalPrice']} USD"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class Snippet(NamedTuple):
+    text: str
+    tokens: int
+
+
+class ProductSnippetCache:
+    """Snippet và số token của mọi sản phẩm trong catalog, cập nhật khi catalog đổi phiên bản"""
+
+    def __init__(self, source=catalog):
+        self.catalog = source
+        self._lock = threading.Lock()
+        self._state = (None, {})
+
+    @staticmethod
+    def _snippet(product: Dict) -> Snippet:
+        text = format_product_snippet(product)
+        return Snippet(text, estimate_tokens(text))
+
+    def warm(self) -> Dict[Any, Snippet]:
+        version = self.catalog.current_version()
+        if version == self._state[0]:
+            return self._state[1]
+        with self._lock:
+            built_version, snippets = self._state
+            if version != built_version:
+                # Chỉ định dạng lại các sản phẩm thay đổi kể từ lần trước
+                version, products, changes = self.catalog.delta(built_version)
+                if changes is None:
+                    snippets = {product["id"]: self._snippet(product) for product in products}
+                else:
+                    for change in changes:
+                        snippets.pop(change.id, None)
+                        if change.record is not None:
+                            snippets[change.id] = self._snippet(change.record)
+                self._state = (version, snippets)
+        return self._state[1]
+
+    def get(self, product: Dict) -> Snippet:
+        snippet = self.warm().get(product.get("id"))
+        # Sản phẩm không lấy từ catalog hiện tại (dữ liệu cũ, bản ghi tạm...): định dạng trực tiếp
+        if snippet is None or self.catalog.get(product.get("id")) is not product:
+            snippet = self._snippet(product)
+        return snippet
+
+
+product_snippets = ProductSnippetCache()
+
+
+class BuiltPrompt(NamedTuple):
+    text: str
+    tokens: int
+    # Số mục bị bỏ do vượt ngân sách, theo từng phần
+    trimmed: Dict[str, int]
+
+
+class PromptBuilder:
+    def __init__(self, system_prompt: str, token_budget: int = PROMPT_TOKEN_BUDGET,
+                 include_system_prompt: bool = False, snippets: ProductSnippetCache = product_snippets):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        # True khi model không hỗ trợ system_instruction: system prompt nằm trong từng prompt
+        self.include_system_prompt = include_system_prompt
+        self.snippets = snippets
+
+    def section_items(self, key: str, context: Dict[str, Any]) -> List[Snippet]:
+        items = context.get(key) or []
+        if key in ("products", "recommended_products"):
+            return [self.snippets.get(product) for product in items]
+        if key == "recent_products":
+            current_ids = {
+                product.get("id")
+                for product in context.get("products", []) + context.get("recommended_products", [])
+            }
+            texts = [f"- {p['title']}: {p['price']} USD" for p in items if p["id"] not in current_ids]
+        elif key == "policies":
+            texts = [f"- {policy['title']}: {policy['content']}" for policy in items]
+        elif key == "faqs":
+            texts = [f"- Câu hỏi: {faq['question']}\n  Trả lời: {faq['answer']}" for faq in items]
+        elif key == "orders":
+            texts = [format_order_snippet(order) for order in items]
+        else:
+            texts = []
+        return [Snippet(text, estimate_tokens(text)) for text in texts]
+
+    def build(self, message: str, session: UserSession, context: Dict[str, Any], intent: Optional[str] = None) -> BuiltPrompt:
+        remaining = self.token_budget - estimate_tokens(message)
+        if self.include_system_prompt:
+            remaining -= estimate_tokens(self.system_prompt)
+
+        primary = INTENT_PRIMARY_SECTIONS.get(intent, [])
+        secondary = [key for key in SECTION_HEADERS if key not in primary and key != "recent_products"]
+        sections: Dict[str, List[str]] = {}
+        trimmed: Dict[str, int] = {}
+
+        def add_section(key):
+            nonlocal remaining
+            items = self.section_items(key, context)
+            kept = []
+            for item in items:
+                # Luôn giữ ít nhất một mục của phần chính, kể cả khi vượt ngân sách
+                if item.tokens > remaining and not (key in primary and not kept):
+                    break
+                kept.append(item.text)
+                remaining -= item.tokens
+            if kept:
+                sections[key] = kept
+            if len(kept) < len(items):
+                trimmed[key] = len(items) - len(kept)
+
+        for key in primary:
+            add_section(key)
+        # Lịch sử dùng phần ngân sách còn lại nhưng không vượt HISTORY_TOKEN_BUDGET
+        chat_history = session.get_chat_history(max_tokens=max(min(remaining, HISTORY_TOKEN_BUDGET), 0))
+        remaining -= estimate_tokens(chat_history)
+        add_section("recent_products")
+        for key in secondary:
+            add_section(key)
+
+        formatted_context = "Thông tin từ cơ sở dữ liệu:\n"
+        for key in SECTION_HEADERS:
+            if key in sections:
+                formatted_context += f"\n{SECTION_HEADERS[key]}\n" + "\n".join(sections[key]) + "\n"
+
+        parts = []
+        if self.include_system_prompt:
+            parts.append(self.system_prompt.strip())
+        parts += [
+            formatted_context,
+            f"Lịch sử trò chuyện:\n{chat_history}",
+            f"Tin nhắn mới nhất của khách hàng: {message}",
+            "Trả lời:",
+        ]
+        text = "\n\n".join(parts)
+        return BuiltPrompt(text, estimate_tokens(text), trimmed)
@@ -0,0 +1,143 @@
+"""
+Cache câu trả lời theo ngữ nghĩa cho các câu hỏi lặp lại giữa nhiều khách hàng
+("thời gian giao hàng là bao lâu?", bảo hành, lắp đặt...).
+
+Một mục cache khớp khi cùng intent, cùng hash ngữ cảnh (dữ liệu truy xuất được và
+RESPONSE_CACHE_HISTORY_MESSAGES tin nhắn gần nhất của hội thoại, xem
+Chatbot.response_cache_key) và embedding của tin nhắn có cosine similarity >= threshold. Khi không có model
+embedding, cache chỉ khớp chính xác trên văn bản đã chuẩn hóa.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .text_utils import normalize_text
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+# Số tin nhắn gần nhất (trước tin nhắn hiện tại) đưa vào khóa cache: câu hỏi lặp lại ở
+# lượt sau vẫn dùng lại được câu trả lời nếu lượt ngay trước giống nhau
+RESPONSE_CACHE_HISTORY_MESSAGES = int(os.getenv("RESPONSE_CACHE_HISTORY_MESSAGES", "2"))
+# Chỉ cache các intent không phụ thuộc vào người dùng hay lịch sử trò chuyện
+RESPONSE_CACHE_INTENTS = [
+    intent.strip()
+    for intent in os.getenv("RESPONSE_CACHE_INTENTS", "policy_inquiry,general_question").split(",")
+    if intent.strip()
+]
+
+
+class CacheEntry:
+    __slots__ = ("text", "vector", "source", "response", "expires_at")
+
+    def __init__(self, text, vector, source, response, expires_at):
+        self.text = text
+        self.vector = vector
+        self.source = source
+        self.response = response
+        self.expires_at = expires_at
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        embed: Optional[Callable[[str], Optional[List[float]]]] = None,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # (intent, context_hash) -> danh sách mục; _lru giữ thứ tự dùng gần nhất để loại bỏ
+        self._buckets: Dict[tuple, List[CacheEntry]] = {}
+        self._lru: "OrderedDict[int, tuple]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def _vectorize(self, message: str):
+        if self.embed is None:
+            return None
+        vector = self.embed(message)
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, bucket_key: tuple, entry: CacheEntry):
+        bucket = self._buckets.get(bucket_key, [])
+        if entry in bucket:
+            bucket.remove(entry)
+        if not bucket:
+            self._buckets.pop(bucket_key, None)
+        self._lru.pop(id(entry), None)
+
+    def lookup(self, message: str, intent: str, context_hash: str) -> Optional[str]:
+        vector = self._vectorize(message)
+        text = normalize_text(message)
+        bucket_key = (intent, context_hash)
+        now = time.monotonic()
+
+        with self._lock:
+            best, best_score = None, -1.0
+            for entry in list(self._buckets.get(bucket_key, [])):
+                if entry.expires_at < now:
+                    self._remove(bucket_key, entry)
+                    continue
+                if entry.text == text:
+                    best, best_score = entry, 1.0
+                    break
+                if vector is not None and entry.vector is not None:
+                    score = float(entry.vector @ vector)
+                    if score > best_score:
+                        best, best_score = entry, score
+
+            if best is not None and best_score >= self.threshold:
+                self._lru.move_to_end(id(best))
+                self.counters["hits"] += 1
+                return best.response
+
+            self.counters["misses"] += 1
+            return None
+
+    def store(self, message: str, intent: str, context_hash: str, source: Optional[str], response: str):
+        entry = CacheEntry(
+            normalize_text(message),
+            self._vectorize(message),
+            source,
+            response,
+            time.monotonic() + self.ttl_seconds,
+        )
+        bucket_key = (intent, context_hash)
+
+        with self._lock:
+            self._buckets.setdefault(bucket_key, []).append(entry)
+            self._lru[id(entry)] = (bucket_key, entry)
+            self.counters["stores"] += 1
+            while len(self._lru) > self.max_entries:
+                _, (old_key, old_entry) = self._lru.popitem(last=False)
+                self._remove(old_key, old_entry)
+                self.counters["evictions"] += 1
+
+    def invalidate(self, source: Optional[str] = None):
+        """Xóa các mục phụ thuộc vào nguồn dữ liệu `source` (products, policies, faqs), hoặc tất cả"""
+        with self._lock:
+            for bucket_key, entry in list(self._lru.values()):
+                if source is None or entry.source in (source, None):
+                    self._remove(bucket_key, entry)
+                    self.counters["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self._lru),
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,200 @@
+"""
+Lưu trữ phiên chat.
+
+- InMemorySessionStore: OrderedDict theo thứ tự truy cập, loại bỏ LRU/TTL trong O(1)
+  mỗi phiên, dọn dẹp định kỳ bằng task nền thay vì quét trên đường request.
+- RedisSessionStore: lưu phiên dưới dạng JSON với TTL của Redis, dùng chung giữa
+  nhiều worker/replica.
+"""
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+
+from .models import UserSession
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60)))  # 24 giờ
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "100000"))
+SESSION_CLEANUP_INTERVAL = int(os.getenv("SESSION_CLEANUP_INTERVAL", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class SessionStore:
+    """Giao diện chung cho các backend lưu phiên"""
+
+    async def get(self, user_id: str) -> Optional[UserSession]:
+        raise NotImplementedError
+
+    async def save(self, session: UserSession):
+        raise NotImplementedError
+
+    async def delete(self, user_id: str):
+        raise NotImplementedError
+
+    async def save_summary(self, session: UserSession) -> bool:
+        """
+        Ghi bản tóm tắt vừa áp dụng vào `session` (summary và các tin nhắn đã gộp) vào
+        phiên đang lưu, không ghi đè các lượt chat đã lưu sau khi session được đọc ra.
+        """
+        await self.save(session)
+        return True
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def get_or_create(self, user_id: str) -> UserSession:
+        session = await self.get(user_id)
+        if session is None:
+            session = UserSession(user_id=user_id)
+            await self.save(session)
+        return session
+
+    def start(self):
+        """Khởi động các tác vụ nền (nếu có)"""
+
+    async def close(self):
+        """Dừng tác vụ nền và giải phóng kết nối"""
+
+
+class InMemorySessionStore(SessionStore):
+    def __init__(
+        self,
+        ttl_seconds: int = SESSION_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        cleanup_interval: int = SESSION_CLEANUP_INTERVAL,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.cleanup_interval = cleanup_interval
+        # user_id -> (thời điểm truy cập cuối, session); phần tử đầu là phiên cũ nhất
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    def _touch(self, user_id: str, session: UserSession):
+        self._sessions[user_id] = (time.monotonic(), session)
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def get(self, user_id: str) -> Optional[UserSession]:
+        entry = self._sessions.get(user_id)
+        if entry is None:
+            return None
+
+        last_access, session = entry
+        if time.monotonic() - last_access > self.ttl_seconds:
+            del self._sessions[user_id]
+            return None
+
+        self._touch(user_id, session)
+        return session
+
+    async def save(self, session: UserSession):
+        self._touch(session.user_id, session)
+
+    async def delete(self, user_id: str):
+        self._sessions.pop(user_id, None)
+
+    async def count(self) -> int:
+        return len(self._sessions)
+
+    def evict_expired(self) -> int:
+        """Xóa các phiên hết hạn; chỉ duyệt từ đầu danh sách tới phiên còn hạn đầu tiên"""
+        deadline = time.monotonic() - self.ttl_seconds
+        evicted = 0
+        while self._sessions:
+            user_id, (last_access, _) = next(iter(self._sessions.items()))
+            if last_access > deadline:
+                break
+            del self._sessions[user_id]
+            evicted += 1
+        return evicted
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            evicted = self.evict_expired()
+            if evicted:
+                print(f"Cleaned up {evicted} expired sessions")
+
+    def start(self):
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def close(self):
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+
+
+class RedisSessionStore(SessionStore):
+    """Backend Redis (hoặc client tương thích như fakeredis.aioredis.FakeRedis)"""
+
+    def __init__(self, client, ttl_seconds: int = SESSION_TTL_SECONDS, prefix: str = "interlux:session:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.prefix}{user_id}"
+
+    async def get(self, user_id: str) -> Optional[UserSession]:
+        raw = await self.client.get(self._key(user_id))
+        if raw is None:
+            return None
+        # Gia hạn TTL khi phiên được dùng lại
+        await self.client.expire(self._key(user_id), self.ttl_seconds)
+        return UserSession.from_dict(json.loads(raw))
+
+    async def save(self, session: UserSession):
+        await self.client.set(self._key(session.user_id), json.dumps(session.to_dict(), ensure_ascii=False), ex=self.ttl_seconds)
+
+    async def delete(self, user_id: str):
+        await self.client.delete(self._key(user_id))
+
+    async def save_summary(self, session: UserSession) -> bool:
+        """Đọc - sửa - ghi phiên trong Redis bằng WATCH/MULTI, thử lại nếu phiên bị ghi đồng thời"""
+        from redis.exceptions import WatchError
+
+        key = self._key(session.user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    raw = await pipe.get(key)
+                    if raw is None:
+                        return False
+                    current = UserSession.from_dict(json.loads(raw))
+                    # Bỏ các tin nhắn tới vị trí bản tóm tắt đã gộp; phiên đã được tóm tắt xa hơn thì giữ nguyên
+                    if not current.apply_summary(session.summary, session.first_message_index()):
+                        await pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.set(key, json.dumps(current.to_dict(), ensure_ascii=False), ex=self.ttl_seconds)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    async def count(self) -> int:
+        count = 0
+        async for _ in self.client.scan_iter(match=f"{self.prefix}*", count=1000):
+            count += 1
+        return count
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    """Tạo session store theo cấu hình SESSION_STORE ("memory" hoặc "redis")"""
+    if backend == "redis":
+        import redis.asyncio as redis
+
+        print(f"Using Redis session store at {REDIS_URL}")
+        return RedisSessionStore(redis.from_url(REDIS_URL))
+
+    return InMemorySessionStore()
@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fold_diacritics(text: str) -> str:
+    """Bỏ dấu tiếng Việt: 'Bàn làm việc' -> 'Ban lam viec'"""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+
+
+def normalize_text(text: str) -> str:
+    """Chữ thường, bỏ dấu và gộp khoảng trắng để so khớp từ khóa"""
+    return _WHITESPACE_RE.sub(" ", fold_diacritics(text).lower()).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token (~3 ký tự/token với tiếng Việt có dấu), không gọi API"""
+    return max(1, len(text) // 3)
@@ -0,0 +1,335 @@
+"""
+Vector index chạy trong tiến trình, thay thế ChromaDB cho các corpus nhỏ
+(sản phẩm, chính sách, FAQ).
+
+Embedding đã chuẩn hóa được lưu trong một file .npy và mở bằng memory map;
+truy vấn là một phép nhân ma trận cho cả batch query rồi lấy top-k bằng
+argpartition. NumpyCollection cài đặt tập con API của Chroma Collection mà
+database.py dùng (add, upsert, update, delete, count, get, query) nên các hàm
+search_* không cần biết backend nào đang chạy.
+
+Nhiều tiến trình (các worker API, tiến trình nạp dữ liệu) có thể dùng chung một
+thư mục: mỗi lần ghi giữ file lock, đọc lại bản trên đĩa rồi mới gộp thay đổi; mỗi
+lần đọc kiểm tra file đã bị tiến trình khác thay chưa (stat) và nạp lại nếu cần.
+Nạp nhiều lô nên đặt trong `with collection.batch():` để chỉ ghi file một lần.
+"""
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: không có flock, chỉ khóa trong tiến trình
+    fcntl = None
+
+
+_OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches_where(metadata: Optional[Dict], where: Dict) -> bool:
+    """Đánh giá bộ lọc `where` theo cú pháp của Chroma ($and, $or, $eq, $gte, $in...)"""
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_OPERATORS[op](value, target) for op, target in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class NumpyCollection:
+    def __init__(self, name: str, directory: str, embedding_function: Optional[Callable] = None):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self.embedding_function = embedding_function
+        self._lock = threading.RLock()
+        # (ma trận embedding, ids, documents, metadatas, id -> vị trí); thay cả bộ trong một
+        # phép gán khi ghi để truy vấn không cần khóa và không thấy trạng thái lẫn lộn
+        self._state = (None, [], [], [], {})
+        # Mảng ghi được chứa ma trận hiện tại ở các hàng đầu và chỗ trống phía sau để thêm hàng
+        self._buffer: Optional[np.ndarray] = None
+        # (inode, mtime, size) của records.json đã nạp; khác với trên đĩa nghĩa là có tiến trình khác vừa ghi
+        self._version = None
+        self._write_depth = 0
+        self._dirty = False
+        os.makedirs(self.path, exist_ok=True)
+        with self._file_lock(shared=True):
+            self._load()
+
+    @property
+    def _matrix_file(self):
+        return os.path.join(self.path, "embeddings.npy")
+
+    @property
+    def _records_file(self):
+        return os.path.join(self.path, "records.json")
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _disk_version(self):
+        try:
+            stat = os.stat(self._records_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """Nạp ma trận và records từ đĩa (gọi trong file lock)"""
+        self._version = self._disk_version()
+        self._buffer = None
+        if self._version is None or not os.path.exists(self._matrix_file):
+            self._set_state(None, [], [], [])
+            return
+        with open(self._records_file, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        matrix = np.load(self._matrix_file, mmap_mode="r")
+        self._set_state(matrix, records["ids"], records["documents"], records["metadatas"])
+
+    def _refresh(self):
+        """Nạp lại nếu tiến trình khác đã ghi collection kể từ lần nạp trước"""
+        if self._disk_version() == self._version:
+            return
+        with self._file_lock(shared=True):
+            if self._disk_version() != self._version:
+                self._load()
+
+    @contextmanager
+    def _writing(self):
+        """
+        Khóa ghi (trong tiến trình và giữa các tiến trình) trên bản mới nhất của collection.
+        Lồng nhau được: chỉ lớp ngoài cùng lấy file lock và ghi file khi thoát.
+        """
+        with self._lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                return
+            with self._file_lock():
+                if self._disk_version() != self._version:
+                    self._load()
+                self._write_depth = 1
+                try:
+                    yield
+                finally:
+                    self._write_depth = 0
+                    if self._dirty:
+                        self._persist()
+
+    @contextmanager
+    def batch(self):
+        """
+        Gộp nhiều lần ghi (vd. cả một lần nạp dữ liệu theo lô) thành một lần ghi file ở cuối.
+        Trong lúc đó truy vấn trong tiến trình thấy ngay dữ liệu mới, tiến trình khác thấy khi ghi xong.
+        """
+        with self._writing():
+            yield self
+
+    def _set_state(self, matrix, ids, documents, metadatas, positions=None):
+        if positions is None:
+            positions = {doc_id: position for position, doc_id in enumerate(ids)}
+        self._state = (matrix, ids, documents, metadatas, positions)
+
+    def _commit(self, matrix, ids, documents, metadatas, positions=None):
+        """Đổi sang trạng thái mới trong bộ nhớ; file được ghi khi thoát khỏi _writing"""
+        self._set_state(matrix, ids, documents, metadatas, positions)
+        self._dirty = True
+
+    def _reserve(self, rows: int, dim: int, copy: bool = False) -> np.ndarray:
+        """
+        Mảng ghi được có ma trận hiện tại ở các hàng đầu và đủ chỗ cho `rows` hàng. Hàng mới
+        được ghi vào chỗ trống phía sau, hết chỗ thì cấp gấp đôi, nên nạp N document theo lô
+        là O(N). Sửa hàng đã có thì cần `copy`: truy vấn đang chạy có thể vẫn đọc ma trận cũ.
+        """
+        matrix, ids = self._state[0], self._state[1]
+        available = len(self._buffer) if self._buffer is not None else 0
+        if rows <= available and not copy:
+            return self._buffer
+        capacity = available if rows <= available else max(rows, 2 * available)
+        buffer = np.empty((capacity, dim), dtype=np.float32)
+        if ids:
+            buffer[:len(ids)] = matrix
+        self._buffer = buffer
+        return buffer
+
+    def _persist(self):
+        """Ghi trạng thái hiện tại ra file tạm rồi rename (gọi trong file lock)"""
+        matrix, ids, documents, metadatas, _ = self._state
+        matrix_tmp = f"{self._matrix_file}.tmp.npy"
+        records_tmp = f"{self._records_file}.tmp"
+        np.save(matrix_tmp, matrix)
+        with open(records_tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"ids": ids, "documents": documents, "metadatas": metadatas}, ensure_ascii=False))
+        os.replace(matrix_tmp, self._matrix_file)
+        os.replace(records_tmp, self._records_file)
+        self._version = self._disk_version()
+        self._dirty = False
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self.embedding_function is None:
+            raise ValueError(f"Collection {self.name} has no embedding function")
+        return _normalize(self.embedding_function(texts))
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._state[1])
+
+    def upsert(self, ids, documents=None, embeddings=None, metadatas=None):
+        ids = [str(doc_id) for doc_id in ids]
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        vectors = _normalize(embeddings) if embeddings is not None else self._embed(documents)
+
+        with self._writing():
+            _, old_ids, old_documents, old_metadatas, old_positions = self._state
+            all_ids, all_documents, all_metadatas = list(old_ids), list(old_documents), list(old_metadatas)
+            positions = dict(old_positions)
+
+            appended, replaced = [], []
+            for row, doc_id in enumerate(ids):
+                position = positions.get(doc_id)
+                if position is None:
+                    positions[doc_id] = len(all_ids)
+                    appended.append(row)
+                    all_ids.append(doc_id)
+                    all_documents.append(documents[row])
+                    all_metadatas.append(metadatas[row])
+                else:
+                    replaced.append((position, row))
+                    all_documents[position] = documents[row]
+                    all_metadatas[position] = metadatas[row]
+
+            buffer = self._reserve(
+                len(all_ids), vectors.shape[1], copy=any(position < len(old_ids) for position, _ in replaced)
+            )
+            buffer[len(old_ids):len(all_ids)] = vectors[appended]
+            for position, row in replaced:
+                buffer[position] = vectors[row]
+            self._commit(buffer[:len(all_ids)], all_ids, all_documents, all_metadatas, positions)
+
+    add = upsert
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        """Cập nhật metadata (và embedding nếu có) của các id đã tồn tại"""
+        ids = [str(doc_id) for doc_id in ids]
+        if documents is not None and embeddings is None:
+            embeddings = self._embed(documents)
+        vectors = _normalize(embeddings) if embeddings is not None else None
+
+        with self._writing():
+            matrix, all_ids, all_documents, all_metadatas, positions = self._state
+            found = [(row, positions[doc_id]) for row, doc_id in enumerate(ids) if doc_id in positions]
+            if not found:
+                return
+            if vectors is not None:
+                matrix = self._reserve(len(all_ids), vectors.shape[1], copy=True)[:len(all_ids)]
+            all_documents, all_metadatas = list(all_documents), list(all_metadatas)
+            for row, position in found:
+                if metadatas is not None:
+                    all_metadatas[position] = metadatas[row]
+                if documents is not None:
+                    all_documents[position] = documents[row]
+                if vectors is not None:
+                    matrix[position] = vectors[row]
+            self._commit(matrix, all_ids, all_documents, all_metadatas, positions)
+
+    def delete(self, ids):
+        removed = {str(doc_id) for doc_id in ids}
+        with self._writing():
+            matrix, all_ids, all_documents, all_metadatas, _ = self._state
+            keep = [position for position, doc_id in enumerate(all_ids) if doc_id not in removed]
+            if len(keep) == len(all_ids):
+                return
+            self._buffer = np.array(matrix[keep])
+            self._commit(
+                self._buffer,
+                [all_ids[i] for i in keep],
+                [all_documents[i] for i in keep],
+                [all_metadatas[i] for i in keep],
+            )
+
+    def get(self, ids=None, **kwargs):
+        self._refresh()
+        _, all_ids, all_documents, all_metadatas, id_positions = self._state
+        if ids is None:
+            positions = range(len(all_ids))
+        else:
+            positions = [id_positions[str(doc_id)] for doc_id in ids if str(doc_id) in id_positions]
+        return {
+            "ids": [all_ids[i] for i in positions],
+            "documents": [all_documents[i] for i in positions],
+            "metadatas": [all_metadatas[i] for i in positions],
+        }
+
+    def query(self, query_embeddings=None, query_texts=None, n_results: int = 10, where: Optional[Dict] = None, **kwargs):
+        """
+        Top-k theo cosine similarity cho cả batch query; distances = 1 - cosine.
+        `where` loại các document không khớp metadata trước khi lấy top-k.
+        """
+        self._refresh()
+        matrix, all_ids, all_documents, all_metadatas, _ = self._state
+        queries = _normalize(query_embeddings) if query_embeddings is not None else self._embed(query_texts)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        allowed = None
+        if where and all_ids:
+            allowed = np.array([matches_where(metadata, where) for metadata in all_metadatas])
+        if matrix is None or not all_ids or (allowed is not None and not allowed.any()):
+            for key in result:
+                result[key] = [[] for _ in range(len(queries))]
+            return result
+
+        scores = queries @ matrix.T
+        k = min(n_results, len(all_ids))
+        if allowed is not None:
+            scores[:, ~allowed] = -np.inf
+            k = min(k, int(allowed.sum()))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            result["ids"].append([all_ids[i] for i in ranked])
+            result["documents"].append([all_documents[i] for i in ranked])
+            result["metadatas"].append([all_metadatas[i] for i in ranked])
+            result["distances"].append([float(1.0 - scores[row, i]) for i in ranked])
+        return result
@@ -1,5 +1,10 @@
 // Store user session
 let userId = localStorage.getItem('userId') || null;
+// Phiên cũ không có token xem đơn hàng: bắt đầu phiên mới để server cấp cả hai
+if (userId && !localStorage.getItem('ordersToken')) {
+    localStorage.removeItem('userId');
+    userId = null;
+}
 let chatHistory = [];
 
 // DOM elements
@@ -25,11 +30,13 @@ function sendMessage() {
     addMessageToChat('user', message);
     messageInput.value = '';
 
-    // Show loading indicator
-    const loadingMessage = addMessageToChat('bot', '<div class="loading"></div>');
+    // Show loading indicator, then fill the same bubble as chunks arrive
+    const botMessage = addMessageToChat('bot', '<div class="loading"></div>');
+    const botContent = botMessage.querySelector('.message-content');
+    let botText = '';
 
-    // Send message to server
-    fetch('/chat', {
+    // Send message to server and read the SSE stream
+    fetch('/chat/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/x-www-form-urlencoded',
@@ -39,36 +46,90 @@ function sendMessage() {
             'user_id': userId || ''
         })
     })
-        .then(response => response.json())
-        .then(data => {
-            // Remove loading indicator
-            chatMessages.removeChild(loadingMessage);
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error(`HTTP ${response.status}`);
+            }
 
-            // Add bot response to chat
-            addMessageToChat('bot', data.response);
+            return readEventStream(response.body, (event, data) => {
+                if (event === 'meta') {
+                    storeUserId(data.user_id, data.orders_token);
+                } else if (event === 'data') {
+                    // Product cards / orders are ready before the text is generated
+                    if (data && data.length > 0) {
+                        addProductCards(data);
+                    }
+                } else if (event === 'delta') {
+                    botText += data;
+                    botContent.innerHTML = formatMessageContent(botText);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event === 'error') {
+                    throw new Error(data.message);
+                }
+            });
+        })
+        .then(() => {
+            chatHistory.push({ role: 'user', content: message }, { role: 'bot', content: botText });
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            botContent.innerHTML = formatMessageContent('Sorry, an error occurred. Please try again later.');
+        });
+}
 
-            // Add product cards if data exists
-            if (data.data && data.data.length > 0) {
-                addProductCards(data.data);
+function readEventStream(body, onEvent) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    function dispatch(rawEvent) {
+        let event = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
             }
+        });
+        if (data) {
+            onEvent(event, JSON.parse(data));
+        }
+    }
 
-            // Store user ID if not already stored
-            if (!userId && data.user_id) {
-                userId = data.user_id;
-                localStorage.setItem('userId', userId);
-
-                // Load user orders
-                loadUserOrders(userId);
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            if (done) {
+                if (buffer.trim()) dispatch(buffer);
+                return;
             }
 
-            // Update chat history
-            chatHistory = data.history;
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            chatMessages.removeChild(loadingMessage);
-            addMessageToChat('bot', 'Sorry, an error occurred. Please try again later.');
+            buffer += decoder.decode(value, { stream: true });
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                dispatch(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                boundary = buffer.indexOf('\n\n');
+            }
+            return pump();
         });
+    }
+
+    return pump();
+}
+
+function storeUserId(newUserId, ordersToken) {
+    // Store user ID (and the order access token issued with it) if not already stored
+    if (!userId && newUserId) {
+        userId = newUserId;
+        localStorage.setItem('userId', userId);
+        if (ordersToken) {
+            localStorage.setItem('ordersToken', ordersToken);
+        }
+
+        // Load user orders
+        loadUserOrders(userId);
+    }
 }
 
 function addMessageToChat(role, content) {
@@ -326,7 +387,12 @@ function createProductCard(productInfo) {
 }
 
 function loadUserOrders(userId) {
-    fetch(`/orders/${userId}`)
+    // Token xem đơn hàng do server cấp cùng user_id (event "meta")
+    const ordersToken = localStorage.getItem('ordersToken');
+    if (!ordersToken) {
+        return;
+    }
+    fetch(`/orders/${userId}`, { headers: { 'Authorization': `Bearer ${ordersToken}` } })
         .then(response => {
             if (!response.ok) {
                 throw new Error('No orders found');
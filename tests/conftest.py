@@ -0,0 +1,130 @@
+"""
+Dữ liệu và model giả dùng chung cho test (benchmarks cũng dùng lại).
+
+src.database dùng ./data: test chạy trong một thư mục tạm để không đụng dữ liệu thật.
+"""
+import asyncio
+import atexit
+import os
+import shutil
+import tempfile
+import time
+
+
+def pytest_configure(config):
+    workdir = tempfile.mkdtemp(prefix="interlux-tests-")
+    os.makedirs(os.path.join(workdir, "data"))
+    os.chdir(workdir)
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+
+# --- Dữ liệu giả ---
+
+def make_products(count: int):
+    return [
+        {
+            "id": i,
+            "title": f"Product {i}",
+            "slug": f"product-{i}",
+            "price": 100 + i % 900,
+            "category": {"id": i % 20, "name": f"Category {i % 20}", "slug": f"category-{i % 20}"},
+            "images": [{"filePath": f"https://example.com/{i}.jpg"}],
+            "variations": [{"sku": f"product-{i}-default", "price": 100, "finalPrice": 90, "isDefault": True}],
+        }
+        for i in range(count)
+    ]
+
+
+ORDER_STATUSES = ["Đang xử lý", "Đang giao hàng", "Đã giao hàng", "Đã hủy"]
+
+
+def make_orders(start, count, users, products, rng):
+    orders = []
+    for i in range(start, start + count):
+        items = []
+        for _ in range(rng.randint(1, 3)):
+            product = rng.choice(products)
+            items.append({"product_id": product["id"], "quantity": rng.randint(1, 3), "price": product["price"]})
+        orders.append({
+            "id": f"o{i}",
+            "user_id": f"u{rng.randrange(users)}",
+            "products": items,
+            "total_amount": sum(item["price"] * item["quantity"] for item in items),
+            "status": rng.choice(ORDER_STATUSES),
+            "created_at": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00",
+        })
+    return orders
+
+
+# --- Gemini giả: mô phỏng độ trễ mạng mà không gọi API thật ---
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Trả về từng chunk sau một khoảng trễ, giống AsyncGenerateContentResponse"""
+
+    def __init__(self, chunks, chunk_latency: float):
+        self.chunks = chunks
+        self.chunk_latency = chunk_latency
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.chunk_latency)
+            yield FakeResponse(chunk)
+
+
+class FakeGenerativeModel:
+    """Giả lập google.generativeai.GenerativeModel với độ trễ cố định"""
+
+    def __init__(self, latency: float = 0.2, intent: str = "general_question", answer: str = "Xin chào!", chunks: int = 10):
+        self.latency = latency
+        self.intent = intent
+        self.answer = answer
+        self.chunks = chunks
+        self.calls = 0
+
+    def _reply(self, prompt: str) -> FakeResponse:
+        self.calls += 1
+        if "Phân loại ý định" in prompt:
+            return FakeResponse(self.intent)
+        return FakeResponse(self.answer)
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        if stream:
+            self.calls += 1
+            size = max(1, len(self.answer) // self.chunks)
+            pieces = [self.answer[i:i + size] for i in range(0, len(self.answer), size)]
+            return FakeStreamResponse(pieces, self.latency / len(pieces))
+
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+
+def make_chatbot(model: FakeGenerativeModel, retrieval_latency: float = 0.02, intent_classifier=None):
+    """Tạo Chatbot dùng model giả và truy xuất giả lập (không cần ChromaDB)"""
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+    from src.chatbot import Chatbot
+
+    chatbot = Chatbot()
+    chatbot.model = chatbot.task_model = model
+    chatbot.intent_classifier = intent_classifier
+    # Không dùng cache câu trả lời để mỗi lượt đều gọi model (benchmark cần cache thì tự gắn)
+    chatbot.response_cache = None
+
+    def fake_search_source(source, message):
+        time.sleep(retrieval_latency)
+        if source == "faqs":
+            return [{"question": "Thời gian giao hàng là bao lâu?", "answer": "3-5 ngày."}]
+        return []
+
+    chatbot.search_source = fake_search_source
+    return chatbot
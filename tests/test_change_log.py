@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+import threading
+
+import pytest
+
+from src.change_log import UPSERT, ChangeLog
+from src.json_store import JsonFileStore
+
+RECORDS = 10
+
+
+def record_ids(seed, thread_index, updates):
+    return [(seed * 7 + thread_index * 3 + n) % RECORDS for n in range(updates)]
+
+
+def increment_worker(mode, path, threads, updates, seed, errors):
+    # compact_every nhỏ để các tiến trình khác phải đọc lại snapshot giữa chừng
+    log = ChangeLog(path, compact_every=25)
+    store = JsonFileStore(path)
+    failed = []
+
+    def increment(record_id):
+        if mode == "store":
+            def apply(records):
+                records[record_id]["count"] += 1
+            store.update(apply)
+            return
+
+        def decide(records):
+            record = dict(records[record_id])
+            record["count"] += 1
+            return [(UPSERT, record_id, record)]
+        log.commit(decide)
+
+    def run(thread_index):
+        for record_id in record_ids(seed, thread_index, updates):
+            try:
+                increment(record_id)
+            except Exception:
+                failed.append(1)
+
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    errors.put(len(failed))
+
+
+@pytest.mark.parametrize("mode", ["changelog", "store"])
+def test_concurrent_updates_across_processes_and_threads(tmp_path, mode):
+    path = str(tmp_path / "records.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"id": i, "count": 0} for i in range(RECORDS)], f)
+    processes, threads, updates = 4, 4, 20
+
+    errors = multiprocessing.Queue()
+    pool = [
+        multiprocessing.Process(target=increment_worker, args=(mode, path, threads, updates, seed, errors))
+        for seed in range(processes)
+    ]
+    for process in pool:
+        process.start()
+    failed = sum(errors.get() for _ in pool)
+    for process in pool:
+        process.join()
+
+    expected = dict.fromkeys(range(RECORDS), 0)
+    for seed in range(processes):
+        for thread_index in range(threads):
+            for record_id in record_ids(seed, thread_index, updates):
+                expected[record_id] += 1
+    if mode == "store":
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        records = ChangeLog(path).records()
+    assert failed == 0
+    assert {record["id"]: record["count"] for record in records} == expected
+
+
+def test_partial_trailing_line_is_ignored_and_overwritten(tmp_path):
+    path = str(tmp_path / "records.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"id": 1, "name": "a"}], f)
+    log = ChangeLog(path)
+    log.upsert({"id": 2, "name": "b"})
+    with open(log.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "upsert", "id": 3, "rec')
+
+    assert sorted(record["id"] for record in ChangeLog(path).records()) == [1, 2]
+    log.upsert({"id": 4, "name": "d"})
+    assert sorted(record["id"] for record in ChangeLog(path).records()) == [1, 2, 4]
@@ -0,0 +1,37 @@
+import asyncio
+import gc
+
+from src.models import UserSession
+from tests.conftest import FakeGenerativeModel, make_chatbot
+
+
+def test_speculative_retrieval_is_discarded_when_llm_fails():
+    model = FakeGenerativeModel(latency=0.0)
+
+    async def unavailable(prompt, **kwargs):
+        raise RuntimeError("Gemini unavailable")
+    model.generate_content_async = unavailable
+
+    chatbot = make_chatbot(model, retrieval_latency=0.0)
+    chatbot.speculative_retrieval = True
+
+    def broken_search(source, message):
+        raise ValueError("index unavailable")
+    chatbot.search_source = broken_search
+
+    async def run():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        failed = False
+        try:
+            await chatbot.aprocess_message("abc xyz", UserSession(user_id="test"))
+        except RuntimeError:
+            failed = True
+        await asyncio.sleep(0.05)
+        gc.collect()
+        return failed, errors
+
+    failed, errors = asyncio.run(run())
+    assert failed
+    # Không có "Future exception was never retrieved" cho các truy xuất đoán trước
+    assert errors == []
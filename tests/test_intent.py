@@ -0,0 +1,30 @@
+import json
+import os
+
+import pytest
+
+from src.intent import INTENT_EXAMPLES, KeywordIntentClassifier
+from src.text_utils import normalize_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_eval_set_does_not_overlap_training_examples():
+    with open(os.path.join(ROOT, "data", "intent_eval.json"), "r", encoding="utf-8") as f:
+        eval_texts = {normalize_text(example["text"]) for example in json.load(f)}
+    training = {normalize_text(text) for examples in INTENT_EXAMPLES.values() for text in examples}
+    assert not eval_texts & training
+
+
+@pytest.mark.parametrize("message", ["bạn tên gì", "Tư vấn viên ơi", "Đến khi nào thì mở cửa?", "Nhanh mau lên"])
+def test_folded_homographs_are_not_product_words(message):
+    assert KeywordIntentClassifier().predict(message).intent != "product_inquiry"
+
+
+@pytest.mark.parametrize("message", ["Bàn này có màu trắng không?", "ban nay co mau trang khong", "Tủ này còn mẫu nào?"])
+def test_accented_product_words(message):
+    assert KeywordIntentClassifier().predict(message).intent == "product_inquiry"
+
+
+def test_delivery_time_is_a_policy_question():
+    assert KeywordIntentClassifier().predict("bao lâu thì giao hàng").intent == "policy_inquiry"
@@ -0,0 +1,110 @@
+import os
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.conftest import make_orders
+from src import database, order_history
+from src.order_history import order_access_token
+from src.order_store import OrderStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    workdir = os.getcwd()
+    # main.py mount static/ và templates/ theo đường dẫn tương đối
+    monkeypatch.chdir(ROOT)
+    import main
+    monkeypatch.chdir(workdir)
+
+    monkeypatch.setattr(order_history, "ORDERS_AUTH_SECRET", "secret")
+    monkeypatch.setattr(database, "order_store", OrderStore(str(tmp_path / "orders.db"), database.catalog))
+    database.order_store.save_orders(make_orders(0, 50, 2, [{"id": 1, "price": 100}], random.Random(0)))
+    order_history.order_history.invalidate()
+    return TestClient(main.app)
+
+
+def bearer(user_id):
+    return {"Authorization": f"Bearer {order_access_token(user_id)}"}
+
+
+def test_orders_require_token(client):
+    assert client.get("/orders/u1").status_code == 401
+    assert client.get("/orders/u1", headers={"Authorization": "Bearer guess"}).status_code == 401
+
+
+def test_orders_reject_token_of_another_user(client):
+    assert client.get("/orders/u1", headers=bearer("u0")).status_code == 401
+
+
+def test_orders_returned_for_matching_token(client):
+    response = client.get("/orders/u1", headers=bearer("u1"))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] > 0
+    assert all(order["user_id"] == "u1" for order in body["orders"])
+
+
+@pytest.fixture
+def fake_chat(monkeypatch):
+    import main
+
+    async def aprocess_message(message, session):
+        return {"message": "ok", "data": []}
+
+    async def astream_message(message, session):
+        yield "data", []
+        yield "delta", "ok"
+        yield "done", {"message": "ok"}
+
+    async def asummarize_history(session):
+        return False
+
+    monkeypatch.setattr(main.chatbot, "aprocess_message", aprocess_message)
+    monkeypatch.setattr(main.chatbot, "astream_message", astream_message)
+    monkeypatch.setattr(main.chatbot, "asummarize_history", asummarize_history)
+
+
+def save_orders_for(user_id, count=3):
+    orders = make_orders(1000, count, 1, [{"id": 1, "price": 100}], random.Random(1))
+    for order in orders:
+        order["user_id"] = user_id
+    database.order_store.save_orders(orders)
+    order_history.order_history.invalidate()
+
+
+def test_chat_issues_token_that_opens_order_history(client, fake_chat):
+    chat = client.post("/chat", data={"message": "xin chào"}).json()
+    user_id, token = chat["user_id"], chat["orders_token"]
+    assert token
+    save_orders_for(user_id)
+
+    assert client.get(f"/orders/{user_id}").status_code == 401
+    response = client.get(f"/orders/{user_id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+
+    # Lượt sau gửi user_id sẵn có: không cấp token mới cho user_id do client chọn
+    again = client.post("/chat", data={"message": "còn gì nữa", "user_id": user_id}).json()
+    assert again["orders_token"] is None
+
+
+def test_chat_stream_issues_token_in_meta_event(client, fake_chat):
+    response = client.post("/chat/stream", data={"message": "xin chào"})
+    meta = next(
+        json.loads(block.split("data: ", 1)[1])
+        for block in response.text.split("\n\n") if block.startswith("event: meta")
+    )
+    save_orders_for(meta["user_id"], count=2)
+
+    response = client.get(f"/orders/{meta['user_id']}", headers={"Authorization": f"Bearer {meta['orders_token']}"})
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+
+    claimed = client.post("/chat/stream", data={"message": "hi", "user_id": "u1"})
+    assert '"orders_token": null' in claimed.text
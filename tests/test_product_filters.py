@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pytest
+
+from src import database
+from src.product_filters import extract_product_filters
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = {"Desks": "desks", "Dining Tables": "dining-tables", "TV Units": "tv-units", "Sofas": "sofas"}
+
+
+@pytest.fixture
+def bundled_catalog(tmp_path, monkeypatch):
+    """Catalog mẫu trong data/products.json (bản sao, không sửa file thật)"""
+    path = tmp_path / "products.json"
+    shutil.copy(os.path.join(ROOT, "data", "products.json"), path)
+    monkeypatch.setattr(database.catalog, "path", str(path))
+    return database.catalog
+
+
+def result_ids(query):
+    return {product["id"] for product in database.search_products(query)}
+
+
+@pytest.mark.parametrize("query, categories", [
+    ("có bàn nào không", ("desks", "dining-tables")),
+    ("bàn ăn", ("dining-tables",)),
+    ("bàn làm việc", ("desks",)),
+    ("ban lam viec", ("desks",)),
+    ("bàn ăn hoặc bàn làm việc", ("desks", "dining-tables")),
+    ("kệ tivi", ("tv-units",)),
+])
+def test_ambiguous_terms_match_every_category(query, categories):
+    assert sorted(extract_product_filters(query, CATEGORIES).categories) == sorted(categories)
+
+
+@pytest.mark.parametrize("query, min_price, max_price", [
+    ("bàn dưới 1,500 USD", None, 1500),
+    ("dưới $1,250.50", None, 1250.5),
+    ("dưới 1.5 usd", None, 1.5),
+    ("dưới 3.000.000đ", None, 120),
+    ("bàn giá 1,500 USD", 1200, 1800),
+    ("giao hàng khoảng 3 ngày", None, None),
+])
+def test_price_with_thousands_separators(query, min_price, max_price):
+    filters = extract_product_filters(query, CATEGORIES)
+    assert filters.min_price == pytest.approx(min_price)
+    assert filters.max_price == pytest.approx(max_price)
+
+
+def test_plain_ban_finds_desks_and_dining_tables(bundled_catalog):
+    # Executive Office Desk, Nordic Dining Table Gray, Artisan Dining Table
+    assert result_ids("có bàn nào không") == {9, 7, 6}
+
+
+def test_ban_under_price_keeps_dining_tables(bundled_catalog):
+    assert result_ids("bàn nào dưới 2000 USD?") == {9, 7}
+
+
+def test_ban_around_price(bundled_catalog):
+    assert result_ids("bàn giá 1,500 USD") == {9, 7}
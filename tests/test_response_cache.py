@@ -0,0 +1,54 @@
+import asyncio
+
+from src.models import UserSession
+from src.response_cache import SemanticResponseCache
+from tests.conftest import FakeGenerativeModel, make_chatbot
+
+QUESTION = "Thời gian giao hàng là bao lâu?"
+
+
+def make_cached_chatbot():
+    chatbot = make_chatbot(FakeGenerativeModel(latency=0.0, intent="general_question", answer="3-5 ngày."), 0.0)
+    # Không có model embedding: cache khớp chính xác trên văn bản đã chuẩn hóa
+    chatbot.response_cache = SemanticResponseCache()
+    return chatbot
+
+
+def ask(chatbot, session, message):
+    session.add_message("user", message)
+    response = asyncio.run(chatbot.aprocess_message(message, session))
+    session.add_message("bot", response["message"])
+    return response
+
+
+def session_with(user_id, *turns):
+    session = UserSession(user_id=user_id)
+    for question, answer in turns:
+        session.add_message("user", question)
+        session.add_message("bot", answer)
+    return session
+
+
+def test_first_turn_repeat_hits_cache():
+    chatbot = make_cached_chatbot()
+    assert not ask(chatbot, UserSession(user_id="a"), QUESTION)["cached"]
+    assert ask(chatbot, UserSession(user_id="b"), QUESTION)["cached"]
+
+
+def test_later_turn_repeat_after_same_previous_turn_hits_cache():
+    chatbot = make_cached_chatbot()
+    greeting = ("Xin chào", "Chào bạn, Interlux có thể giúp gì?")
+    first = session_with("a", ("Showroom ở đâu?", "Quận 1."), greeting)
+    second = session_with("b", ("Có trả góp không?", "Có."), greeting)
+    second.summary = "Khách hỏi về trả góp."
+
+    assert not ask(chatbot, first, QUESTION)["cached"]
+    # Lịch sử cũ hơn và bản tóm tắt khác nhau không làm lệch khóa cache
+    assert ask(chatbot, second, QUESTION)["cached"]
+
+
+def test_repeat_after_different_previous_turn_misses_cache():
+    chatbot = make_cached_chatbot()
+    ask(chatbot, UserSession(user_id="a"), QUESTION)
+    follow_up = session_with("b", ("Tôi ở Đà Nẵng", "Interlux giao hàng toàn quốc."))
+    assert not ask(chatbot, follow_up, QUESTION)["cached"]
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from src.models import UserSession
+from src.session_store import InMemorySessionStore, RedisSessionStore
+
+
+def contents(session):
+    return [message["content"] for message in session.get_messages()]
+
+
+class InterruptedPipeline:
+    """Pipeline chạy `hook` ngay sau lần GET đầu tiên, như một request khác ghi vào phiên lúc đó"""
+
+    def __init__(self, pipe, hook):
+        self.pipe = pipe
+        self.hook = hook
+
+    async def __aenter__(self):
+        await self.pipe.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self.pipe.__aexit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+    async def get(self, key):
+        raw = await self.pipe.get(key)
+        if self.hook is not None:
+            hook, self.hook = self.hook, None
+            await hook()
+        return raw
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def redis_store(server, ttl_seconds=60):
+    return RedisSessionStore(FakeRedis(server=server), ttl_seconds=ttl_seconds)
+
+
+def test_redis_get_or_create_and_save(server):
+    async def run():
+        store = redis_store(server)
+        session = await store.get_or_create("u1")
+        assert session.user_id == "u1" and contents(session) == []
+
+        session.add_message("user", "Xin chào")
+        await store.save(session)
+        # Một worker khác (client khác) đọc được phiên đã lưu
+        loaded = await redis_store(server).get("u1")
+        assert contents(loaded) == ["Xin chào"]
+        assert await store.count() == 1
+    asyncio.run(run())
+
+
+def test_redis_session_expires_after_ttl(server):
+    async def run():
+        store = redis_store(server, ttl_seconds=1)
+        await store.get_or_create("u1")
+        assert await store.get("u1") is not None
+        await asyncio.sleep(1.2)
+        assert await store.get("u1") is None
+    asyncio.run(run())
+
+
+def test_redis_save_summary_keeps_concurrent_messages(server):
+    async def run():
+        store = redis_store(server)
+        session = await store.get_or_create("u1")
+        for n in range(6):
+            session.add_message("user" if n % 2 == 0 else "bot", f"m{n}")
+        await store.save(session)
+
+        # Bản tóm tắt gộp m0..m3, trong lúc đó một lượt chat mới được lưu
+        summarized = await store.get("u1")
+        summarized.apply_summary("tóm tắt", summarized.first_message_index() + 4)
+
+        async def concurrent_turn():
+            other = redis_store(server)
+            current = await other.get("u1")
+            current.add_message("user", "NEW")
+            await other.save(current)
+
+        pipeline = store.client.pipeline
+        store.client.pipeline = lambda **kwargs: InterruptedPipeline(pipeline(**kwargs), concurrent_turn)
+        assert await store.save_summary(summarized)
+
+        saved = await redis_store(server).get("u1")
+        assert saved.summary == "tóm tắt"
+        assert contents(saved) == ["m4", "m5", "NEW"]
+    asyncio.run(run())
+
+
+def test_redis_save_summary_skips_missing_session(server):
+    async def run():
+        session = UserSession(user_id="gone")
+        session.add_message("user", "m0")
+        session.apply_summary("tóm tắt", 1)
+        assert not await redis_store(server).save_summary(session)
+    asyncio.run(run())
+
+
+def test_memory_store_evicts_least_recently_used():
+    async def run():
+        store = InMemorySessionStore(max_sessions=2)
+        await store.get_or_create("a")
+        await store.get_or_create("b")
+        await store.get("a")
+        await store.get_or_create("c")
+        assert await store.count() == 2
+        assert await store.get("b") is None
+        assert await store.get("a") is not None and await store.get("c") is not None
+    asyncio.run(run())
+
+
+def test_memory_store_expires_sessions():
+    async def run():
+        store = InMemorySessionStore(ttl_seconds=0.05)
+        await store.get_or_create("a")
+        await asyncio.sleep(0.1)
+        assert store.evict_expired() == 1
+        assert await store.get("a") is None
+    asyncio.run(run())
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from tests.conftest import FakeGenerativeModel, make_chatbot
+from src.models import UserSession
+
+
+def collect_events(chatbot, message):
+    async def run():
+        start = time.perf_counter()
+        events = []
+        async for event, payload in chatbot.astream_message(message, UserSession(user_id="test")):
+            events.append((event, payload, time.perf_counter() - start))
+        return events
+    return asyncio.run(run())
+
+
+def test_first_delta_arrives_before_completion():
+    answer = "Thời gian giao hàng thông thường là 3-5 ngày đối với sản phẩm có sẵn. " * 4
+    chatbot = make_chatbot(FakeGenerativeModel(latency=1.0, answer=answer, chunks=10), retrieval_latency=0.0)
+
+    events = collect_events(chatbot, "Thời gian giao hàng là bao lâu?")
+
+    names = [event for event, _, _ in events]
+    assert names[0] == "data" and names[-1] == "done"
+    deltas = [(payload, elapsed) for event, payload, elapsed in events if event == "delta"]
+    assert len(deltas) > 1
+    assert "".join(text for text, _ in deltas) == answer
+    # Tính từ lúc bắt đầu sinh câu trả lời (sau event "data"): chunk đầu tiên tới sau
+    # khoảng latency / số chunk, không phải sau khi sinh xong cả câu trả lời
+    started = events[0][2]
+    first_delta, total = deltas[0][1] - started, events[-1][2] - started
+    assert first_delta < total / 2
+    assert events[-1][1]["message"] == answer.strip()
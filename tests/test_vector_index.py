@@ -0,0 +1,78 @@
+import numpy as np
+
+from src.vector_index import NumpyCollection
+
+
+def vectors(count, dim=4, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+def upsert_batches(collection, count, batch_size):
+    embeddings = vectors(count)
+    for offset in range(0, count, batch_size):
+        ids = [str(i) for i in range(offset, min(offset + batch_size, count))]
+        collection.upsert(ids=ids, embeddings=embeddings[offset:offset + batch_size], documents=ids)
+    return embeddings
+
+
+def test_batch_persists_once(tmp_path, monkeypatch):
+    collection = NumpyCollection("docs", str(tmp_path))
+    saves = []
+    original = collection._persist
+    monkeypatch.setattr(collection, "_persist", lambda: (saves.append(1), original()))
+
+    with collection.batch():
+        embeddings = upsert_batches(collection, 100, batch_size=10)
+        # Trong tiến trình truy vấn thấy ngay dữ liệu mới, file chưa được ghi
+        assert collection.count() == 100
+        assert not saves
+    assert len(saves) == 1
+
+    reopened = NumpyCollection("docs", str(tmp_path))
+    assert reopened.count() == 100
+    result = reopened.query(query_embeddings=embeddings[42], n_results=1)
+    assert result["ids"] == [["42"]]
+
+
+def test_appends_grow_buffer_geometrically(tmp_path):
+    collection = NumpyCollection("docs", str(tmp_path))
+    buffers = set()
+    embeddings = vectors(256)
+    with collection.batch():
+        for offset in range(0, 256, 4):
+            ids = [str(i) for i in range(offset, offset + 4)]
+            collection.upsert(ids=ids, embeddings=embeddings[offset:offset + 4], documents=ids)
+            buffers.add(id(collection._buffer))
+    # 64 lô nhưng chỉ cấp phát lại khi hết chỗ (4, 8, 16, ..., 256)
+    assert len(buffers) <= 7
+    assert collection.get(ids=["0", "255"])["ids"] == ["0", "255"]
+
+
+def test_replacing_rows_does_not_change_snapshot_held_by_reader(tmp_path):
+    collection = NumpyCollection("docs", str(tmp_path))
+    embeddings = upsert_batches(collection, 10, batch_size=10)
+    snapshot = collection._state
+    before = np.array(snapshot[0])
+
+    collection.upsert(ids=["3"], embeddings=-embeddings[3:4], documents=["new"])
+
+    np.testing.assert_array_equal(snapshot[0], before)
+    matrix, ids, documents, _, positions = collection._state
+    assert documents[positions["3"]] == "new"
+    assert collection.query(query_embeddings=-embeddings[3], n_results=1)["ids"] == [["3"]]
+
+
+def test_delete_and_update_keep_positions_consistent(tmp_path):
+    collection = NumpyCollection("docs", str(tmp_path))
+    embeddings = upsert_batches(collection, 10, batch_size=5)
+
+    collection.delete(ids=["0", "5"])
+    collection.update(ids=["9"], metadatas=[{"tag": "x"}])
+
+    reopened = NumpyCollection("docs", str(tmp_path))
+    for current in (collection, reopened):
+        _, ids, _, metadatas, positions = current._state
+        assert positions == {doc_id: position for position, doc_id in enumerate(ids)}
+        assert current.get(ids=["9"])["metadatas"] == [{"tag": "x"}]
+        assert current.query(query_embeddings=embeddings[7], n_results=1)["ids"] == [["7"]]
+    assert reopened.count() == 8
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from tests.conftest import make_products
+from src import database
+from src.vector_index import NumpyCollection
+
+
+class CountingEmbedding:
+    """Embedding giả, ghi lại các văn bản đã embed"""
+
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return np.array([
+            np.random.default_rng(int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")).standard_normal(8)
+            for text in texts
+        ], dtype=np.float32)
+
+
+@pytest.fixture
+def vector_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "VECTOR_DB_ENABLED", True)
+    embed = CountingEmbedding()
+    monkeypatch.setattr(database, "embedding_function", embed)
+    collection = NumpyCollection("products", str(tmp_path / "vector_index"), embed)
+    manifest_path = str(tmp_path / "vector_manifest.json")
+
+    def sync(products):
+        embed.texts.clear()
+        database.sync_products_to_vector_db(products, manifest_path=manifest_path, collection=collection)
+        return len(embed.texts)
+
+    return collection, sync
+
+
+def test_resync_skips_unchanged_products(vector_db):
+    collection, sync = vector_db
+    products = make_products(20)
+
+    assert sync(products) == 20
+    assert sync(products) == 0
+    assert collection.count() == 20
+
+
+def test_resync_embeds_only_changed_products(vector_db):
+    collection, sync = vector_db
+    products = make_products(20)
+    sync(products)
+
+    products[0]["title"] += " (updated)"
+    # Tồn kho chỉ nằm trong metadata: cập nhật metadata, không embed lại
+    products[1]["variations"][0]["inventory"] = 7
+    assert sync(products) == 1
+    assert collection.get(ids=[str(products[1]["id"])])["metadatas"][0]["total_inventory"] == 7
+
+
+def test_resync_removes_deleted_ids(vector_db):
+    collection, sync = vector_db
+    products = make_products(20)
+    sync(products)
+
+    removed = [str(product["id"]) for product in products[:3]]
+    assert sync(products[3:]) == 0
+    assert collection.count() == 17
+    assert not set(removed) & set(collection.get()["ids"])
+
+
+class ProductPages:
+    """API sản phẩm giả cho httpx.MockTransport: phân trang, ETag/304 và lỗi tạm thời theo yêu cầu"""
+
+    def __init__(self, products, page_size):
+        self.products = products
+        self.page_size = page_size
+        self.failures = {}
+        self.statuses = []
+
+    def __call__(self, request):
+        page = int(request.url.params["page"])
+        if self.failures.get(page):
+            self.failures[page] -= 1
+            self.statuses.append((page, 503))
+            return httpx.Response(503)
+        items = self.products[(page - 1) * self.page_size:page * self.page_size]
+        body = {"statusCode": 200, "data": {"data": items, "total": len(self.products)}}
+        etag = '"' + hashlib.md5(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+        status = 304 if request.headers.get("If-None-Match") == etag else 200
+        self.statuses.append((page, status))
+        if status == 304:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, json=body, headers={"ETag": etag})
+
+
+def test_sync_from_api_with_304_pages_and_retries(vector_db, tmp_path, monkeypatch):
+    collection, sync = vector_db
+    monkeypatch.setattr(database, "API_CACHE_DIR", str(tmp_path / "api_cache"))
+    monkeypatch.setattr(database, "PRODUCTS_API_BACKOFF", 0)
+    api = ProductPages(make_products(25), page_size=10)
+
+    def fetch():
+        api.statuses.clear()
+        return asyncio.run(database.afetch_products_from_api(
+            "http://api.test/products", page_size=10, transport=httpx.MockTransport(api)
+        ))
+
+    api.failures = {2: 1}
+    products = fetch()
+    assert sorted(api.statuses) == [(1, 200), (2, 200), (2, 503), (3, 200)]
+    assert sync(products) == 25
+
+    # Chỉ trang 3 đổi: trang 1-2 trả 304 và được lấy từ cache, chỉ sản phẩm đổi được embed lại
+    changed = api.products[22]
+    changed["title"] += " (updated)"
+    products = fetch()
+    assert sorted(api.statuses) == [(1, 304), (2, 304), (3, 200)]
+    assert products == api.products
+    assert sync(products) == 1
+
+    stored = collection.get()
+    assert sorted(stored["ids"]) == sorted(str(product["id"]) for product in api.products)
+    document = collection.get(ids=[str(changed["id"])])["documents"][0]
+    assert document == database.create_product_text_for_embedding(changed)
+    assert "(updated)" in document